@@ -0,0 +1,88 @@
+# -*- coding: utf-8 -*-
+"""
+Бенчмарк: память сессии на клиентов - словари и записи ClientRecord
+
+Из синтетических клиентов строится CSV-реестр на --rows строк и читается
+read_excel_data - так, как при загрузке. Замеряется (tracemalloc) память,
+которая остаётся занята списком клиентов:
+
+    dict      - прежнее хранение: словарь на клиента (каждый клиент
+                собирается из своей копии значений, как при построчном
+                разборе)
+    record    - ClientRecord, как их отдаёт разбор сейчас
+
+и время перевода всех клиентов в JSON (для записей - через to_dict).
+
+Использование:
+    python benchmarks/bench_client_memory.py
+    python benchmarks/bench_client_memory.py --rows 20000
+"""
+
+import gc
+import json
+import time
+import pickle
+import argparse
+import tempfile
+import tracemalloc
+from pathlib import Path
+
+from common import load_app, synthetic_clients
+from bench_ingest import registry_rows, write_csv
+
+
+def traced(func) -> tuple:
+    """(результат, байт, оставшихся занятыми после func)"""
+    gc.collect()
+    tracemalloc.start()
+    try:
+        result = func()
+        gc.collect()
+        retained, _ = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return result, retained
+
+
+def as_dict(client) -> dict:
+    """
+    Словарь клиента, как его строил прежний разбор: ключи - общие строки,
+    значения - свои у каждого клиента (отдельный pickle не разделяет их
+    с записью)
+    """
+    return dict(zip(client.keys(), pickle.loads(pickle.dumps(tuple(client.values())))))
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Память на клиентов сессии: словари и ClientRecord')
+    parser.add_argument('--rows', type=int, default=100_000)
+    args = parser.parse_args()
+
+    app = load_app()
+    with tempfile.TemporaryDirectory(prefix="bench-memory-") as tmp:
+        path = Path(tmp) / "registry.csv"
+        headers, rows = registry_rows(app, synthetic_clients(args.rows))
+        write_csv(path, headers, rows, 'utf-8', ',', localized=False)
+        del rows
+
+        records, record_bytes = traced(lambda: app.read_excel_data(path))
+
+    dicts, dict_bytes = traced(lambda: [as_dict(client) for client in records])
+
+    start = time.perf_counter()
+    json.dumps(dicts, ensure_ascii=False)
+    dict_json = time.perf_counter() - start
+    start = time.perf_counter()
+    json.dumps([client.to_dict() for client in records], ensure_ascii=False)
+    record_json = time.perf_counter() - start
+
+    scale = 100_000 / len(records)
+    print(f"клиентов: {len(records)}")
+    print(f"{'хранение':<9} {'МБ на 100k':>11} {'байт/клиент':>12} {'JSON, с':>8}")
+    for name, size, json_time in (('dict', dict_bytes, dict_json), ('record', record_bytes, record_json)):
+        print(f"{name:<9} {size * scale / 1024 ** 2:>11.1f} {size / len(records):>12.0f} {json_time:>8.3f}")
+    print(f"экономия: {1 - record_bytes / dict_bytes:.0%}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,53 @@
+# -*- coding: utf-8 -*-
+"""
+Бенчмарк: N отдельных PDF справок против одного общего PDF на пакет
+
+Использование:
+    python benchmarks/bench_combined_pdf.py --clients 1000
+"""
+
+import io
+import time
+import argparse
+
+from common import load_app, synthetic_clients
+
+REPORT_DATE = "22.12.2025"
+MANAGER = "Койбасова Е.Б."
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Отдельные PDF справки против общего PDF')
+    parser.add_argument('--clients', '-n', type=int, default=1000)
+    args = parser.parse_args()
+
+    app = load_app()
+    clients = synthetic_clients(args.clients)
+    template = app.PdfCertificateTemplate(REPORT_DATE, MANAGER)
+    template.render(clients[0], io.BytesIO())  # прогрев
+
+    start = time.perf_counter()
+    separate_size = 0
+    for client in clients:
+        buffer = io.BytesIO()
+        template.render(client, buffer)
+        separate_size += len(buffer.getvalue())
+    separate_time = time.perf_counter() - start
+
+    start = time.perf_counter()
+    buffer = io.BytesIO()
+    failed = template.render_combined(clients, buffer)
+    combined_time = time.perf_counter() - start
+    combined = buffer.getvalue()
+    pages = combined.count(b'/Type /Page\n') or combined.count(b'/Type /Page ')
+
+    print(f"Клиентов: {args.clients}")
+    print(f"{'':<18} {'время, с':>10} {'справок/с':>10} {'размер, КБ':>12}")
+    print(f"{'отдельные PDF':<18} {separate_time:>10.2f} {args.clients / separate_time:>10.1f} {separate_size / 1024:>12.0f}")
+    print(f"{'общий PDF':<18} {combined_time:>10.2f} {args.clients / combined_time:>10.1f} {len(combined) / 1024:>12.0f}")
+    print(f"Страниц в общем PDF: {pages}, ошибок: {len(failed)}")
+    print(f"Ускорение: {separate_time / combined_time:.2f}x, размер меньше в {separate_size / len(combined):.1f} раз")
+
+
+if __name__ == '__main__':
+    main()
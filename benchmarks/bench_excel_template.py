@@ -0,0 +1,55 @@
+# -*- coding: utf-8 -*-
+"""
+Бенчмарк: Excel справки - create_excel_certificate (openpyxl) на каждого клиента
+против ExcelCertificateTemplate (клонирование заготовки xlsx)
+
+Использование:
+    python benchmarks/bench_excel_template.py --clients 1000
+"""
+
+import io
+import time
+import argparse
+
+from common import load_app, synthetic_clients
+
+REPORT_DATE = "22.12.2025"
+MANAGER = "Койбасова Е.Б."
+
+
+def per_client(app, clients):
+    for client in clients:
+        app.create_excel_certificate(client, REPORT_DATE, MANAGER, io.BytesIO())
+
+
+def compiled(app, clients):
+    template = app.ExcelCertificateTemplate(REPORT_DATE, MANAGER)
+    for client in clients:
+        template.render(client, io.BytesIO())
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Скорость генерации Excel справок: до и после шаблона')
+    parser.add_argument('--clients', '-n', type=int, default=1000)
+    args = parser.parse_args()
+
+    app = load_app()
+    clients = synthetic_clients(args.clients)
+
+    # Прогрев: заготовки для разного числа строк детализации
+    compiled(app, clients[:5])
+
+    results = {}
+    for name, func in [('create_excel_certificate', per_client), ('ExcelCertificateTemplate', compiled)]:
+        start = time.perf_counter()
+        func(app, clients)
+        elapsed = time.perf_counter() - start
+        results[name] = args.clients / elapsed
+        print(f"{name:<26} {elapsed:>8.2f} с  {results[name]:>8.1f} справок/с")
+
+    speedup = results['ExcelCertificateTemplate'] / results['create_excel_certificate']
+    print(f"Ускорение: {speedup:.2f}x")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,114 @@
+# -*- coding: utf-8 -*-
+"""
+Бенчмарк: проверка столбца ИИН - построчно и пакетно (NumPy)
+
+Столбец из --count ИИН (по умолчанию миллион): корректные номера из
+synthetic_iin и доля --invalid испорченных - неверная контрольная цифра,
+несуществующая дата, 7-я цифра 7-9, буквы, неполный номер, пустая ячейка.
+
+Замеряется (медиана по --runs):
+
+    length       - прежняя проверка (только 12 цифр), для сравнения
+    scalar       - validate_iin на каждый номер
+    batch        - validate_iins на весь столбец
+
+Результаты scalar и batch сверяются (признак и текст ошибки), число
+отбракованных - с числом испорченных номеров; при расхождении скрипт
+завершается с кодом 1.
+
+Использование:
+    python benchmarks/bench_iin.py
+    python benchmarks/bench_iin.py --count 100000 --runs 5 --invalid 0.05
+"""
+
+import sys
+import time
+import random
+import argparse
+import statistics
+
+from common import synthetic_iin
+from iin import validate_iin, validate_iins
+
+
+def corrupt(iin: str, rng: random.Random) -> str:
+    """Испорченный номер одного из типичных видов"""
+    kind = rng.randrange(6)
+    if kind == 0:
+        return iin[:11] + str((int(iin[11]) + rng.randint(1, 9)) % 10)
+    if kind == 1:
+        return iin[:2] + rng.choice(('13', '00')) + iin[4:]
+    if kind == 2:
+        return iin[:6] + rng.choice('789') + iin[7:]
+    if kind == 3:
+        return iin[:5] + 'O' + iin[6:]
+    if kind == 4:
+        return iin[:rng.randint(8, 11)]
+    return ''
+
+
+def build_column(count: int, invalid: float) -> tuple:
+    """(столбец ИИН, число испорченных)"""
+    rng = random.Random(42)
+    column = []
+    corrupted = 0
+    for _ in range(count):
+        iin = synthetic_iin(rng)
+        if rng.random() < invalid:
+            iin = corrupt(iin, rng)
+            corrupted += 1
+        column.append(iin)
+    return column, corrupted
+
+
+def length_only(iins: list) -> list:
+    """Прежняя проверка: только цифры и длина"""
+    return [bool(iin) and iin.strip().isdigit() and len(iin.strip()) == 12 for iin in iins]
+
+
+def median_time(func, runs: int) -> tuple:
+    """(медиана времени, результат последнего прогона)"""
+    times = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        result = func()
+        times.append(time.perf_counter() - start)
+    return statistics.median(times), result
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Проверка ИИН: построчно и пакетно')
+    parser.add_argument('--count', type=int, default=1_000_000)
+    parser.add_argument('--runs', '-n', type=int, default=3)
+    parser.add_argument('--invalid', type=float, default=0.01, help='доля испорченных номеров')
+    args = parser.parse_args()
+
+    iins, corrupted = build_column(args.count, args.invalid)
+
+    length_time, _ = median_time(lambda: length_only(iins), args.runs)
+    scalar_time, scalar = median_time(lambda: [validate_iin(iin) for iin in iins], args.runs)
+    batch_time, (valid, errors) = median_time(lambda: validate_iins(iins), args.runs)
+
+    print(f"{'этап':<8} {'время, с':>9} {'ИИН/с':>12} {'к scalar':>9}")
+    for stage, elapsed in (('length', length_time), ('scalar', scalar_time), ('batch', batch_time)):
+        print(f"{stage:<8} {elapsed:>9.3f} {args.count / elapsed:>12.0f} {scalar_time / elapsed:>8.1f}x")
+
+    failed = False
+    mismatch = next(
+        (i for i, result in enumerate(scalar) if (result['valid'], result['error']) != (valid[i], errors[i])), None
+    )
+    if mismatch is not None:
+        failed = True
+        print(f"✗ {iins[mismatch]!r}: построчно {scalar[mismatch]}, пакетно {valid[mismatch]} {errors[mismatch]}")
+    rejected = valid.count(False)
+    print(f"отбраковано {rejected} из {args.count}, испорчено {corrupted}")
+    if rejected != corrupted:
+        failed = True
+        print("✗ число отбракованных не совпадает с числом испорченных")
+
+    if failed:
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
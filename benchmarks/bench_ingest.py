@@ -0,0 +1,159 @@
+# -*- coding: utf-8 -*-
+"""
+Бенчмарк: разбор одного и того же реестра из xlsx, CSV и Parquet
+
+Для каждого размера из синтетических клиентов (заголовки шаблона
+create_template.py и столбец ИИН) строятся реестры:
+
+    xlsx          - как после выгрузки в Excel
+    csv-utf8      - разделитель ',', суммы числами, UTF-8
+    csv-cp1251    - разделитель ';', суммы '1 234 567,00', cp1251
+                    (выгрузка из Excel/АБС под Windows; казахские буквы,
+                    которых нет в cp1251, заменяются на '?', как при выгрузке)
+    parquet       - столбцы с типами (если установлен pyarrow)
+
+и замеряется read_excel_data (медиана по --runs). Клиенты из CSV и
+Parquet сверяются с клиентами из xlsx: при любом расхождении скрипт
+завершается с кодом 1.
+
+Использование:
+    python benchmarks/bench_ingest.py
+    python benchmarks/bench_ingest.py --sizes 1000 100000 --runs 3
+"""
+
+import sys
+import csv
+import time
+import argparse
+import tempfile
+import statistics
+from pathlib import Path
+
+from common import load_app, synthetic_clients, template_headers
+
+IIN_HEADER = "ИИН"
+
+
+def registry_rows(app, clients: list) -> tuple:
+    """(заголовки, строки) реестра с раскладкой шаблона"""
+    headers = template_headers() + [IIN_HEADER]
+    columns = app.COLUMN_RESOLVER.resolve(tuple(headers)).fields
+    rows = []
+    for client in clients:
+        # В шаблоне пени разделены на пеню за ОД и пеню за вознаграждение
+        values = dict(client)
+        values['penalty_principal_old'] = client['penalties'] // 2
+        values['penalty_reward_old'] = client['penalties'] - client['penalties'] // 2
+        row = [None] * len(headers)
+        for field_name, col_idx in columns.items():
+            row[col_idx - 1] = values.get(field_name)
+        rows.append(row)
+    return headers, rows
+
+
+def write_xlsx(path: Path, headers: list, rows: list):
+    from openpyxl import Workbook
+
+    wb = Workbook(write_only=True)
+    ws = wb.create_sheet("Данные клиентов")
+    ws.append(headers)
+    for row in rows:
+        ws.append(row)
+    wb.save(path)
+
+
+def format_amount(value) -> str:
+    """Сумма как в русской локали Excel: '1 234 567,00'"""
+    return f"{value:,.2f}".replace(',', ' ').replace('.', ',') if isinstance(value, int) else value
+
+
+def write_csv(path: Path, headers: list, rows: list, encoding: str, delimiter: str, localized: bool):
+    with open(path, 'w', newline='', encoding=encoding, errors='replace') as f:
+        writer = csv.writer(f, delimiter=delimiter)
+        writer.writerow(headers)
+        for row in rows:
+            writer.writerow([format_amount(value) if localized else value for value in row])
+
+
+def write_parquet(path: Path, headers: list, rows: list):
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    columns = list(zip(*rows)) if rows else [()] * len(headers)
+    pq.write_table(pa.table({header: list(values) for header, values in zip(headers, columns)}), path)
+
+
+def expected_clients(name: str, baseline: list) -> list:
+    """Клиенты, которые должен дать реестр формата name (для cp1251 - с потерей символов)"""
+    if name != 'csv-cp1251':
+        return baseline
+    expected = []
+    for client in baseline:
+        client = dict(client)
+        for field in ('contract_number', 'contract_date', 'client_name'):
+            client[field] = client[field].encode('cp1251', errors='replace').decode('cp1251')
+        expected.append(client)
+    return expected
+
+
+def build_sources(app, work_dir: Path, clients: list) -> dict:
+    """Формат -> путь к реестру"""
+    headers, rows = registry_rows(app, clients)
+    sources = {
+        'xlsx': work_dir / "registry.xlsx",
+        'csv-utf8': work_dir / "registry-utf8.csv",
+        'csv-cp1251': work_dir / "registry-cp1251.csv",
+    }
+    write_xlsx(sources['xlsx'], headers, rows)
+    write_csv(sources['csv-utf8'], headers, rows, 'utf-8', ',', localized=False)
+    write_csv(sources['csv-cp1251'], headers, rows, 'cp1251', ';', localized=True)
+    if app.PARQUET_AVAILABLE:
+        sources['parquet'] = work_dir / "registry.parquet"
+        write_parquet(sources['parquet'], headers, rows)
+    return sources
+
+
+def measure(app, path: Path, runs: int) -> tuple:
+    """(медиана времени разбора, клиенты последнего прогона)"""
+    times = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        clients = app.read_excel_data(path)
+        times.append(time.perf_counter() - start)
+    return statistics.median(times), clients
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Разбор реестра из xlsx, CSV и Parquet')
+    parser.add_argument('--sizes', type=int, nargs='+', default=[1000, 10000, 50000])
+    parser.add_argument('--runs', '-n', type=int, default=3)
+    args = parser.parse_args()
+
+    app = load_app()
+    if not app.PARQUET_AVAILABLE:
+        print("⚠ pyarrow не установлен - Parquet пропускается")
+
+    failed = False
+    print(f"{'строк':>8} {'формат':<12} {'размер, МБ':>10} {'время, с':>9} {'строк/с':>10} {'к xlsx':>7}")
+    for size in args.sizes:
+        with tempfile.TemporaryDirectory(prefix="bench-ingest-") as tmp:
+            sources = build_sources(app, Path(tmp), synthetic_clients(size))
+            baseline_time, baseline = None, None
+            for name, path in sources.items():
+                elapsed, clients = measure(app, path, args.runs)
+                if baseline is None:
+                    baseline_time, baseline = elapsed, clients
+                expected = expected_clients(name, baseline)
+                if clients != expected:
+                    failed = True
+                    mismatch = next((i for i, (a, b) in enumerate(zip(clients, expected)) if a != b), len(clients))
+                    print(f"✗ {name}: клиенты не совпадают с xlsx (строка {mismatch + 1})")
+                print(f"{size:>8} {name:<12} {path.stat().st_size / 1024 ** 2:>10.2f} {elapsed:>9.3f} "
+                      f"{size / elapsed:>10.0f} {baseline_time / elapsed:>6.1f}x")
+
+    if failed:
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,148 @@
+# -*- coding: utf-8 -*-
+"""
+Бенчмарк: нормализация сумм реестра - построчно и поколоночно (NumPy)
+
+Строки реестра (раскладка шаблона create_template.py) готовятся в памяти,
+чтобы замер не включал чтение файла:
+
+    numbers   - суммы числами, как ячейки xlsx и Parquet
+    text      - суммы текстом '1 234 567,00', как в CSV из русской локали
+
+Для каждой доли мусора из --junk (по умолчанию чистый реестр и 1%)
+в ячейки сумм подставляются 'н/д', '12-3' и т.п. - они должны попасть в
+ошибки строк, а не молча стать нулём.
+
+Замеряется (медиана по --runs):
+
+    rowwise      - эталон: прежний построчный разбор (round(float()) в
+                   try/except на каждую ячейку, слияние пени и total по
+                   полям)
+    vectorized   - normalize_amounts: те же правила над столбцами блока
+    rows         - _iter_row_clients целиком (тексты, ИИН, словари)
+
+Суммы обоих способов сверяются, число ошибок - с числом мусорных ячеек;
+при расхождении скрипт завершается с кодом 1.
+
+Использование:
+    python benchmarks/bench_normalize.py
+    python benchmarks/bench_normalize.py --rows 100000 --runs 5 --junk 0 0.001 0.01
+"""
+
+import sys
+import time
+import random
+import argparse
+import statistics
+from itertools import product
+
+from common import load_app, synthetic_clients
+
+JUNK_VALUES = ('н/д', '12-3', 'см. примечание', '—')
+
+
+def build_rows(app, size: int, junk: float, text: bool) -> tuple:
+    """(заголовки, строки, число мусорных ячеек сумм)"""
+    from bench_ingest import registry_rows, format_amount
+
+    headers, rows = registry_rows(app, synthetic_clients(size))
+    amount_columns = [
+        col_idx - 1 for field_name, col_idx in app.COLUMN_RESOLVER.resolve(tuple(headers)).fields.items()
+        if field_name in app.SOURCE_AMOUNT_FIELDS
+    ]
+    rng = random.Random(7)
+    junk_cells = 0
+    for row in rows:
+        for col in amount_columns:
+            if rng.random() < junk:
+                row[col] = rng.choice(JUNK_VALUES)
+                junk_cells += 1
+            elif text:
+                row[col] = format_amount(row[col])
+    return tuple(headers), [tuple(row) for row in rows], junk_cells
+
+
+def amount_columns(app, headers: tuple, rows: list) -> dict:
+    fields = app.COLUMN_RESOLVER.resolve(headers).fields
+    return {
+        field_name: [row[col_idx - 1] for row in rows]
+        for field_name, col_idx in fields.items() if field_name in app.SOURCE_AMOUNT_FIELDS
+    }
+
+
+def rowwise_amounts(app, columns: dict, size: int, text: bool) -> dict:
+    """Эталон: построчная нормализация, как до поколоночной (ошибки - молча 0)"""
+    from source_readers import parse_number
+
+    result = {field_name: [] for field_name in app.SOURCE_AMOUNT_FIELDS}
+    for i in range(size):
+        client = dict.fromkeys(app.SOURCE_AMOUNT_FIELDS, 0)
+        for field_name, values in columns.items():
+            value = values[i]
+            if value is None:
+                continue
+            if text and isinstance(value, str):
+                value = parse_number(value)
+            try:
+                client[field_name] = round(float(value)) if value else 0
+            except (TypeError, ValueError, OverflowError):
+                client[field_name] = 0
+        if client['penalties'] == 0:
+            client['penalties'] = client['penalty_principal_old'] + client['penalty_reward_old']
+        if client['total'] == 0:
+            client['total'] = sum(client[field_name] for field_name in app.TOTAL_COMPONENTS)
+        for field_name, value in client.items():
+            result[field_name].append(value)
+    return result
+
+
+def median_time(func, runs: int) -> tuple:
+    """(медиана времени, результат последнего прогона)"""
+    times = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        result = func()
+        times.append(time.perf_counter() - start)
+    return statistics.median(times), result
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Нормализация сумм: построчно и поколоночно')
+    parser.add_argument('--rows', type=int, default=100_000)
+    parser.add_argument('--runs', '-n', type=int, default=5)
+    parser.add_argument('--junk', type=float, nargs='+', default=[0, 0.01], help='доли мусорных ячеек сумм')
+    args = parser.parse_args()
+
+    app = load_app()
+    failed = False
+    print(f"{'суммы':<8} {'мусор':>6} {'этап':<12} {'время, с':>9} {'строк/с':>10} {'ускорение':>10}")
+    for junk, (name, text) in product(args.junk, (('numbers', False), ('text', True))):
+        headers, rows, junk_cells = build_rows(app, args.rows, junk, text)
+        columns = amount_columns(app, headers, rows)
+
+        rowwise_time, expected = median_time(lambda: rowwise_amounts(app, columns, args.rows, text), args.runs)
+        vector_time, (amounts, errors) = median_time(
+            lambda: app.normalize_amounts(columns, args.rows, text), args.runs
+        )
+        rows_time, clients = median_time(
+            lambda: list(app._iter_row_clients(iter([headers] + rows), text_amounts=text)), args.runs
+        )
+
+        for stage, elapsed in (('rowwise', rowwise_time), ('vectorized', vector_time), ('rows', rows_time)):
+            speedup = f"{rowwise_time / elapsed:>9.1f}x" if stage == 'vectorized' else ''
+            print(f"{name:<8} {junk:>6.1%} {stage:<12} {elapsed:>9.3f} {args.rows / elapsed:>10.0f} {speedup:>10}")
+
+        if amounts != expected:
+            failed = True
+            print(f"✗ {name}: суммы отличаются от построчного разбора")
+        error_cells = sum(len(row_errors) for row_errors in errors.values())
+        client_errors = sum(len(client.get('amount_errors') or ()) for client in clients)
+        if not error_cells == client_errors == junk_cells:
+            failed = True
+            print(f"✗ {name}: ошибок {error_cells} (в клиентах {client_errors}), мусорных ячеек {junk_cells}")
+
+    if failed:
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
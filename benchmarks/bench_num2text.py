@@ -0,0 +1,136 @@
+# -*- coding: utf-8 -*-
+"""
+Бенчмарк и проверка эквивалентности num2text
+
+Сравнивает табличный number_to_text с прежней реализацией (сборка текста
+по группам при каждом вызове). Проверка эквивалентности полным перебором
+0..--verify-limit (по умолчанию 10^7) плюс выборка до триллионов; тот же
+перебор выполняется в tests/test_num2text.py.
+
+Использование:
+    python benchmarks/bench_num2text.py
+    python benchmarks/bench_num2text.py --verify-limit 0    # только скорость
+"""
+
+import time
+import random
+import argparse
+
+import common  # noqa: F401 - добавляет scripts/ в sys.path
+import num2text
+from num2text import UNITS, convert_group, get_plural_form
+
+
+def reference_number_to_text(n):
+    """Прежняя реализация number_to_text (без таблиц и кэша)"""
+    if n == 0:
+        return 'ноль'
+
+    if n < 0:
+        return 'минус ' + reference_number_to_text(-n)
+
+    groups = []
+    group_index = 0
+
+    while n > 0:
+        group = n % 1000
+        n //= 1000
+
+        if group > 0:
+            feminine = (group_index == 1)  # тысячи - женский род
+            text = convert_group(group, feminine)
+
+            if group_index > 0:
+                unit = get_plural_form(group, UNITS[group_index][:3])
+                text = f"{text} {unit}"
+
+            groups.append(text)
+
+        group_index += 1
+
+    groups.reverse()
+    return ' '.join(groups).strip()
+
+
+def reference_format_number_with_text(n):
+    n = int(n)
+    return f"{f'{n:,}'.replace(',', ' ')} ({reference_number_to_text(n)})"
+
+
+def verify(limit: int, samples: int):
+    """Полный перебор 0..limit и случайная выборка больших чисел"""
+    # Без кэша - иначе перебор заполняет его впустую
+    fast = num2text.number_to_text.__wrapped__
+    start = time.perf_counter()
+    for n in range(limit + 1):
+        if fast(n) != reference_number_to_text(n):
+            raise AssertionError(f"{n}: {fast(n)!r} != {reference_number_to_text(n)!r}")
+    print(f"0..{limit:,}: совпадает ({time.perf_counter() - start:.1f} с)")
+
+    rng = random.Random(42)
+    big = [rng.randrange(-10**15 + 1, 10**15) for _ in range(samples)]
+    for n in big:
+        if fast(n) != reference_number_to_text(n):
+            raise AssertionError(f"{n}: {fast(n)!r} != {reference_number_to_text(n)!r}")
+    batch = num2text.numbers_to_text(big)
+    if batch != [reference_number_to_text(n) for n in big]:
+        raise AssertionError("numbers_to_text расходится с поэлементной конвертацией")
+    print(f"{samples:,} случайных чисел до 10^15 и numbers_to_text: совпадает")
+
+
+def bench(amounts):
+    """
+    Суммы справок в формате "both": каждая сумма переводится дважды -
+    для Excel и для PDF справки клиента
+    """
+    workload = []
+    for i in range(0, len(amounts), 4):
+        workload.extend(amounts[i:i + 4] * 2)
+
+    def timed(func):
+        start = time.perf_counter()
+        func()
+        return time.perf_counter() - start
+
+    num2text.number_to_text.cache_clear()
+    num2text.format_number_with_text.cache_clear()
+    table_only = num2text.number_to_text.__wrapped__
+
+    results = {
+        'прежняя реализация': timed(lambda: [reference_format_number_with_text(n) for n in workload]),
+        'таблицы без кэша': timed(lambda: [table_only(n) for n in workload]),
+        'format_number_with_text': timed(lambda: [num2text.format_number_with_text(n) for n in workload]),
+    }
+    num2text.number_to_text.cache_clear()
+    results['numbers_to_text'] = timed(lambda: num2text.numbers_to_text(workload))
+
+    base = results['прежняя реализация']
+    for name, elapsed in results.items():
+        rate = len(workload) / elapsed
+        print(f"{name:<24} {elapsed:>8.3f} с  {rate:>12,.0f} чисел/с  {base / elapsed:>6.1f}x")
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Скорость и эквивалентность number_to_text')
+    parser.add_argument('--clients', '-n', type=int, default=100_000)
+    parser.add_argument('--verify-limit', type=int, default=10**7)
+    parser.add_argument('--samples', type=int, default=100_000)
+    args = parser.parse_args()
+
+    # Как в справке: итог, основной долг, вознаграждение, пени
+    rng = random.Random(42)
+    amounts = []
+    for _ in range(args.clients):
+        principal = rng.randint(50_000, 10_000_000)
+        reward = rng.randint(0, 1_000_000)
+        penalties = rng.choice([0, rng.randint(100, 500_000)])
+        amounts.extend([principal + reward + penalties, principal, reward, penalties])
+
+    bench(amounts)
+
+    if args.verify_limit:
+        verify(args.verify_limit, args.samples)
+
+
+if __name__ == '__main__':
+    main()
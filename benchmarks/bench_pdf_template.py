@@ -0,0 +1,55 @@
+# -*- coding: utf-8 -*-
+"""
+Бенчмарк: PDF справки - create_pdf_certificate на каждого клиента
+против PdfCertificateTemplate, собранного один раз на пакет
+
+Использование:
+    python benchmarks/bench_pdf_template.py --clients 1000
+"""
+
+import io
+import time
+import argparse
+
+from common import load_app, synthetic_clients
+
+REPORT_DATE = "22.12.2025"
+MANAGER = "Койбасова Е.Б."
+
+
+def per_client(app, clients):
+    for client in clients:
+        app.create_pdf_certificate(client, REPORT_DATE, MANAGER, io.BytesIO())
+
+
+def compiled(app, clients):
+    template = app.PdfCertificateTemplate(REPORT_DATE, MANAGER)
+    for client in clients:
+        template.render(client, io.BytesIO())
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Скорость генерации PDF справок: до и после шаблона')
+    parser.add_argument('--clients', '-n', type=int, default=1000)
+    args = parser.parse_args()
+
+    app = load_app()
+    clients = synthetic_clients(args.clients)
+
+    # Прогрев: регистрация шрифтов, кэши reportlab
+    compiled(app, clients[:5])
+
+    results = {}
+    for name, func in [('create_pdf_certificate', per_client), ('PdfCertificateTemplate', compiled)]:
+        start = time.perf_counter()
+        func(app, clients)
+        elapsed = time.perf_counter() - start
+        results[name] = args.clients / elapsed
+        print(f"{name:<24} {elapsed:>8.2f} с  {results[name]:>8.1f} справок/с")
+
+    speedup = results['PdfCertificateTemplate'] / results['create_pdf_certificate']
+    print(f"Ускорение: {speedup:.2f}x")
+
+
+if __name__ == '__main__':
+    main()
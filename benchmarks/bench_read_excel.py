@@ -0,0 +1,319 @@
+# -*- coding: utf-8 -*-
+"""
+Бенчмарк и проверка эквивалентности read_excel_data
+
+Сравнивает потоковый разбор (read_only, iter_rows) с прежним загрузчиком
+(load_workbook в полном режиме и ws.cell на каждое поле) на реестрах
+data/clients_data*.xlsx и шаблоне загрузки и, с --rows, на синтетических
+реестрах заданного размера: клиенты сверяются поле за полем, при любом
+расхождении скрипт завершается с кодом 1. Та же сверка на файлах
+репозитория - tests/test_ingest.py.
+
+Медиана по 5 запускам, ускорение потокового разбора:
+
+    шаблон (369 строк, кэш внешних ссылок ~6 МБ)   24x
+    синтетический, 1 - 10 строк                    1.0x
+    синтетический, 100 строк                       1.1x
+    синтетический, 1 000 строк                     1.5x
+    синтетический, 10 000 строк                    1.8x
+
+На реестрах до десятков строк время - открытие книги openpyxl, одинаковое
+в обоих режимах. Синтетические книги сохраняются в обычном режиме
+openpyxl: как и у Excel, в листе есть <dimension>. Без него (write_only)
+read_only-лист при открытии просматривается целиком ещё раз.
+
+ИИН в эталоне проверяется текущим validate_iin: правила проверки
+намеренно стали строже (контрольная цифра, дата рождения), а сравнивается
+разбор реестра, а не валидатор.
+
+Использование:
+    python benchmarks/bench_read_excel.py
+    python benchmarks/bench_read_excel.py data/clients_data.xlsx --runs 5
+    python benchmarks/bench_read_excel.py --rows 100 1000 10000 --runs 5
+"""
+
+import sys
+import time
+import argparse
+import tempfile
+import statistics
+from pathlib import Path
+
+from common import PROJECT_DIR, load_app, synthetic_clients
+
+DEFAULT_FILES = sorted((PROJECT_DIR / "data").glob("clients_data*.xlsx")) + [
+    PROJECT_DIR / "Шаблон для загрузки справок.xlsx"
+]
+
+
+def reference_read_excel_data(file_path: Path) -> list:
+    """Прежняя реализация read_excel_data (полная загрузка книги, ws.cell)"""
+    from openpyxl import load_workbook
+    from iin import validate_iin
+
+    wb = load_workbook(file_path, data_only=True)
+    ws = wb.active
+
+    # Маппинг заголовков
+    headers = {}
+    for col in range(1, ws.max_column + 1):
+        val = ws.cell(row=1, column=col).value
+        if val:
+            headers[str(val).strip().lower()] = col
+
+    # Логируем найденные заголовки (в логи сервера)
+    # print отключены из-за проблем с кодировкой Windows
+
+    # Точный маппинг заголовков (в нижнем регистре) на поля
+    column_map = {
+        # Номер договора
+        'номер договора': 'contract_number',
+        'номера договора': 'contract_number',
+        '№ договора': 'contract_number',
+        '№ номера договора': 'contract_number',
+        'договор №': 'contract_number',
+        'договор': 'contract_number',
+        # Игнорируем столбец с порядковым номером
+        '№': 'ignore',
+        'п/п': 'ignore',
+        '№ п/п': 'ignore',
+        # Дата договора
+        'дата договора': 'contract_date',
+        'даты договора': 'contract_date',
+        'дата': 'contract_date',
+        # ФИО
+        'фио': 'client_name',
+        'фио клиента': 'client_name',
+        'клиент': 'client_name',
+        'заемщик': 'client_name',
+        # ИИН
+        'иин': 'iin',
+        'иин клиента': 'iin',
+        'iin': 'iin',
+        # Основной долг
+        'основной долг': 'principal',
+        'сумма од': 'principal',
+        'сумма основного долга': 'principal',
+        'од': 'principal',
+        # Вознаграждение (проценты)
+        'вознаграждение': 'reward',
+        'сумма вознаграждения': 'reward',
+        'сумма процентов': 'reward',
+        'проценты': 'reward',
+        # Отсроченные проценты / поступления
+        'отсроченные проценты': 'deferred_interest',
+        'сумма отсроченных процентов': 'deferred_interest',
+        'отсроч проценты': 'deferred_interest',
+        'отсроч. проценты': 'deferred_interest',
+        'отсроченн проценты': 'deferred_interest',
+        'отсроченн. проценты': 'deferred_interest',
+        'отсроченные поступления': 'deferred_interest',
+        'сумма отсроченных поступлений': 'deferred_interest',
+        'отсроч поступления': 'deferred_interest',
+        'отсроч. поступления': 'deferred_interest',
+        'отсроченн поступления': 'deferred_interest',
+        'отсроченн. поступления': 'deferred_interest',
+        'отсроченные поступлений': 'deferred_interest',
+        # Пени, штрафы, неустойки (объединенный столбец)
+        'пени, штрафы, неустойки': 'penalties',
+        'пени штрафы неустойки': 'penalties',
+        'пени': 'penalties',
+        # Старые варианты для обратной совместимости (пеня за ОД)
+        'пеня за од': 'penalty_principal_old',
+        'сумма пеня за од': 'penalty_principal_old',
+        'сумма пени за од': 'penalty_principal_old',
+        'неустойка': 'penalty_principal_old',
+        'штраф': 'penalty_principal_old',
+        # Старые варианты для обратной совместимости (пеня за вознаграждение)
+        'пеня за вознаграждение': 'penalty_reward_old',
+        'сумма пеня за вознаграждение': 'penalty_reward_old',
+        'сумма пени за вознаграждение': 'penalty_reward_old',
+        # Административные сборы (включая гос.пошлину)
+        'административные сборы': 'admin_fees',
+        'адм. сборы': 'admin_fees',
+        'адм сборы': 'admin_fees',
+        # Старые варианты гос.пошлины (теперь часть административных сборов)
+        'гос.пошлина': 'admin_fees',
+        'гос. пошлина': 'admin_fees',
+        'госпошлина': 'admin_fees',
+        'сумма госпошлины': 'admin_fees',
+        # Общая сумма (если есть готовое значение в Excel)
+        'сумма займа': 'total',
+        'общая сумма': 'total',
+        'итого': 'total'
+    }
+
+    col_indices = {}
+    for header_name, col_idx in headers.items():
+        header_lower = header_name.lower().strip()
+        # Сначала ищем точное совпадение
+        if header_lower in column_map:
+            field_name = column_map[header_lower]
+            # Пропускаем столбцы, помеченные как ignore
+            if field_name != 'ignore' and field_name not in col_indices:
+                col_indices[field_name] = col_idx
+        else:
+            # Частичное совпадение
+            for key, field_name in column_map.items():
+                if key in header_lower or header_lower in key:
+                    # Пропускаем столбцы, помеченные как ignore
+                    if field_name != 'ignore' and field_name not in col_indices:
+                        col_indices[field_name] = col_idx
+                    break
+
+    clients = []
+    for row in range(2, ws.max_row + 1):
+        if not ws.cell(row=row, column=1).value:
+            continue
+
+        client = {
+            'id': row - 1,
+            'contract_number': '',
+            'contract_date': '',
+            'client_name': '',
+            'iin': '',  # ИИН клиента
+            'principal': 0,
+            'reward': 0,
+            'deferred_interest': 0,
+            'penalties': 0,  # Пени, штрафы, неустойки (объединенные)
+            'admin_fees': 0,  # Административные сборы (включая гос.пошлину)
+            'total': 0,
+            # Временные поля для обратной совместимости
+            'penalty_principal_old': 0,
+            'penalty_reward_old': 0
+        }
+
+        for field_name, col_idx in col_indices.items():
+            value = ws.cell(row=row, column=col_idx).value
+            if value is not None:
+                if field_name == 'iin':
+                    # Особая обработка ИИН для сохранения ведущих нулей
+                    if isinstance(value, (int, float)):
+                        # Если число, преобразуем в строку и дополняем нулями до 12 цифр
+                        str_value = str(int(value)).zfill(12)
+                    else:
+                        # Если строка, просто убираем пробелы
+                        str_value = str(value).strip()
+                    client[field_name] = str_value if str_value else ''
+                elif field_name in ['contract_number', 'contract_date', 'client_name']:
+                    # Преобразуем в строку и убираем пробелы
+                    str_value = str(value).strip()
+                    client[field_name] = str_value if str_value else ''
+                else:
+                    try:
+                        # Округляем до целого (тенге без тиынов)
+                        val = round(float(value)) if value else 0
+                        if field_name == 'admin_fees':
+                            # Суммируем все значения из столбцов гос.пошлины и админ.сборов
+                            client['admin_fees'] += val
+                        else:
+                            client[field_name] = val
+                    except:
+                        if field_name not in ['penalty_principal_old', 'penalty_reward_old']:
+                            client[field_name] = 0
+
+        # Если penalties не был задан напрямую, суммируем из старых столбцов
+        if client['penalties'] == 0:
+            client['penalties'] = client['penalty_principal_old'] + client['penalty_reward_old']
+
+        # Удаляем временные поля
+        del client['penalty_principal_old']
+        del client['penalty_reward_old']
+
+        # Если total не был задан из Excel, рассчитываем его
+        if client['total'] == 0:
+            client['total'] = (
+                client['principal'] + client['reward'] + client['deferred_interest'] +
+                client['penalties'] + client['admin_fees']
+            )
+
+        # Валидация ИИН
+        iin_validation = validate_iin(client['iin'])
+        client['iin_valid'] = iin_validation['valid']
+        client['iin_error'] = iin_validation['error']
+
+        # Пропускаем пустые строки (нет номера договора, ФИО и всех сумм)
+        if not client['contract_number'] and not client['client_name'] and client['total'] == 0:
+            continue
+
+        clients.append(client)
+
+    wb.close()
+    return clients
+
+
+def write_registry(app, path: Path, rows: int):
+    """Синтетический реестр в обычном режиме openpyxl (лист с <dimension>, как у Excel)"""
+    from openpyxl import Workbook
+    from bench_ingest import registry_rows
+
+    headers, values = registry_rows(app, synthetic_clients(rows))
+    wb = Workbook()
+    ws = wb.active
+    ws.append(headers)
+    for row in values:
+        ws.append(row)
+    wb.save(path)
+
+
+def compare(clients: list, expected: list) -> list:
+    """Расхождения: (номер клиента, поле, разбор, эталон)"""
+    mismatches = []
+    if len(clients) != len(expected):
+        mismatches.append((None, 'count', len(clients), len(expected)))
+    for client, reference in zip(clients, expected):
+        for field_name in reference.keys() | dict(client).keys():
+            if client.get(field_name) != reference.get(field_name):
+                mismatches.append((reference['id'], field_name, client.get(field_name), reference.get(field_name)))
+    return mismatches
+
+
+def median_time(func, path: Path, runs: int) -> tuple:
+    """(медиана времени, результат последнего прогона)"""
+    times = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        result = func(path)
+        times.append(time.perf_counter() - start)
+    return statistics.median(times), result
+
+
+def main():
+    parser = argparse.ArgumentParser(description='read_excel_data: потоковый разбор против прежнего')
+    parser.add_argument('files', type=Path, nargs='*')
+    parser.add_argument('--rows', type=int, nargs='*', default=[], help='размеры синтетических реестров')
+    parser.add_argument('--runs', '-n', type=int, default=3)
+    args = parser.parse_args()
+
+    app = load_app()
+    tmp = tempfile.TemporaryDirectory(prefix="bench-read-excel-")
+    files = list(args.files) or ([] if args.rows else DEFAULT_FILES)
+    for rows in args.rows:
+        path = Path(tmp.name) / f"synthetic-{rows}.xlsx"
+        write_registry(app, path, rows)
+        files.append(path)
+
+    failed = False
+    print(f"{'файл':<36} {'клиентов':>9} {'прежний, с':>11} {'потоковый, с':>13} {'ускорение':>10}")
+    for path in files:
+        reference_time, expected = median_time(reference_read_excel_data, path, args.runs)
+        stream_time, clients = median_time(app.read_excel_data, path, args.runs)
+        print(f"{path.name:<36} {len(clients):>9} {reference_time:>11.3f} {stream_time:>13.3f} "
+              f"{reference_time / stream_time:>9.1f}x")
+
+        mismatches = compare(clients, expected)
+        if mismatches:
+            failed = True
+            for client_id, field_name, value, reference in mismatches[:10]:
+                print(f"  ✗ клиент {client_id}, {field_name}: {value!r} != {reference!r}")
+            if len(mismatches) > 10:
+                print(f"  ✗ и ещё {len(mismatches) - 10} расхождений")
+
+    tmp.cleanup()
+    if failed:
+        sys.exit(1)
+    print("Клиенты совпадают поле за полем")
+
+
+if __name__ == '__main__':
+    main()
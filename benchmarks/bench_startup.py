@@ -0,0 +1,95 @@
+# -*- coding: utf-8 -*-
+"""
+Бенчмарк: время холодного старта приложения
+
+Каждый замер - отдельный процесс Python (как новый процесс uvicorn):
+
+    import app     - импорт webapp/app.py
+    first_pdf      - первая PDF справка в этом процессе (импорт reportlab,
+                     регистрация шрифтов)
+
+Печатается медиана и разброс по --runs запускам. С --max-seconds скрипт
+завершается с кодом 1, если медиана импорта больше порога. Порог импорта
+и отсутствие тяжёлых модулей проверяет также tests/test_startup.py.
+
+Использование:
+    python benchmarks/bench_startup.py
+    python benchmarks/bench_startup.py --runs 10 --max-seconds 0.8
+"""
+
+import sys
+import json
+import argparse
+import statistics
+import subprocess
+
+from common import PROJECT_DIR, WEBAPP_DIR
+
+REPORT_DATE = "22.12.2025"
+MANAGER = "Койбасова Е.Б."
+
+# Выполняется в дочернем процессе; argv[1] - папка бенчмарков
+PROBE = r'''
+import io, sys, json, time
+start = time.perf_counter()
+import app
+imported = time.perf_counter()
+heavy = sorted(m for m in ('openpyxl', 'reportlab', 'numpy', 'pandas') if m in sys.modules)
+
+sys.path.insert(0, sys.argv[1])
+from common import synthetic_clients
+client = synthetic_clients(1)[0]
+
+pdf_start = time.perf_counter()
+app.PdfCertificateTemplate(sys.argv[2], sys.argv[3]).render(client, io.BytesIO())
+print(json.dumps({
+    "import": imported - start,
+    "first_pdf": time.perf_counter() - pdf_start,
+    "heavy_modules": heavy
+}))
+'''
+
+
+def probe() -> dict:
+    """Один холодный запуск в новом процессе"""
+    result = subprocess.run(
+        [sys.executable, '-c', PROBE, str(PROJECT_DIR / "benchmarks"), REPORT_DATE, MANAGER],
+        cwd=WEBAPP_DIR, capture_output=True, text=True, check=True
+    )
+    # Последняя строка - JSON, выше - сообщения приложения
+    return json.loads(result.stdout.strip().splitlines()[-1])
+
+
+def summary(values: list) -> str:
+    return (f"медиана {statistics.median(values) * 1000:>7.1f} мс  "
+            f"мин {min(values) * 1000:>7.1f}  макс {max(values) * 1000:>7.1f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Время холодного импорта приложения и первой PDF справки')
+    parser.add_argument('--runs', '-n', type=int, default=5)
+    parser.add_argument('--max-seconds', type=float, default=0,
+                        help='порог медианы импорта app, сек (0 - без проверки)')
+    args = parser.parse_args()
+
+    imports, first_pdf = [], []
+    heavy = set()
+    for _ in range(args.runs):
+        result = probe()
+        imports.append(result['import'])
+        first_pdf.append(result['first_pdf'])
+        heavy.update(result['heavy_modules'])
+
+    print(f"import app    {summary(imports)}")
+    print(f"first_pdf     {summary(first_pdf)}")
+    if heavy:
+        print(f"⚠ При импорте app загружены: {', '.join(sorted(heavy))}")
+
+    median = statistics.median(imports)
+    if args.max_seconds and median > args.max_seconds:
+        print(f"✗ Импорт app {median:.3f} с > {args.max_seconds:.3f} с")
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,339 @@
+# -*- coding: utf-8 -*-
+"""
+Сквозной бенчмарк массовой генерации на синтетических реестрах
+
+Для каждого размера реестра (по умолчанию 100, 1k, 10k, 100k строк,
+заголовки из create_template.py) отдельно замеряются этапы:
+
+    read_excel_data           - разбор реестра
+    create_excel_certificate  - справка Excel (по одной, без шаблона пакета)
+    create_pdf_certificate    - справка PDF (по одной, без шаблона пакета)
+    create_zip_archive        - архив из справок предыдущих этапов
+    generate                  - POST /upload + POST /generate + опрос задачи
+                                через TestClient (формат both, без кэша справок)
+
+По каждому этапу: время, пропускная способность, пиковый RSS за этап и
+p50/p95 задержки на справку. Результаты пишутся в JSON для сравнения
+прогонов.
+
+Поштучные этапы на больших реестрах идут часами, поэтому они выполняются
+для первых --sample клиентов, а generate - только для реестров до
+--e2e-max строк (0 - без ограничений).
+
+Использование:
+    python benchmarks/bench_suite.py
+    python benchmarks/bench_suite.py --sizes 100 1000 --output before.json
+    python benchmarks/bench_suite.py --sample 0 --e2e-max 0    # полный прогон
+"""
+
+import os
+import sys
+import json
+import time
+import shutil
+import platform
+import argparse
+import tempfile
+import threading
+import subprocess
+from datetime import datetime
+from pathlib import Path
+
+from common import PROJECT_DIR, load_app, synthetic_clients, template_headers
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+REPORT_DATE = "22.12.2025"
+MANAGER = "Койбасова Е.Б."
+STAGES = ['read_excel_data', 'create_excel_certificate', 'create_pdf_certificate', 'create_zip_archive', 'generate']
+
+
+# ============================================================================
+# ИЗМЕРЕНИЯ
+# ============================================================================
+
+def current_rss() -> int:
+    """Текущий RSS процесса, байт (0, если недоступен)"""
+    try:
+        with open('/proc/self/statm') as f:
+            return int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE')
+    except (OSError, ValueError, AttributeError):
+        return 0
+
+
+def process_peak_rss() -> int:
+    """Пиковый RSS процесса за всё время работы, байт"""
+    if resource is None:
+        return 0
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak if sys.platform == 'darwin' else peak * 1024
+
+
+class RssSampler:
+    """Пиковый RSS за время этапа: фоновый поток опрашивает /proc/self/statm"""
+
+    def __init__(self, interval: float = 0.005):
+        self.interval = interval
+        self.peak = 0
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+
+    def _run(self):
+        while not self._stop.is_set():
+            self.peak = max(self.peak, current_rss())
+            self._stop.wait(self.interval)
+
+    def __enter__(self):
+        self.peak = current_rss()
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self._stop.set()
+        self._thread.join()
+        # Без /proc - пик процесса целиком
+        self.peak = max(self.peak, current_rss()) or process_peak_rss()
+
+
+def percentile(values: list, p: float) -> float:
+    """Перцентиль методом ближайшего ранга"""
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    rank = max(1, -(-len(ordered) * p // 100))
+    return ordered[int(rank) - 1]
+
+
+def stage_result(size: int, stage: str, items: int, seconds: float, peak_rss: int,
+                 latencies: list = None, **extra) -> dict:
+    result = {
+        'size': size,
+        'stage': stage,
+        'items': items,
+        'seconds': round(seconds, 4),
+        'throughput': round(items / seconds, 2) if seconds else None,
+        'peak_rss_mb': round(peak_rss / 1024 ** 2, 1),
+        'p50_ms': round(percentile(latencies, 50) * 1000, 3) if latencies else None,
+        'p95_ms': round(percentile(latencies, 95) * 1000, 3) if latencies else None,
+    }
+    result.update(extra)
+    return result
+
+
+# ============================================================================
+# РЕЕСТРЫ
+# ============================================================================
+
+def build_registry(app, path: Path, clients: list):
+    """Реестр Excel с заголовками шаблона (write_only - быстро и без лишней памяти)"""
+    from openpyxl import Workbook
+
+    headers = template_headers()
+    columns = app.COLUMN_RESOLVER.resolve(tuple(headers)).fields
+
+    wb = Workbook(write_only=True)
+    ws = wb.create_sheet("Данные клиентов")
+    ws.append(headers)
+    for client in clients:
+        # В шаблоне пени разделены на пеню за ОД и пеню за вознаграждение
+        values = dict(client)
+        values['penalty_principal_old'] = client['penalties'] // 2
+        values['penalty_reward_old'] = client['penalties'] - client['penalties'] // 2
+        row = [None] * len(headers)
+        for field_name, col_idx in columns.items():
+            row[col_idx - 1] = values.get(field_name)
+        ws.append(row)
+    wb.save(path)
+
+
+# ============================================================================
+# ЭТАПЫ
+# ============================================================================
+
+def bench_read(app, size: int, registry: Path) -> dict:
+    with RssSampler() as rss:
+        start = time.perf_counter()
+        clients = app.read_excel_data(registry)
+        elapsed = time.perf_counter() - start
+    if len(clients) != size:
+        raise AssertionError(f"read_excel_data: {len(clients)} клиентов вместо {size}")
+    return stage_result(size, 'read_excel_data', size, elapsed, rss.peak)
+
+
+def bench_certificates(app, size: int, stage: str, clients: list, output_dir: Path) -> tuple:
+    """Поштучная генерация справок; возвращает (результат, файлы)"""
+    func, ext = {
+        'create_excel_certificate': (app.create_excel_certificate, 'xlsx'),
+        'create_pdf_certificate': (app.create_pdf_certificate, 'pdf'),
+    }[stage]
+    output_dir.mkdir(exist_ok=True)
+
+    files = []
+    latencies = []
+    with RssSampler() as rss:
+        start = time.perf_counter()
+        for client in clients:
+            path = output_dir / f"{app.certificate_filename(client)}.{ext}"
+            t = time.perf_counter()
+            func(client, REPORT_DATE, MANAGER, path)
+            latencies.append(time.perf_counter() - t)
+            files.append(path)
+        elapsed = time.perf_counter() - start
+    return stage_result(size, stage, len(clients), elapsed, rss.peak, latencies), files
+
+
+def bench_zip(app, size: int, files: list, output_path: Path) -> dict:
+    with RssSampler() as rss:
+        start = time.perf_counter()
+        app.create_zip_archive(files, output_path)
+        elapsed = time.perf_counter() - start
+    input_mb = sum(f.stat().st_size for f in files) / 1024 ** 2
+    return stage_result(size, 'create_zip_archive', len(files), elapsed, rss.peak,
+                        input_mb=round(input_mb, 2), mb_per_s=round(input_mb / elapsed, 2) if elapsed else None)
+
+
+def bench_generate(app, client, size: int, registry: Path) -> dict:
+    """Загрузка реестра и генерация (both) через HTTP API, как из браузера"""
+    auth = next(iter(app.USERS.items()))
+
+    with RssSampler() as rss:
+        start = time.perf_counter()
+        with open(registry, 'rb') as f:
+            response = client.post('/upload', files={'file': (registry.name, f)}, auth=auth)
+        response.raise_for_status()
+        session_id = response.json()['session_id']
+        uploaded = time.perf_counter()
+
+        response = client.post(f'/generate/{session_id}', auth=auth, data={
+            'report_date': REPORT_DATE, 'manager': MANAGER, 'format_type': 'both'
+        })
+        response.raise_for_status()
+        job_id = response.json()['job_id']
+        while True:
+            job = client.get(f'/jobs/{job_id}', auth=auth).json()
+            if job['status'] in ('done', 'failed'):
+                break
+            time.sleep(0.05)
+        elapsed = time.perf_counter() - start
+
+    if job['status'] != 'done':
+        raise RuntimeError(f"Генерация завершилась с ошибкой: {job['error']}")
+    return stage_result(size, 'generate', size, elapsed, rss.peak,
+                        upload_seconds=round(uploaded - start, 4),
+                        failed=job['failed_count'])
+
+
+# ============================================================================
+# ЗАПУСК
+# ============================================================================
+
+def git_commit() -> str:
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=PROJECT_DIR,
+                              capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return ''
+
+
+def print_result(result: dict):
+    p50 = f"{result['p50_ms']:.2f}" if result['p50_ms'] is not None else '-'
+    p95 = f"{result['p95_ms']:.2f}" if result['p95_ms'] is not None else '-'
+    print(f"{result['size']:>8} {result['stage']:<26} {result['items']:>8} {result['seconds']:>9.2f} "
+          f"{result['throughput'] or 0:>10.1f} {result['peak_rss_mb']:>9.1f} {p50:>8} {p95:>8}", flush=True)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Бенчмарк этапов массовой генерации справок')
+    parser.add_argument('--sizes', type=int, nargs='+', default=[100, 1_000, 10_000, 100_000])
+    parser.add_argument('--stages', nargs='+', choices=STAGES, default=STAGES)
+    parser.add_argument('--sample', type=int, default=2_000,
+                        help='клиентов для поштучных этапов (0 - все)')
+    parser.add_argument('--e2e-max', type=int, default=10_000,
+                        help='максимальный размер реестра для этапа generate (0 - все)')
+    parser.add_argument('--output', '-o', type=Path,
+                        default=Path(f"bench-suite-{datetime.now():%Y%m%d-%H%M%S}.json"))
+    parser.add_argument('--keep', action='store_true', help='не удалять реестры и справки')
+    args = parser.parse_args()
+
+    work_dir = Path(tempfile.mkdtemp(prefix="bench_suite_"))
+
+    # Приложение работает во временной папке: история, загрузки и архивы не
+    # попадают в webapp/, кэш справок и очистка выключены
+    os.environ.setdefault('HISTORY_DB_PATH', str(work_dir / "history.db"))
+    os.environ.setdefault('RENDER_CACHE_ENABLED', '0')
+    os.environ.setdefault('JANITOR_INTERVAL', '0')
+    app = load_app()
+    for name in ('UPLOAD_DIR', 'GENERATED_DIR'):
+        path = work_dir / name.lower()
+        path.mkdir()
+        setattr(app, name, path)
+    app.UPLOAD_BLOBS_DIR = app.UPLOAD_DIR / "_blobs"
+
+    client = None
+    if 'generate' in args.stages:
+        from fastapi.testclient import TestClient
+        client = TestClient(app.app)
+
+    report = {
+        'meta': {
+            'started_at': datetime.now().isoformat(timespec='seconds'),
+            'commit': git_commit(),
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'cpu_count': os.cpu_count(),
+            'generation_workers': app.GENERATION_WORKERS,
+            'sizes': args.sizes,
+            'sample': args.sample,
+            'e2e_max': args.e2e_max,
+        },
+        'results': []
+    }
+
+    print(f"{'строк':>8} {'этап':<26} {'объём':>8} {'время, с':>9} {'в сек':>10} {'RSS, МБ':>9} "
+          f"{'p50, мс':>8} {'p95, мс':>8}")
+    try:
+        for size in args.sizes:
+            size_dir = work_dir / str(size)
+            size_dir.mkdir()
+            clients = synthetic_clients(size)
+            registry = size_dir / f"registry_{size}.xlsx"
+            build_registry(app, registry, clients)
+
+            sample = clients[:args.sample] if args.sample else clients
+            files = []
+            results = []
+
+            if 'read_excel_data' in args.stages:
+                results.append(bench_read(app, size, registry))
+            for stage in ('create_excel_certificate', 'create_pdf_certificate'):
+                if stage in args.stages:
+                    result, stage_files = bench_certificates(app, size, stage, sample, size_dir / stage)
+                    results.append(result)
+                    files.extend(stage_files)
+            if 'create_zip_archive' in args.stages and files:
+                results.append(bench_zip(app, size, files, size_dir / "certificates.zip"))
+            if client and (not args.e2e_max or size <= args.e2e_max):
+                results.append(bench_generate(app, client, size, registry))
+
+            for result in results:
+                print_result(result)
+            report['results'].extend(results)
+
+            if not args.keep:
+                shutil.rmtree(size_dir)
+    finally:
+        report['meta']['finished_at'] = datetime.now().isoformat(timespec='seconds')
+        report['meta']['process_peak_rss_mb'] = round(process_peak_rss() / 1024 ** 2, 1)
+        args.output.write_text(json.dumps(report, ensure_ascii=False, indent=2), encoding='utf-8')
+        print(f"Результаты: {args.output}")
+        if args.keep:
+            print(f"Файлы: {work_dir}")
+        else:
+            shutil.rmtree(work_dir, ignore_errors=True)
+
+
+if __name__ == '__main__':
+    main()
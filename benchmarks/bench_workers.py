@@ -0,0 +1,58 @@
+# -*- coding: utf-8 -*-
+"""
+Бенчмарк: масштабирование generate_all_certificates по числу процессов
+
+Использование:
+    python benchmarks/bench_workers.py --clients 500 --format both --workers 1 2 4 8 16
+"""
+
+import os
+import time
+import shutil
+import argparse
+import tempfile
+from pathlib import Path
+
+from common import load_app, synthetic_clients
+
+
+def run(app, clients, formats, workers):
+    output_dir = Path(tempfile.mkdtemp(prefix="bench_workers_"))
+    try:
+        start = time.perf_counter()
+        generated = app.generate_all_certificates(
+            clients, "22.12.2025", "Койбасова Е.Б.", output_dir, formats, workers=workers
+        )
+        elapsed = time.perf_counter() - start
+    finally:
+        shutil.rmtree(output_dir, ignore_errors=True)
+
+    files = len(generated['excel']) + len(generated['pdf'])
+    return elapsed, files
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Масштабирование генерации справок по числу процессов')
+    parser.add_argument('--clients', '-n', type=int, default=200)
+    parser.add_argument('--format', '-f', choices=['excel', 'pdf', 'both'], default='both')
+    parser.add_argument('--workers', '-w', type=int, nargs='+',
+                        default=sorted({1, 2, 4, os.cpu_count() or 1}))
+    args = parser.parse_args()
+
+    app = load_app()
+    clients = synthetic_clients(args.clients)
+    formats = ['excel', 'pdf'] if args.format == 'both' else [args.format]
+
+    print(f"Клиентов: {args.clients}, формат: {args.format}, CPU: {os.cpu_count()}")
+    print(f"{'процессов':>10} {'время, с':>10} {'справок/с':>10} {'ускорение':>10}")
+
+    baseline = None
+    for workers in args.workers:
+        elapsed, files = run(app, clients, formats, workers)
+        rate = args.clients / elapsed
+        baseline = baseline or rate
+        print(f"{workers:>10} {elapsed:>10.2f} {rate:>10.1f} {rate / baseline:>9.2f}x")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,79 @@
+# -*- coding: utf-8 -*-
+"""
+Общие функции для бенчмарков: импорт веб-приложения и синтетические клиенты
+"""
+
+import ast
+import sys
+import random
+from pathlib import Path
+
+PROJECT_DIR = Path(__file__).parent.parent
+WEBAPP_DIR = PROJECT_DIR / "webapp"
+
+sys.path.insert(0, str(WEBAPP_DIR))
+sys.path.insert(0, str(PROJECT_DIR / "scripts"))
+
+LAST_NAMES = ['Иванов', 'Петрова', 'Камилова', 'Адильбекова', 'Құралова', 'Сергеев', 'Нурланов']
+FIRST_NAMES = ['Иван', 'Мария', 'Шахноза', 'Урзада', 'Ақмарал', 'Алексей', 'Дамир']
+
+
+def template_headers() -> list:
+    """
+    Заголовки столбцов из create_template.py
+
+    Скрипт при импорте создаёт файл, поэтому список headers берётся из его
+    исходного кода - раскладка реестров в бенчмарках всегда совпадает с шаблоном.
+    """
+    tree = ast.parse((PROJECT_DIR / "create_template.py").read_text(encoding='utf-8'))
+    for node in tree.body:
+        if isinstance(node, ast.Assign) and any(getattr(t, 'id', None) == 'headers' for t in node.targets):
+            return ast.literal_eval(node.value)
+    raise LookupError("В create_template.py нет списка headers")
+
+
+def load_app():
+    """Импорт модуля webapp/app.py"""
+    import app
+    return app
+
+
+def synthetic_iin(rng: random.Random) -> str:
+    """Корректный ИИН: дата рождения 1940-2005, век и пол, контрольная цифра"""
+    from iin import iin_check_digit
+
+    while True:
+        year = rng.randint(1940, 2005)
+        century_digit = rng.choice((3, 4) if year < 2000 else (5, 6))
+        digits = f"{year % 100:02d}{rng.randint(1, 12):02d}{rng.randint(1, 28):02d}{century_digit}{rng.randint(0, 9999):04d}"
+        check = iin_check_digit(digits)
+        if check is not None:
+            return f"{digits}{check}"
+
+
+def synthetic_clients(count: int, seed: int = 42) -> list:
+    """Синтетические клиенты в нормализованном виде (как после read_excel_data)"""
+    rng = random.Random(seed)
+    clients = []
+    for i in range(1, count + 1):
+        principal = rng.randint(50_000, 10_000_000)
+        reward = rng.randint(0, 1_000_000)
+        deferred = rng.choice([0, 0, rng.randint(1_000, 100_000)])
+        penalties = rng.choice([0, rng.randint(100, 500_000)])
+        admin_fees = rng.choice([0, 0, rng.randint(1_000, 20_000)])
+        clients.append({
+            'id': i,
+            'contract_number': f"1701-{10000 + i}-2025",
+            'contract_date': f"{rng.randint(1, 28):02d}.{rng.randint(1, 12):02d}.2024",
+            'client_name': f"{rng.choice(LAST_NAMES)} {rng.choice(FIRST_NAMES)} {i}",
+            'iin': synthetic_iin(rng),
+            'principal': principal,
+            'reward': reward,
+            'deferred_interest': deferred,
+            'penalties': penalties,
+            'admin_fees': admin_fees,
+            'total': principal + reward + deferred + penalties + admin_fees,
+            'iin_valid': True,
+            'iin_error': None
+        })
+    return clients
@@ -0,0 +1,167 @@
+# -*- coding: utf-8 -*-
+"""
+Маппинг заголовков Excel на поля клиента
+
+Единая таблица синонимов заголовков для веб-приложения и CLI.
+HeaderResolver компилирует её один раз: словарь точных совпадений и
+упорядоченный список ключей для частичного совпадения. Результат
+разбора кэшируется по строке заголовков, поэтому повторные загрузки
+файлов с той же раскладкой столбцов не разбирают заголовки заново.
+"""
+
+from dataclasses import dataclass
+from functools import lru_cache
+from types import MappingProxyType
+from typing import Dict, Mapping, Optional, Tuple
+
+IGNORE = 'ignore'
+
+# Синонимы заголовков (в нижнем регистре) -> поле.
+# Порядок важен: при частичном совпадении побеждает первый подходящий ключ.
+COLUMN_ALIASES = {
+    # Номер договора
+    'номер договора': 'contract_number',
+    'номера договора': 'contract_number',
+    '№ договора': 'contract_number',
+    '№ номера договора': 'contract_number',
+    'договор №': 'contract_number',
+    'договор': 'contract_number',
+    # Игнорируем столбец с порядковым номером
+    '№': IGNORE,
+    'п/п': IGNORE,
+    '№ п/п': IGNORE,
+    # Дата договора
+    'дата договора': 'contract_date',
+    'даты договора': 'contract_date',
+    'дата': 'contract_date',
+    # ФИО
+    'фио': 'client_name',
+    'фио клиента': 'client_name',
+    'клиент': 'client_name',
+    'заемщик': 'client_name',
+    # ИИН
+    'иин': 'iin',
+    'иин клиента': 'iin',
+    'iin': 'iin',
+    # Основной долг
+    'основной долг': 'principal',
+    'сумма од': 'principal',
+    'сумма основного долга': 'principal',
+    'од': 'principal',
+    # Вознаграждение (проценты)
+    'вознаграждение': 'reward',
+    'сумма вознаграждения': 'reward',
+    'сумма процентов': 'reward',
+    'проценты': 'reward',
+    # Отсроченные проценты / поступления
+    'отсроченные проценты': 'deferred_interest',
+    'сумма отсроченных процентов': 'deferred_interest',
+    'отсроч проценты': 'deferred_interest',
+    'отсроч. проценты': 'deferred_interest',
+    'отсроченн проценты': 'deferred_interest',
+    'отсроченн. проценты': 'deferred_interest',
+    'отсроченные поступления': 'deferred_interest',
+    'сумма отсроченных поступлений': 'deferred_interest',
+    'отсроч поступления': 'deferred_interest',
+    'отсроч. поступления': 'deferred_interest',
+    'отсроченн поступления': 'deferred_interest',
+    'отсроченн. поступления': 'deferred_interest',
+    'отсроченные поступлений': 'deferred_interest',
+    # Пени, штрафы, неустойки (объединенный столбец)
+    'пени, штрафы, неустойки': 'penalties',
+    'пени штрафы неустойки': 'penalties',
+    'пени': 'penalties',
+    # Старые варианты для обратной совместимости (пеня за ОД)
+    'пеня за од': 'penalty_principal_old',
+    'сумма пеня за од': 'penalty_principal_old',
+    'сумма пени за од': 'penalty_principal_old',
+    'неустойка': 'penalty_principal_old',
+    'штраф': 'penalty_principal_old',
+    # Старые варианты для обратной совместимости (пеня за вознаграждение)
+    'пеня за вознаграждение': 'penalty_reward_old',
+    'сумма пеня за вознаграждение': 'penalty_reward_old',
+    'сумма пени за вознаграждение': 'penalty_reward_old',
+    # Административные сборы
+    'административные сборы': 'admin_fees',
+    'адм. сборы': 'admin_fees',
+    'адм сборы': 'admin_fees',
+    # Гос.пошлина (веб-приложение учитывает её в административных сборах)
+    'гос.пошлина': 'state_fee',
+    'гос. пошлина': 'state_fee',
+    'госпошлина': 'state_fee',
+    'сумма госпошлины': 'state_fee',
+    # Общая сумма (если есть готовое значение в Excel)
+    'сумма займа': 'total',
+    'общая сумма': 'total',
+    'итого': 'total'
+}
+
+
+@dataclass(frozen=True)
+class ColumnMapping:
+    """
+    Результат разбора строки заголовков
+
+    fields: поле -> номер столбца (с 1), только для чтения
+    details: по одному словарю на заголовок (для отладки маппинга)
+    """
+    fields: Mapping[str, int]
+    details: Tuple[dict, ...]
+
+
+class HeaderResolver:
+    """Скомпилированная таблица синонимов с кэшем по строке заголовков"""
+
+    def __init__(self, aliases: Dict[str, str] = COLUMN_ALIASES,
+                 rename: Optional[Dict[str, str]] = None, cache_size: int = 128):
+        rename = rename or {}
+        compiled = [(key, rename.get(field, field)) for key, field in aliases.items()]
+        self.exact = dict(compiled)
+        self.partial = tuple(compiled)
+        self.resolve = lru_cache(maxsize=cache_size)(self._resolve)
+
+    def _match(self, header: str) -> Tuple[Optional[str], Optional[str], Optional[str]]:
+        """(поле, ключ, тип совпадения) для заголовка в нижнем регистре"""
+        field = self.exact.get(header)
+        if field is not None:
+            return field, header, 'exact'
+        for key, field in self.partial:
+            if key in header or header in key:
+                return field, key, 'partial'
+        return None, None, None
+
+    def _resolve(self, header_row: Tuple) -> ColumnMapping:
+        """
+        Маппинг для первой строки листа (кортеж значений ячеек)
+
+        Каждое поле берётся из первого подходящего столбца, столбцы с
+        полем ignore пропускаются.
+        """
+        headers = {}
+        for col, val in enumerate(header_row, start=1):
+            if val:
+                headers[str(val).strip().lower()] = col
+
+        fields = {}
+        matches = []
+        for header, col_idx in headers.items():
+            field, key, match_type = self._match(header)
+            assigned = field is not None and field != IGNORE and field not in fields
+            if assigned:
+                fields[field] = col_idx
+            matches.append((header, col_idx, assigned, key, match_type))
+
+        by_column = {col_idx: field for field, col_idx in fields.items()}
+        details = tuple(
+            {
+                "column_index": col_idx,
+                "header_lower": header,
+                "matched": assigned,
+                "match_type": match_type if assigned else None,
+                "matched_key": key if assigned else None,
+                "field_name": by_column.get(col_idx)
+            }
+            for header, col_idx, assigned, key, match_type in matches
+        )
+        return ColumnMapping(fields=MappingProxyType(fields), details=details)
+
@@ -7,6 +7,7 @@ SwissCapital - Республика Казахстан
     python generate_certificates.py --date "22.12.2025" --format excel
     python generate_certificates.py --date "22.12.2025" --format pdf
     python generate_certificates.py --date "22.12.2025" --format both
+    python generate_certificates.py --date "22.12.2025" --format combined
 """
 
 import os
@@ -25,6 +26,7 @@ except ImportError:
     sys.exit(1)
 
 from num2text import number_to_text, format_number_with_text
+from column_mapping import HeaderResolver, IGNORE
 
 # Пути
 SCRIPT_DIR = Path(__file__).parent
@@ -43,6 +45,14 @@ COMPANY_INFO = {
 
 DEFAULT_MANAGER = "Койбасова Е.Б."
 
+# Маппинг заголовков (общий с веб-приложением) на поля справки CLI
+COLUMN_RESOLVER = HeaderResolver(rename={
+    'penalties': 'penalty_principal',
+    'penalty_principal_old': 'penalty_principal',
+    'penalty_reward_old': 'penalty_reward',
+    'iin': IGNORE,  # ИИН в справке CLI не выводится
+})
+
 
 def format_date_russian(date_str):
     """Форматировать дату в русском формате"""
@@ -76,72 +86,9 @@ def read_clients_data(file_path):
     wb = load_workbook(file_path)
     ws = wb.active
 
-    # Найти заголовки
-    headers = {}
-    for col in range(1, ws.max_column + 1):
-        cell_value = ws.cell(row=1, column=col).value
-        if cell_value:
-            headers[cell_value.strip().lower()] = col
-
-    # Маппинг колонок
-    column_map = {
-        # Игнорируем столбец с порядковым номером
-        '№': 'ignore',
-        'п/п': 'ignore',
-        '№ п/п': 'ignore',
-        # Номер договора
-        'номер договора': 'contract_number',
-        'номера договора': 'contract_number',
-        '№ договора': 'contract_number',
-        '№ номера договора': 'contract_number',
-        # Дата договора
-        'дата договора': 'contract_date',
-        'даты договора': 'contract_date',
-        # ФИО
-        'фио': 'client_name',
-        'фио клиента': 'client_name',
-        # Основной долг
-        'основной долг': 'principal',
-        'сумма од': 'principal',
-        'од': 'principal',
-        # Вознаграждение (проценты)
-        'вознаграждение': 'reward',
-        'сумма вознаграждения': 'reward',
-        'сумма процентов': 'reward',
-        'проценты': 'reward',
-        # Отсроченные проценты
-        'отсроченные проценты': 'deferred_interest',
-        'сумма отсроченных процентов': 'deferred_interest',
-        # Пеня за ОД
-        'пеня за од': 'penalty_principal',
-        'сумма пеня за од': 'penalty_principal',
-        'сумма пени за од': 'penalty_principal',
-        # Пеня за вознаграждение
-        'пеня за вознаграждение': 'penalty_reward',
-        'сумма пеня за вознаграждение': 'penalty_reward',
-        'сумма пени за вознаграждение': 'penalty_reward',
-        # Гос.пошлина
-        'гос.пошлина': 'state_fee',
-        'госпошлина': 'state_fee',
-        'сумма госпошлины': 'state_fee',
-        # Административные сборы
-        'административные сборы': 'admin_fees',
-        'адм. сборы': 'admin_fees',
-        # Общая сумма
-        'сумма займа': 'total',
-        'общая сумма': 'total',
-        'итого': 'total'
-    }
-
-    # Найти соответствия
-    col_indices = {}
-    for header_name, col_idx in headers.items():
-        for key, field_name in column_map.items():
-            if key in header_name.lower():
-                # Пропускаем столбцы, помеченные как ignore
-                if field_name != 'ignore' and field_name not in col_indices:
-                    col_indices[field_name] = col_idx
-                break
+    # Найти соответствия заголовков полям
+    header_row = [ws.cell(row=1, column=col).value for col in range(1, ws.max_column + 1)]
+    col_indices = COLUMN_RESOLVER.resolve(tuple(header_row)).fields
 
     # Читаем данные
     clients = []
@@ -349,6 +296,44 @@ def create_certificate_excel(client, report_date, manager_name, output_path):
     wb.close()
 
 
+def create_combined_pdf(clients, report_date, manager_name, output_path):
+    """
+    Создать один PDF со всеми справками (по странице на клиента)
+
+    Использует PDF шаблон веб-приложения (webapp/certificates.py - без
+    запуска самого приложения), поэтому нужен reportlab:
+    pip install -r webapp/requirements.txt
+    """
+    sys.path.insert(0, str(PROJECT_DIR / "webapp"))
+    try:
+        from certificates import PdfCertificateTemplate
+    except ImportError as e:
+        print(f"Ошибка: для PDF установите зависимости: pip install -r webapp/requirements.txt ({e})")
+        sys.exit(1)
+
+    # Приводим поля к формату веб-приложения
+    web_clients = []
+    for i, client in enumerate(clients, 1):
+        web_clients.append({
+            'id': i,
+            'contract_number': client['contract_number'],
+            'contract_date': client['contract_date'],
+            'client_name': client['client_name'],
+            'iin': '',
+            'principal': client['principal'],
+            'reward': client['reward'],
+            'deferred_interest': client['deferred_interest'],
+            'penalties': client['penalty_principal'] + client['penalty_reward'],
+            'admin_fees': client['state_fee'] + client['admin_fees'],
+            'total': client['total']
+        })
+
+    template = PdfCertificateTemplate(report_date, manager_name)
+    failed = template.render_combined(web_clients, output_path)
+    for item in failed:
+        print(f"   [!] Справка #{item['id']} не создана: {item['error']}")
+
+
 def generate_certificates(data_file, report_date, output_format='excel', manager_name=DEFAULT_MANAGER):
     """
     Генерировать справки для всех клиентов
@@ -356,7 +341,7 @@ def generate_certificates(data_file, report_date, output_format='excel', manager
     Args:
         data_file: путь к файлу с данными клиентов
         report_date: дата отчёта (строка в формате DD.MM.YYYY)
-        output_format: формат вывода ('excel', 'pdf', 'both')
+        output_format: формат вывода ('excel', 'pdf', 'both', 'combined')
         manager_name: имя операционного менеджера
     """
     # Создаём папку для вывода
@@ -376,6 +361,14 @@ def generate_certificates(data_file, report_date, output_format='excel', manager
     batch_dir = OUTPUT_DIR / f"batch_{date_folder}"
     batch_dir.mkdir(parents=True, exist_ok=True)
 
+    # Один PDF на весь пакет
+    if output_format == 'combined':
+        combined_path = batch_dir / "certificates_combined.pdf"
+        print(f"Создание общего PDF: {len(clients)} страниц")
+        create_combined_pdf(clients, report_date, manager_name, combined_path)
+        print(f"\nГотово! Справки сохранены в: {combined_path}")
+        return
+
     # Генерируем справки
     for i, client in enumerate(clients, 1):
         # Формируем имя файла
@@ -419,9 +412,9 @@ def main():
     )
     parser.add_argument(
         '--format', '-f',
-        choices=['excel', 'pdf', 'both'],
+        choices=['excel', 'pdf', 'both', 'combined'],
         default='excel',
-        help='Формат вывода (по умолчанию: excel)'
+        help='Формат вывода (по умолчанию: excel; combined - все справки одним PDF)'
     )
     parser.add_argument(
         '--manager', '-m',
@@ -2,8 +2,15 @@
 """
 Модуль для конвертации чисел в текст на русском языке
 Поддержка валюты: тенге
+
+Тексты для всех групп 0-999 с названием разряда (тысячи, миллионы...)
+вычисляются один раз при импорте, поэтому number_to_text только склеивает
+готовые строки. Результаты публичных функций кэшируются (LRU).
 """
 
+from functools import lru_cache
+from typing import Iterable, List
+
 ONES = {
     0: '', 1: 'один', 2: 'два', 3: 'три', 4: 'четыре',
     5: 'пять', 6: 'шесть', 7: 'семь', 8: 'восемь', 9: 'девять',
@@ -82,6 +89,32 @@ def convert_group(n, feminine=False):
     return ' '.join(result)
 
 
+def _build_group_tables():
+    """
+    Таблицы текстов групп: GROUP_WORDS[разряд][0..999]
+
+    Для разряда 0 - просто число прописью, для остальных - вместе с
+    названием разряда в нужной форме ("две тысячи", "пять миллионов").
+    """
+    tables = []
+    for group_index, forms in enumerate(UNITS):
+        feminine = (forms[3] == 'f')  # тысячи - женский род
+        table = ['']
+        for group in range(1, 1000):
+            text = convert_group(group, feminine)
+            if group_index > 0:
+                text = f"{text} {get_plural_form(group, forms[:3])}"
+            table.append(text)
+        tables.append(table)
+    return tables
+
+
+GROUP_WORDS = _build_group_tables()
+
+CACHE_SIZE = 65536
+
+
+@lru_cache(maxsize=CACHE_SIZE)
 def number_to_text(n):
     """
     Конвертировать целое число в текст на русском языке
@@ -98,29 +131,48 @@ def number_to_text(n):
     if n < 0:
         return 'минус ' + number_to_text(-n)
 
+    n = int(n)
+    if n < 1000:
+        return GROUP_WORDS[0][n]
+
+    # Суммы справок почти всегда меньше миллиарда - без общего цикла
+    if n < 1_000_000_000:
+        millions, rest = divmod(n, 1_000_000)
+        thousands, ones = divmod(rest, 1000)
+        words = [GROUP_WORDS[2][millions], GROUP_WORDS[1][thousands], GROUP_WORDS[0][ones]]
+        return ' '.join([w for w in words if w])
+
     groups = []
     group_index = 0
 
     while n > 0:
-        group = n % 1000
-        n //= 1000
+        n, group = divmod(n, 1000)
+        if group:
+            groups.append(GROUP_WORDS[group_index][group])
+        group_index += 1
 
-        if group > 0:
-            feminine = (group_index == 1)  # тысячи - женский род
-            text = convert_group(group, feminine)
+    groups.reverse()
+    return ' '.join(groups)
 
-            if group_index > 0:
-                unit = get_plural_form(group, UNITS[group_index][:3])
-                text = f"{text} {unit}"
 
-            groups.append(text)
+def numbers_to_text(numbers: Iterable) -> List[str]:
+    """
+    Пакетная конвертация чисел в текст
 
-        group_index += 1
+    Одинаковые значения в пакете конвертируются один раз.
 
-    groups.reverse()
-    return ' '.join(groups).strip()
+    Args:
+        numbers: последовательность целых чисел
+
+    Returns:
+        list: тексты в том же порядке
+    """
+    numbers = list(numbers)
+    texts = {n: number_to_text(n) for n in set(numbers)}
+    return [texts[n] for n in numbers]
 
 
+@lru_cache(maxsize=CACHE_SIZE)
 def number_to_text_with_currency(n, currency='тенге'):
     """
     Конвертировать число в текст с указанием валюты
@@ -137,6 +189,7 @@ def number_to_text_with_currency(n, currency='тенге'):
     return f"{text} {currency}"
 
 
+@lru_cache(maxsize=CACHE_SIZE)
 def format_number_with_text(n):
     """
     Форматировать число с текстом в скобках
@@ -0,0 +1,12 @@
+# -*- coding: utf-8 -*-
+"""
+Общие настройки тестов
+
+Долгие проверки (полный перебор, холодный импорт приложения) помечены
+slow и запускаются вместе со всеми; пропустить их:
+    python -m pytest -q tests -m "not slow"
+"""
+
+
+def pytest_configure(config):
+    config.addinivalue_line('markers', 'slow: долгая проверка (полный перебор, отдельный процесс)')
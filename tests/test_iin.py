@@ -0,0 +1,66 @@
+# -*- coding: utf-8 -*-
+"""
+Проверка ИИН на реальных номерах из «Шаблон для загрузки справок.xlsx»
+
+Запуск:
+    python -m pytest -q tests
+"""
+
+import sys
+from datetime import date
+from pathlib import Path
+
+import pytest
+
+PROJECT_DIR = Path(__file__).parent.parent
+TEMPLATE = PROJECT_DIR / "Шаблон для загрузки справок.xlsx"
+
+sys.path.insert(0, str(PROJECT_DIR / "webapp"))
+
+from iin import iin_check_digit, validate_iin, validate_iins  # noqa: E402
+
+TODAY = date(2025, 6, 1)
+
+
+def template_iins() -> list:
+    """ИИН клиентов шаблона (столбец «ИИН клиента»)"""
+    openpyxl = pytest.importorskip('openpyxl')
+    workbook = openpyxl.load_workbook(TEMPLATE, read_only=True)
+    try:
+        rows = workbook.active.iter_rows(values_only=True)
+        column = next(rows).index('ИИН клиента')
+        return [str(row[column]).strip() for row in rows if row[column] is not None]
+    finally:
+        workbook.close()
+
+
+def test_template_iins_without_birth_date_are_valid():
+    # Номера с 7-й цифрой 0 и верной контрольной цифрой реально выданы клиентам
+    zero_digit = [iin for iin in template_iins() if iin[6] == '0']
+    assert len(zero_digit) == 28
+    assert all(iin_check_digit(iin) == int(iin[11]) for iin in zero_digit)
+
+    for iin in zero_digit:
+        assert validate_iin(iin, TODAY) == {'valid': True, 'error': None}, iin
+    valid, errors = validate_iins(zero_digit, TODAY)
+    assert all(valid)
+    assert errors == [None] * len(zero_digit)
+
+
+def test_template_scalar_and_batch_agree():
+    iins = template_iins()
+    valid, errors = validate_iins(iins, TODAY)
+    scalar = [validate_iin(iin, TODAY) for iin in iins]
+    assert [(result['valid'], result['error']) for result in scalar] == list(zip(valid, errors))
+
+
+@pytest.mark.parametrize('iin, error', [
+    # 7-я цифра 0: дата не раскодируется, но контрольная цифра проверяется
+    ('010603000331', 'ИИН: неверная контрольная цифра 1 (ожидается 8)'),
+    ('999999000002', None),
+    ('010603700338', 'ИИН: 7-я цифра (век рождения и пол) должна быть от 0 до 6, найдено: 7'),
+])
+def test_seventh_digit(iin, error):
+    expected_valid = error is None
+    assert validate_iin(iin, TODAY) == {'valid': expected_valid, 'error': error}
+    assert validate_iins([iin], TODAY) == ([expected_valid], [error])
@@ -0,0 +1,46 @@
+# -*- coding: utf-8 -*-
+"""
+Потоковый разбор реестров совпадает с прежним загрузчиком
+
+iter_source_clients (read_only, iter_rows, нормализация блоками)
+сверяется поле за полем с прежним read_excel_data (load_workbook в полном
+режиме и ws.cell на каждое поле) - эталон из benchmarks/bench_read_excel.py -
+на реестрах data/clients_data*.xlsx и шаблоне загрузки.
+
+Запуск:
+    python -m pytest -q tests/test_ingest.py
+"""
+
+import sys
+from pathlib import Path
+
+import pytest
+
+PROJECT_DIR = Path(__file__).parent.parent
+
+sys.path.insert(0, str(PROJECT_DIR / "benchmarks"))
+
+pytest.importorskip('openpyxl')
+pytest.importorskip('numpy')
+
+# bench_read_excel (через common) добавляет webapp/ и scripts/ в sys.path
+from bench_read_excel import DEFAULT_FILES, compare, reference_read_excel_data  # noqa: E402
+from common import load_app  # noqa: E402
+
+
+@pytest.fixture(scope='module')
+def app():
+    return load_app()
+
+
+@pytest.mark.parametrize('path', DEFAULT_FILES, ids=lambda path: path.name)
+def test_matches_legacy_reader(app, path):
+    expected = reference_read_excel_data(path)
+    clients = list(app.iter_source_clients(path))
+
+    assert expected, f"{path.name}: в реестре нет клиентов"
+    mismatches = compare(clients, expected)
+    assert not mismatches, "\n".join(
+        f"клиент {client_id}, {field_name}: {value!r} != {reference!r}"
+        for client_id, field_name, value, reference in mismatches[:10]
+    )
@@ -0,0 +1,64 @@
+# -*- coding: utf-8 -*-
+"""
+Эквивалентность табличного num2text прежней реализации
+
+Полный перебор 0..10^7 (частями по миллиону) для number_to_text,
+format_number_with_text и numbers_to_text; эталон - прежний алгоритм из
+benchmarks/bench_num2text.py.
+
+Запуск:
+    python -m pytest -q tests/test_num2text.py
+"""
+
+import sys
+import random
+from pathlib import Path
+
+import pytest
+
+PROJECT_DIR = Path(__file__).parent.parent
+
+sys.path.insert(0, str(PROJECT_DIR / "benchmarks"))
+
+# bench_num2text (через common) добавляет scripts/ в sys.path
+from bench_num2text import reference_number_to_text  # noqa: E402
+import num2text  # noqa: E402
+
+LIMIT = 10**7
+CHUNK = 10**6
+
+
+def reference_format(n: int, text: str) -> str:
+    """format_number_with_text прежней реализации по готовому тексту числа"""
+    return f"{f'{n:,}'.replace(',', ' ')} ({text})"
+
+
+def assert_equivalent(numbers):
+    expected = [reference_number_to_text(n) for n in numbers]
+
+    mismatch = next((n for n, text in zip(numbers, expected) if num2text.number_to_text(n) != text), None)
+    assert mismatch is None, f"number_to_text({mismatch})"
+
+    mismatch = next(
+        (n for n, text in zip(numbers, expected) if num2text.format_number_with_text(n) != reference_format(n, text)),
+        None
+    )
+    assert mismatch is None, f"format_number_with_text({mismatch})"
+
+    batch = num2text.numbers_to_text(numbers)
+    mismatch = next((n for n, text, got in zip(numbers, expected, batch) if got != text), None)
+    assert mismatch is None, f"numbers_to_text: {mismatch}"
+    assert len(batch) == len(numbers)
+
+
+@pytest.mark.slow
+@pytest.mark.parametrize('start', range(0, LIMIT + 1, CHUNK))
+def test_exhaustive(start):
+    assert_equivalent(range(start, min(start + CHUNK, LIMIT + 1)))
+
+
+def test_large_and_negative():
+    rng = random.Random(42)
+    numbers = [rng.randrange(-10**15 + 1, 10**15) for _ in range(10_000)]
+    # Повторы - numbers_to_text конвертирует одинаковые значения один раз
+    assert_equivalent(numbers + numbers[:100])
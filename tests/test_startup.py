@@ -0,0 +1,59 @@
+# -*- coding: utf-8 -*-
+"""
+Холодный импорт веб-приложения
+
+import app в новом процессе (как при старте воркера uvicorn) не должен
+загружать тяжёлые библиотеки - они импортируются при первом
+использовании - и должен укладываться в IMPORT_LIMIT секунд.
+
+Запуск:
+    python -m pytest -q tests/test_startup.py
+"""
+
+import sys
+import json
+import subprocess
+from pathlib import Path
+
+import pytest
+
+PROJECT_DIR = Path(__file__).parent.parent
+WEBAPP_DIR = PROJECT_DIR / "webapp"
+
+# Библиотеки, которые импортируются только при первом использовании
+HEAVY_MODULES = ('reportlab', 'openpyxl', 'numpy', 'pyarrow', 'pypdfium2', 'PIL')
+
+# Порог времени импорта, с (сейчас около 0.4 с); берётся лучший из RUNS запусков
+IMPORT_LIMIT = 1.0
+RUNS = 3
+
+PROBE = r'''
+import sys, json, time
+sys.path.insert(0, sys.argv[1])
+start = time.perf_counter()
+import app
+elapsed = time.perf_counter() - start
+print(json.dumps({"import": elapsed, "modules": sorted({name.split('.')[0] for name in sys.modules})}))
+'''
+
+
+def cold_import() -> dict:
+    """Импорт app в отдельном процессе: время и загруженные модули верхнего уровня"""
+    result = subprocess.run(
+        [sys.executable, '-c', PROBE, str(PROJECT_DIR / "scripts")],
+        cwd=WEBAPP_DIR, capture_output=True, text=True, timeout=120
+    )
+    assert result.returncode == 0, result.stderr
+    # Последняя строка - JSON, выше - сообщения приложения
+    return json.loads(result.stdout.strip().splitlines()[-1])
+
+
+@pytest.mark.slow
+def test_cold_import():
+    runs = [cold_import() for _ in range(RUNS)]
+
+    loaded = sorted(set(HEAVY_MODULES).intersection(runs[0]['modules']))
+    assert not loaded, f"import app загружает {', '.join(loaded)}"
+
+    best = min(run['import'] for run in runs)
+    assert best < IMPORT_LIMIT, f"import app {best:.3f} с > {IMPORT_LIMIT} с"
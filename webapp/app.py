@@ -3,39 +3,59 @@
 SwissCapital - Веб-платформа генерации справок о ссудной задолженности
 """
 
+import io
 import os
 import sys
+import json
+import zlib
+import struct
 import uuid
 import shutil
+import hashlib
 import zipfile
-from datetime import datetime, timedelta
+import threading
+from collections import OrderedDict
+from functools import partial
+from itertools import chain, repeat, starmap
+from operator import itemgetter
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from datetime import timedelta
 from pathlib import Path
-from typing import Optional, List
+from typing import TYPE_CHECKING, Optional, List, Iterator, Callable, Union, BinaryIO
 
-from fastapi import FastAPI, Request, UploadFile, File, Form, Depends, HTTPException, status
-from fastapi.responses import HTMLResponse, FileResponse, JSONResponse, RedirectResponse
+from fastapi import FastAPI, Request, Form, Query, Depends, HTTPException, status
+from fastapi.responses import (
+    HTMLResponse, FileResponse, JSONResponse, RedirectResponse, StreamingResponse, PlainTextResponse, Response
+)
 from fastapi.staticfiles import StaticFiles
 from fastapi.templating import Jinja2Templates
 from fastapi.security import HTTPBasic, HTTPBasicCredentials
+from starlette.concurrency import run_in_threadpool
 import secrets
 
 # Добавляем путь к scripts для импорта модулей
 sys.path.insert(0, str(Path(__file__).parent.parent / "scripts"))
 
-from openpyxl import load_workbook, Workbook
-from openpyxl.styles import Font, Alignment, Border, Side, PatternFill
-# from openpyxl.drawing.image import Image as XLImage  # Не используется
-from openpyxl.cell.text import InlineFont
-from openpyxl.cell.rich_text import TextBlock, CellRichText
-from reportlab.lib import colors
-from reportlab.lib.pagesizes import A4
-from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
-from reportlab.lib.units import mm
-from reportlab.platypus import SimpleDocTemplate, Paragraph, Spacer, Table, TableStyle
-from reportlab.pdfbase import pdfmetrics
-from reportlab.pdfbase.ttfonts import TTFont
-
+# openpyxl, reportlab и numpy импортируются в функциях, которые их используют:
+# процесс uvicorn стартует без них, а платит за импорт при первой загрузке
+# реестра или первой справке
 from num2text import number_to_text, format_number_with_text
+from column_mapping import HeaderResolver
+from session_store import SessionStore, SessionData
+from jobs import JobManager, Job
+from history_store import HistoryStore
+from render_cache import RenderCache, certificate_cache_key, link_or_copy
+from janitor import Janitor
+from preview_cache import PreviewCache, PNG_PREVIEW_AVAILABLE, render_png
+from upload_stream import UploadError, ReceivedUpload, receive_form, EXCEL_SIGNATURES, TABLE_SIGNATURES
+from source_readers import iter_csv_rows, iter_parquet_rows, parse_number, PARQUET_AVAILABLE
+from certificates import COMPANY, PdfCertificateTemplate, create_pdf_certificate, format_date_russian
+from iin import validate_iin, validate_iins
+from client_record import ClientRecord
+import metrics
+
+if TYPE_CHECKING:
+    from openpyxl import Workbook
 
 # ============================================================================
 # КОНФИГУРАЦИЯ
@@ -47,53 +67,82 @@ UPLOAD_DIR = APP_DIR / "uploads"
 GENERATED_DIR = APP_DIR / "generated"
 TEMPLATES_DIR = APP_DIR / "templates"
 STATIC_DIR = APP_DIR / "static"
+DATA_DIR = APP_DIR / "data"
 
 # Создаём директории если их нет
 UPLOAD_DIR.mkdir(exist_ok=True)
 GENERATED_DIR.mkdir(exist_ok=True)
 
-# Регистрация шрифтов для PDF с поддержкой кириллицы
-import platform
-
-PDF_FONT = 'Helvetica'
-PDF_FONT_BOLD = 'Helvetica-Bold'
-
-# Определяем ОС и используем соответствующие шрифты
-if platform.system() == 'Windows':
-    try:
-        pdfmetrics.registerFont(TTFont('Arial', 'C:/Windows/Fonts/arial.ttf'))
-        pdfmetrics.registerFont(TTFont('Arial-Bold', 'C:/Windows/Fonts/arialbd.ttf'))
-        PDF_FONT = 'Arial'
-        PDF_FONT_BOLD = 'Arial-Bold'
-        print("✓ Registered Arial fonts for Windows")
-    except Exception as e:
-        print(f"⚠ Arial registration failed: {e}")
-else:
-    # Linux/Docker
-    try:
-        pdfmetrics.registerFont(TTFont('DejaVu', '/usr/share/fonts/truetype/dejavu/DejaVuSans.ttf'))
-        pdfmetrics.registerFont(TTFont('DejaVu-Bold', '/usr/share/fonts/truetype/dejavu/DejaVuSans-Bold.ttf'))
-        PDF_FONT = 'DejaVu'
-        PDF_FONT_BOLD = 'DejaVu-Bold'
-        print("✓ Registered DejaVu fonts for Linux")
-    except Exception as e:
-        print(f"⚠ DejaVu registration failed: {e}, using Helvetica (no Cyrillic)")
-
 # Авторизация
 USERS = {
     "Kirito": "Kirito"
 }
 
-# Данные компании
-COMPANY = {
-    'name': 'SwissCapital',
-    'address': 'Республика Казахстан, г. Алматы, пр. Достык, 188',
-    'phone': '+7 700 836 78 13'
-}
-
 # Путь к логотипу
 LOGO_PATH = PROJECT_DIR / "assetslogo.png"
 
+# Маппинг заголовков Excel: гос.пошлина учитывается в административных сборах
+COLUMN_RESOLVER = HeaderResolver(rename={'state_fee': 'admin_fees'})
+
+# Кэш разобранных загрузок (количество сессий, TTL в секундах, лимит памяти в МБ)
+SESSION_CACHE_MAX_ENTRIES = int(os.environ.get("SESSION_CACHE_MAX_ENTRIES", "32"))
+SESSION_CACHE_TTL = int(os.environ.get("SESSION_CACHE_TTL", "3600"))
+SESSION_CACHE_MAX_MB = int(os.environ.get("SESSION_CACHE_MAX_MB", "512"))
+
+# Параллельная генерация: число процессов (1 - последовательно) и размер порции клиентов
+GENERATION_WORKERS = int(os.environ.get("GENERATION_WORKERS", "1"))
+GENERATION_CHUNK_SIZE = int(os.environ.get("GENERATION_CHUNK_SIZE", "0"))  # 0 - подбирается автоматически
+
+# Сколько задач генерации выполняется одновременно (остальные ждут в очереди)
+JOB_WORKERS = int(os.environ.get("JOB_WORKERS", "1"))
+
+# Загруженные файлы хранятся один раз по хэшу содержимого, сессии ссылаются на них
+UPLOAD_BLOBS_DIR = UPLOAD_DIR / "_blobs"
+
+# Максимальный размер загружаемого реестра, МБ (больше - ответ 413)
+MAX_UPLOAD_MB = float(os.environ.get("MAX_UPLOAD_MB", "50"))
+
+# Пакетная загрузка: файлов в одной загрузке и процессов для разбора файлов и листов
+MAX_UPLOAD_FILES = int(os.environ.get("MAX_UPLOAD_FILES", "20"))
+INGEST_WORKERS = int(os.environ.get("INGEST_WORKERS", "4"))
+
+# Форматы реестров: Excel, CSV и Parquet (если установлен pyarrow)
+UPLOAD_SIGNATURES = {
+    suffix: signatures for suffix, signatures in TABLE_SIGNATURES.items()
+    if suffix != '.parquet' or PARQUET_AVAILABLE
+}
+
+# Сколько повторяющихся номеров договоров и строк с ошибками сумм и ИИН перечислять в сводке загрузки
+DUPLICATES_LIMIT = 100
+AMOUNT_ERRORS_LIMIT = 100
+INVALID_IINS_LIMIT = 100
+
+# Строк в одном блоке поколоночной нормализации сумм
+NORMALIZE_BLOCK_ROWS = 10_000
+
+# Постраничная выдача клиентов (/clients): размер страницы по умолчанию и наибольший
+CLIENTS_PAGE_SIZE = 200
+CLIENTS_PAGE_MAX = 1000
+
+# Кэш отрендеренных справок по содержимому строки клиента (1 - включён)
+RENDER_CACHE_ENABLED = os.environ.get("RENDER_CACHE_ENABLED", "1") == "1"
+RENDER_CACHE_DIR = GENERATED_DIR / "_cache"
+
+# Кэш предпросмотров справок в памяти (количество, лимит памяти в МБ)
+PREVIEW_CACHE_MAX_ENTRIES = int(os.environ.get("PREVIEW_CACHE_MAX_ENTRIES", "256"))
+PREVIEW_CACHE_MAX_MB = int(os.environ.get("PREVIEW_CACHE_MAX_MB", "64"))
+
+# База истории генераций и задач (SQLite, общая для всех процессов uvicorn)
+HISTORY_DB_PATH = Path(os.environ.get("HISTORY_DB_PATH", str(DATA_DIR / "history.db")))
+
+# Очистка uploads/ и generated/: период прохода (0 - отключена), сроки хранения
+# (0 - бессрочно), квота диска (0 - без квоты) и минимальный возраст удаляемых записей
+JANITOR_INTERVAL = int(os.environ.get("JANITOR_INTERVAL", "600"))
+UPLOAD_TTL = timedelta(hours=float(os.environ.get("UPLOAD_TTL_HOURS", "72")))
+GENERATED_TTL = timedelta(hours=float(os.environ.get("GENERATED_TTL_HOURS", "168")))
+DISK_QUOTA_GB = float(os.environ.get("DISK_QUOTA_GB", "0"))
+JANITOR_MIN_AGE = timedelta(minutes=float(os.environ.get("JANITOR_MIN_AGE_MINUTES", "15")))
+
 # ============================================================================
 # ПРИЛОЖЕНИЕ
 # ============================================================================
@@ -104,8 +153,80 @@ security = HTTPBasic()
 app.mount("/static", StaticFiles(directory=STATIC_DIR), name="static")
 templates = Jinja2Templates(directory=TEMPLATES_DIR)
 
-# История генераций (в памяти, для production используйте БД)
-generation_history = []
+# История генераций и результаты по клиентам
+history_store = HistoryStore(HISTORY_DB_PATH)
+
+# Разобранные данные загрузок: session_id -> клиенты, маппинг, индекс по id
+session_store = SessionStore(
+    max_entries=SESSION_CACHE_MAX_ENTRIES,
+    ttl=SESSION_CACHE_TTL,
+    max_bytes=SESSION_CACHE_MAX_MB * 1024 * 1024
+)
+
+# Готовые предпросмотры справок (PDF и PNG) по ключу данных клиента
+preview_cache = PreviewCache(
+    max_entries=PREVIEW_CACHE_MAX_ENTRIES,
+    max_bytes=PREVIEW_CACHE_MAX_MB * 1024 * 1024
+)
+
+# Фоновые задачи генерации
+job_manager = JobManager(max_workers=JOB_WORKERS, store=history_store)
+
+# Очистка по сроку хранения и квоте (один проход на все процессы uvicorn)
+janitor = Janitor(
+    UPLOAD_DIR, GENERATED_DIR, UPLOAD_BLOBS_DIR, RENDER_CACHE_DIR,
+    upload_ttl=UPLOAD_TTL.total_seconds(),
+    generated_ttl=GENERATED_TTL.total_seconds(),
+    quota_bytes=int(DISK_QUOTA_GB * 1024 ** 3),
+    min_age=JANITOR_MIN_AGE.total_seconds(),
+    interval=JANITOR_INTERVAL,
+    lock_path=DATA_DIR / "janitor.lock",
+    store=history_store
+)
+
+# Метрики для /metrics (время этапов - metrics.STAGE_DURATION)
+CERTIFICATES_TOTAL = metrics.REGISTRY.register(metrics.Counter(
+    'certgen_certificates_total', 'Справки, вошедшие в результаты генераций', ('format',)
+))
+CERTIFICATES_CACHED_TOTAL = metrics.REGISTRY.register(metrics.Counter(
+    'certgen_certificates_cached_total', 'Справки, взятые из кэша или базовой генерации без рендеринга'
+))
+CERTIFICATE_FAILURES_TOTAL = metrics.REGISTRY.register(metrics.Counter(
+    'certgen_certificate_failures_total', 'Клиенты, справки которых не удалось сгенерировать'
+))
+GENERATIONS_TOTAL = metrics.REGISTRY.register(metrics.Counter(
+    'certgen_generations_total', 'Генерации по режиму (full, incremental, stream)', ('mode',)
+))
+UPLOADS_TOTAL = metrics.REGISTRY.register(metrics.Counter('certgen_uploads_total', 'Загруженные реестры'))
+UPLOAD_BYTES_TOTAL = metrics.REGISTRY.register(metrics.Counter(
+    'certgen_upload_bytes_total', 'Объём загруженных реестров, байт'
+))
+metrics.REGISTRY.register(metrics.GaugeFunc(
+    'certgen_session_cache_entries', 'Разобранные загрузки в памяти',
+    lambda: {(): session_store.stats()['entries']}
+))
+metrics.REGISTRY.register(metrics.GaugeFunc(
+    'certgen_session_cache_bytes', 'Оценка памяти разобранных загрузок, байт',
+    lambda: {(): session_store.stats()['bytes']}
+))
+metrics.REGISTRY.register(metrics.GaugeFunc(
+    'certgen_preview_cache_requests_total', 'Обращения к кэшу предпросмотров (hit, miss)',
+    lambda: {('hit',): preview_cache.stats()['hits'], ('miss',): preview_cache.stats()['misses']},
+    labelnames=('result',), type_name='counter'
+))
+metrics.REGISTRY.register(metrics.GaugeFunc(
+    'certgen_janitor_reclaimed_bytes_total', 'Освобождено очисткой по причинам, байт',
+    lambda: {(reason,): value for reason, value in janitor.stats()['reclaimed_bytes'].items()},
+    labelnames=('reason',), type_name='counter'
+))
+metrics.REGISTRY.register(metrics.GaugeFunc(
+    'certgen_storage_usage_bytes', 'Объём uploads/ и generated/ на последнем проходе очистки, байт',
+    lambda: {(): janitor.stats()['usage_bytes']}
+))
+
+# Потоковые выгрузки: output_id -> параметры генерации (архив формируется при скачивании)
+stream_outputs = OrderedDict()
+STREAM_OUTPUTS_KEEP = 100
 
 
 # ============================================================================
@@ -131,262 +252,443 @@ def verify_credentials(credentials: HTTPBasicCredentials = Depends(security)):
 # ВСПОМОГАТЕЛЬНЫЕ ФУНКЦИИ
 # ============================================================================
 
-def format_date_russian(date_str):
-    """Форматирование даты в формате ДД.ММ.ГГГГ"""
-    try:
-        if isinstance(date_str, datetime):
-            dt = date_str
-        else:
-            # Сначала убираем время, если есть (например "2025-03-18 00:00:00" -> "2025-03-18")
-            date_part = str(date_str).split(' ')[0]
-            for fmt in ['%d.%m.%Y', '%Y-%m-%d', '%d/%m/%Y', '%d-%m-%Y']:
-                try:
-                    dt = datetime.strptime(date_part, fmt)
-                    break
-                except ValueError:
-                    continue
-            else:
-                return str(date_str)
-        # Формат ДД.ММ.ГГГГ
-        return f"{dt.day:02d}.{dt.month:02d}.{dt.year}"
-    except:
-        return str(date_str)
-
-
 def get_column_mapping_info(file_path: Path) -> dict:
-    """Получить информацию о маппинге столбцов Excel"""
-    wb = load_workbook(file_path)
-    ws = wb.active
-
-    # Читаем заголовки
+    """Получить информацию о маппинге столбцов реестра"""
+    # Читаем заголовки (только первую строку)
+    header_row = read_source_header(file_path)
     headers = {}
-    for col in range(1, ws.max_column + 1):
-        val = ws.cell(row=1, column=col).value
+    for col, val in enumerate(header_row, start=1):
         if val:
             headers[str(val).strip()] = col
 
-    wb.close()
-
     return {
         "found_columns": list(headers.keys()),
-        "total_columns": len(headers)
+        "total_columns": len(headers),
+        "header_row": header_names(header_row)
     }
 
 
-def validate_iin(iin: str) -> dict:
-    """Валидация ИИН клиента"""
-    if not iin:
-        return {'valid': False, 'error': 'ИИН отсутствует'}
+def header_names(header_row: tuple) -> List[Optional[str]]:
+    """
+    Строка заголовков для кэша сессии (JSON): текст по позициям столбцов,
+    пустые ячейки - None, пустой хвост отбрасывается. По ней /debug-mapping
+    показывает маппинг, не открывая файл заново.
+    """
+    names = [str(val).strip() if val else None for val in header_row]
+    while names and names[-1] is None:
+        names.pop()
+    return names
 
-    # Удаляем пробелы
-    iin_clean = iin.strip()
 
-    # Проверка, что содержит только цифры
-    if not iin_clean.isdigit():
-        return {'valid': False, 'error': f'ИИН содержит недопустимые символы: {iin_clean}'}
+@metrics.timed('read_excel')
+def read_excel_data(file_path: Path) -> List[ClientRecord]:
+    """Чтение данных из реестра (Excel, CSV или Parquet)"""
+    return list(iter_source_clients(file_path))
 
-    # Проверка длины
-    if len(iin_clean) != 12:
-        return {'valid': False, 'error': f'ИИН должен содержать 12 цифр, найдено: {len(iin_clean)}'}
 
-    return {'valid': True, 'error': None}
+def is_excel_file(file_path: Path) -> bool:
+    return file_path.suffix.lower() in EXCEL_SIGNATURES
 
 
-def read_excel_data(file_path: Path) -> List[dict]:
-    """Чтение данных из Excel файла"""
-    wb = load_workbook(file_path, data_only=True)
-    ws = wb.active
+def iter_source_rows(file_path: Path, sheet: Optional[str] = None) -> Iterator[tuple]:
+    """
+    Строки реестра, первая - заголовки; формат - по расширению файла
 
-    # Маппинг заголовков
-    headers = {}
-    for col in range(1, ws.max_column + 1):
-        val = ws.cell(row=1, column=col).value
-        if val:
-            headers[str(val).strip().lower()] = col
-
-    # Логируем найденные заголовки (в логи сервера)
-    # print отключены из-за проблем с кодировкой Windows
-
-    # Точный маппинг заголовков (в нижнем регистре) на поля
-    column_map = {
-        # Номер договора
-        'номер договора': 'contract_number',
-        'номера договора': 'contract_number',
-        '№ договора': 'contract_number',
-        '№ номера договора': 'contract_number',
-        'договор №': 'contract_number',
-        'договор': 'contract_number',
-        # Игнорируем столбец с порядковым номером
-        '№': 'ignore',
-        'п/п': 'ignore',
-        '№ п/п': 'ignore',
-        # Дата договора
-        'дата договора': 'contract_date',
-        'даты договора': 'contract_date',
-        'дата': 'contract_date',
-        # ФИО
-        'фио': 'client_name',
-        'фио клиента': 'client_name',
-        'клиент': 'client_name',
-        'заемщик': 'client_name',
-        # ИИН
-        'иин': 'iin',
-        'иин клиента': 'iin',
-        'iin': 'iin',
-        # Основной долг
-        'основной долг': 'principal',
-        'сумма од': 'principal',
-        'сумма основного долга': 'principal',
-        'од': 'principal',
-        # Вознаграждение (проценты)
-        'вознаграждение': 'reward',
-        'сумма вознаграждения': 'reward',
-        'сумма процентов': 'reward',
-        'проценты': 'reward',
-        # Отсроченные проценты / поступления
-        'отсроченные проценты': 'deferred_interest',
-        'сумма отсроченных процентов': 'deferred_interest',
-        'отсроч проценты': 'deferred_interest',
-        'отсроч. проценты': 'deferred_interest',
-        'отсроченн проценты': 'deferred_interest',
-        'отсроченн. проценты': 'deferred_interest',
-        'отсроченные поступления': 'deferred_interest',
-        'сумма отсроченных поступлений': 'deferred_interest',
-        'отсроч поступления': 'deferred_interest',
-        'отсроч. поступления': 'deferred_interest',
-        'отсроченн поступления': 'deferred_interest',
-        'отсроченн. поступления': 'deferred_interest',
-        'отсроченные поступлений': 'deferred_interest',
-        # Пени, штрафы, неустойки (объединенный столбец)
-        'пени, штрафы, неустойки': 'penalties',
-        'пени штрафы неустойки': 'penalties',
-        'пени': 'penalties',
-        # Старые варианты для обратной совместимости (пеня за ОД)
-        'пеня за од': 'penalty_principal_old',
-        'сумма пеня за од': 'penalty_principal_old',
-        'сумма пени за од': 'penalty_principal_old',
-        'неустойка': 'penalty_principal_old',
-        'штраф': 'penalty_principal_old',
-        # Старые варианты для обратной совместимости (пеня за вознаграждение)
-        'пеня за вознаграждение': 'penalty_reward_old',
-        'сумма пеня за вознаграждение': 'penalty_reward_old',
-        'сумма пени за вознаграждение': 'penalty_reward_old',
-        # Административные сборы (включая гос.пошлину)
-        'административные сборы': 'admin_fees',
-        'адм. сборы': 'admin_fees',
-        'адм сборы': 'admin_fees',
-        # Старые варианты гос.пошлины (теперь часть административных сборов)
-        'гос.пошлина': 'admin_fees',
-        'гос. пошлина': 'admin_fees',
-        'госпошлина': 'admin_fees',
-        'сумма госпошлины': 'admin_fees',
-        # Общая сумма (если есть готовое значение в Excel)
-        'сумма займа': 'total',
-        'общая сумма': 'total',
-        'итого': 'total'
+    Excel: книга открывается в режиме read_only и читается построчно
+    через iter_rows(values_only=True), лист sheet (по умолчанию -
+    активный). CSV и Parquet - читателями source_readers. Объём памяти
+    не зависит от количества строк.
+    """
+    suffix = file_path.suffix.lower()
+    if suffix == '.csv':
+        yield from iter_csv_rows(file_path)
+        return
+    if suffix == '.parquet':
+        yield from iter_parquet_rows(file_path)
+        return
+
+    from openpyxl import load_workbook
+
+    # keep_links=False: кэш внешних ссылок (в шаблоне - мегабайты XML) не разбирается,
+    # значения ячеек от этого не меняются
+    wb = load_workbook(file_path, read_only=True, data_only=True, keep_links=False)
+    try:
+        ws = wb[sheet] if sheet else wb.active
+        # Размеры листа в файле могут быть указаны неверно - читаем все строки
+        ws.reset_dimensions()
+        yield from ws.iter_rows(values_only=True)
+    finally:
+        wb.close()
+
+
+def read_source_header(file_path: Path, sheet: Optional[str] = None) -> tuple:
+    """Строка заголовков реестра"""
+    rows = iter_source_rows(file_path, sheet)
+    try:
+        return tuple(next(rows, ()))
+    finally:
+        rows.close()
+
+
+def iter_source_clients(file_path: Path, sheet: Optional[str] = None) -> Iterator[ClientRecord]:
+    """Потоковое чтение клиентов из реестра: клиенты возвращаются по одному (генератор)"""
+    # В CSV суммы - текст ('1 234,56'), в Excel и Parquet - числа
+    return _iter_row_clients(iter_source_rows(file_path, sheet), text_amounts=file_path.suffix.lower() == '.csv')
+
+
+def excel_sheet_names(file_path: Path) -> List[str]:
+    """Видимые листы книги (скрытые служебные листы пропускаются)"""
+    from openpyxl import load_workbook
+
+    wb = load_workbook(file_path, read_only=True, keep_links=False)
+    try:
+        return [ws.title for ws in wb.worksheets if ws.sheet_state == 'visible']
+    finally:
+        wb.close()
+
+
+def read_source_clients(file_path: Path, sheet: Optional[str] = None) -> dict:
+    """Клиенты и заголовки одного листа или файла (выполняется в пуле процессов пакетного разбора)"""
+    rows = iter_source_rows(file_path, sheet)
+    first_row = tuple(next(rows, ()))
+    clients = _iter_row_clients(chain((first_row,), rows), text_amounts=file_path.suffix.lower() == '.csv')
+    return {
+        'clients': list(clients),
+        'found_columns': [str(val).strip() for val in first_row if val],
+        'header_row': header_names(first_row)
     }
 
-    col_indices = {}
-    for header_name, col_idx in headers.items():
-        header_lower = header_name.lower().strip()
-        # Сначала ищем точное совпадение
-        if header_lower in column_map:
-            field_name = column_map[header_lower]
-            # Пропускаем столбцы, помеченные как ignore
-            if field_name != 'ignore' and field_name not in col_indices:
-                col_indices[field_name] = col_idx
-        else:
-            # Частичное совпадение
-            for key, field_name in column_map.items():
-                if key in header_lower or header_lower in key:
-                    # Пропускаем столбцы, помеченные как ignore
-                    if field_name != 'ignore' and field_name not in col_indices:
-                        col_indices[field_name] = col_idx
-                    break
+
+@metrics.timed('read_excel')
+def read_batch_data(paths: List[Path], all_sheets: bool = False,
+                    workers: Optional[int] = None) -> tuple:
+    """
+    Пакетный разбор: несколько файлов и/или все листы книг - (клиенты, маппинг)
+
+    Файлы и листы разбираются параллельно в пуле процессов и сливаются
+    в один список в порядке загрузки. Клиенты нумеруются заново подряд,
+    в поле 'source' - откуда строка ("файл" или "файл / лист").
+    """
+    units = []
+    for path in paths:
+        # У CSV и Parquet один "лист"
+        sheets = excel_sheet_names(path) if all_sheets and is_excel_file(path) else [None]
+        units.extend((path, sheet) for sheet in sheets)
+
+    if workers is None:
+        workers = INGEST_WORKERS
+    workers = min(workers, len(units))
+
+    if workers <= 1:
+        parts = _collect_sources(units, [partial(read_source_clients, path, sheet) for path, sheet in units])
+    else:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            futures = [pool.submit(read_source_clients, path, sheet) for path, sheet in units]
+            parts = _collect_sources(units, [future.result for future in futures])
 
     clients = []
-    for row in range(2, ws.max_row + 1):
-        if not ws.cell(row=row, column=1).value:
+    found_columns = {}
+    sources = []
+    for (path, sheet), part in zip(units, parts):
+        source = f"{path.name} / {sheet}" if sheet else path.name
+        for client in part['clients']:
+            client['id'] = len(clients) + 1
+            client['source'] = source
+            clients.append(client)
+        found_columns.update(dict.fromkeys(part['found_columns']))
+        sources.append({"file": path.name, "sheet": sheet, "clients_count": len(part['clients'])})
+
+    return clients, {
+        "found_columns": list(found_columns),
+        "total_columns": len(found_columns),
+        # Заголовки первого файла (листа) пакета - для /debug-mapping
+        "header_row": parts[0]['header_row'] if parts else [],
+        "sources": sources
+    }
+
+
+def _collect_sources(units: list, results: List[Callable[[], dict]]) -> List[dict]:
+    """Результаты разбора по порядку; ошибка указывает файл и лист"""
+    parts = []
+    for (path, sheet), result in zip(units, results):
+        try:
+            parts.append(result())
+        except Exception as e:
+            source = f"{path.name} / {sheet}" if sheet else path.name
+            raise ValueError(f"{source}: {e}") from e
+    return parts
+
+
+# Поля реестра: текстовые, суммы (в том числе старые столбцы пени) и слагаемые total
+SOURCE_TEXT_FIELDS = ('contract_number', 'contract_date', 'client_name', 'iin')
+SOURCE_AMOUNT_FIELDS = ('principal', 'reward', 'deferred_interest', 'penalties', 'admin_fees', 'total',
+                        'penalty_principal_old', 'penalty_reward_old')
+
+
+def _iter_row_clients(rows: Iterator[tuple], text_amounts: bool = False) -> Iterator[ClientRecord]:
+    """
+    Разбор строк реестра (первая - заголовки) в записи клиентов (ClientRecord)
+
+    Строки читаются потоком и нормализуются блоками по NORMALIZE_BLOCK_ROWS
+    поколоночно: текстовые поля - списками, суммы - массивами NumPy
+    (normalize_amounts).
+    text_amounts - суммы приходят текстом (CSV) и разбираются parse_number.
+    """
+    rows = iter(rows)
+    header_row = tuple(next(rows, ()))
+
+    # Маппинг заголовков на поля (кэшируется по строке заголовков)
+    col_indices = COLUMN_RESOLVER.resolve(header_row).fields
+
+    # Строки в read-only режиме могут быть короче заголовка - дополняем до нужной ширины
+    width = max([1, *col_indices.values()])
+
+    block = []
+    for row, values in enumerate(rows, start=2):
+        if len(values) < width:
+            values = tuple(values) + (None,) * (width - len(values))
+
+        if not values[0]:
             continue
 
-        client = {
-            'id': row - 1,
-            'contract_number': '',
-            'contract_date': '',
-            'client_name': '',
-            'iin': '',  # ИИН клиента
-            'principal': 0,
-            'reward': 0,
-            'deferred_interest': 0,
-            'penalties': 0,  # Пени, штрафы, неустойки (объединенные)
-            'admin_fees': 0,  # Административные сборы (включая гос.пошлину)
-            'total': 0,
-            # Временные поля для обратной совместимости
-            'penalty_principal_old': 0,
-            'penalty_reward_old': 0
-        }
+        block.append((row, values))
+        if len(block) >= NORMALIZE_BLOCK_ROWS:
+            yield from _normalize_block(block, col_indices, header_row, text_amounts)
+            block = []
+    if block:
+        yield from _normalize_block(block, col_indices, header_row, text_amounts)
 
-        for field_name, col_idx in col_indices.items():
-            value = ws.cell(row=row, column=col_idx).value
-            if value is not None:
-                if field_name == 'iin':
-                    # Особая обработка ИИН для сохранения ведущих нулей
-                    if isinstance(value, (int, float)):
-                        # Если число, преобразуем в строку и дополняем нулями до 12 цифр
-                        str_value = str(int(value)).zfill(12)
-                    else:
-                        # Если строка, просто убираем пробелы
-                        str_value = str(value).strip()
-                    client[field_name] = str_value if str_value else ''
-                elif field_name in ['contract_number', 'contract_date', 'client_name']:
-                    # Преобразуем в строку и убираем пробелы
-                    str_value = str(value).strip()
-                    client[field_name] = str_value if str_value else ''
-                else:
-                    try:
-                        # Округляем до целого (тенге без тиынов)
-                        val = round(float(value)) if value else 0
-                        if field_name == 'admin_fees':
-                            # Суммируем все значения из столбцов гос.пошлины и админ.сборов
-                            client['admin_fees'] += val
-                        else:
-                            client[field_name] = val
-                    except:
-                        if field_name not in ['penalty_principal_old', 'penalty_reward_old']:
-                            client[field_name] = 0
-
-        # Если penalties не был задан напрямую, суммируем из старых столбцов
-        if client['penalties'] == 0:
-            client['penalties'] = client['penalty_principal_old'] + client['penalty_reward_old']
-
-        # Удаляем временные поля
-        del client['penalty_principal_old']
-        del client['penalty_reward_old']
-
-        # Если total не был задан из Excel, рассчитываем его
-        if client['total'] == 0:
-            client['total'] = (
-                client['principal'] + client['reward'] + client['deferred_interest'] +
-                client['penalties'] + client['admin_fees']
-            )
 
-        # Валидация ИИН
-        iin_validation = validate_iin(client['iin'])
-        client['iin_valid'] = iin_validation['valid']
-        client['iin_error'] = iin_validation['error']
+def _normalize_block(block: List[tuple], col_indices, header_row: tuple, text_amounts: bool) -> Iterator[ClientRecord]:
+    """
+    Клиенты из блока строк (номер строки, значения)
+
+    Блок разбирается по столбцам: текстовые поля - списками, суммы -
+    массивами normalize_amounts; записи клиентов собираются в конце.
+    """
+    rows = [values for _, values in block]
+
+    def column(field_name: str) -> list:
+        col_idx = col_indices.get(field_name)
+        if not col_idx:
+            return [None] * len(rows)
+        return list(map(itemgetter(col_idx - 1), rows))
+
+    columns = {field_name: column(field_name) for field_name in SOURCE_AMOUNT_FIELDS if field_name in col_indices}
+    amounts, errors = normalize_amounts(columns, len(block), text_amounts)
+
+    # Преобразуем в строку и убираем пробелы
+    texts = {
+        field_name: ['' if value is None else str(value).strip() for value in column(field_name)]
+        for field_name in ('contract_number', 'contract_date', 'client_name')
+    }
+    # Разных дат договоров в реестре немного: одна строка на дату на все записи
+    texts['contract_date'] = list(map(sys.intern, texts['contract_date']))
+    # Особая обработка ИИН для сохранения ведущих нулей: число дополняем нулями до 12 цифр
+    iins = [
+        '' if value is None else str(int(value)).zfill(12) if isinstance(value, (int, float)) else str(value).strip()
+        for value in column('iin')
+    ]
+
+    # Валидация ИИН (контрольная цифра, дата рождения, век) - столбцом
+    iin_valid, iin_errors = validate_iins(iins)
+
+    clients = starmap(ClientRecord, zip(
+        [row - 1 for row, _ in block],
+        texts['contract_number'], texts['contract_date'], texts['client_name'], iins,
+        amounts['principal'], amounts['reward'], amounts['deferred_interest'],
+        amounts['penalties'], amounts['admin_fees'], amounts['total'],
+        iin_valid, iin_errors
+    ))
 
+    headers = {field_name: str(header_row[col_indices[field_name] - 1]).strip() for field_name in columns}
+    for i, client in enumerate(clients):
         # Пропускаем пустые строки (нет номера договора, ФИО и всех сумм)
         if not client['contract_number'] and not client['client_name'] and client['total'] == 0:
             continue
 
-        clients.append(client)
+        # Нераспознанные суммы считаются нулём, но не молча: ошибки - в amount_errors
+        row_errors = errors.get(i)
+        if row_errors:
+            client['amount_errors'] = {
+                field_name: f"{headers[field_name]}: не число «{value}»"
+                for field_name, value in row_errors.items()
+            }
+
+        yield client
+
+
+def normalize_amounts(columns: dict, size: int, text_amounts: bool = False) -> tuple:
+    """
+    Поколоночная нормализация сумм блока строк (NumPy)
+
+    columns - поле -> список значений ячеек. Значения приводятся к числам
+    и округляются до целых тенге (как round: половина - к чётному), пустые
+    ячейки - 0. Старые столбцы пени складываются в penalties, если он не
+    задан, total считается как сумма слагаемых, если не задан.
+
+    Возвращает (поле -> список int для всех SOURCE_AMOUNT_FIELDS,
+    номер строки -> {поле: исходное значение} для нераспознанных ячеек).
+    """
+    import numpy as np
+
+    arrays = {}
+    errors = {}
+    for field_name in SOURCE_AMOUNT_FIELDS:
+        values = columns.get(field_name)
+        if values is None:
+            arrays[field_name] = np.zeros(size, dtype=np.int64)
+            continue
+        numbers, bad = _coerce_amounts(np, values, text_amounts)
+        arrays[field_name] = numbers
+        for i in bad:
+            errors.setdefault(int(i), {})[field_name] = values[i]
+
+    # Если penalties не был задан напрямую, суммируем из старых столбцов
+    penalties = arrays['penalties']
+    arrays['penalties'] = np.where(
+        penalties == 0, arrays['penalty_principal_old'] + arrays['penalty_reward_old'], penalties
+    )
 
-    wb.close()
-    return clients
+    # Если total не был задан из реестра, рассчитываем его
+    total = arrays['total']
+    arrays['total'] = np.where(total == 0, sum(arrays[field_name] for field_name in TOTAL_COMPONENTS), total)
+
+    return {field_name: array.tolist() for field_name, array in arrays.items()}, errors
 
 
-def create_excel_certificate(client: dict, report_date: str, manager: str, output_path: Path):
-    """Создание справки в формате Excel"""
+def _coerce_amounts(np, values: list, text_amounts: bool) -> tuple:
+    """(целые суммы столбца, номера нераспознанных ячеек)"""
+    column = np.array(values, dtype=object)
+    # Пустые ячейки - 0
+    column[np.equal(column, None) | np.equal(column, '')] = 0
+
+    try:
+        # Обычный случай: в столбце только числа
+        numbers = column.astype(np.float64)
+    except (TypeError, ValueError):
+        numbers = _coerce_mixed(np, column, text_amounts)
+
+    # Нераспознанные, бесконечные (и NaN) и не помещающиеся в int64 значения - ошибка строки, сумма 0
+    bad = np.flatnonzero(~np.isfinite(numbers) | (np.abs(numbers) >= 2**63))
+    numbers[bad] = 0
+    # Округляем до целого (тенге без тиынов)
+    return np.rint(numbers).astype(np.int64), bad
+
+
+def _coerce_mixed(np, column, text_amounts: bool):
+    """Столбец с текстом: числа - приведением массива, строки - _parse_strings, прочее поштучно"""
+    numbers = np.empty(len(column))
+
+    strings = np.fromiter(map(isinstance, column, repeat(str)), bool, len(column))
+    if strings.any():
+        numbers[strings] = _parse_strings(np, column[strings].tolist(), text_amounts)
+
+    rest = ~strings
+    try:
+        numbers[rest] = column[rest].astype(np.float64)
+    except (TypeError, ValueError):
+        # Даты и т.п. - редкость
+        numbers[rest] = [_to_float(value, text_amounts) for value in column[rest]]
+    return numbers
+
+
+def _parse_strings(np, strings: List[str], text_amounts: bool):
+    """
+    Числа из строк столбца проходами по склеенному тексту, а не по ячейкам
+
+    У сумм CSV пробелы убираются и запятая меняется на точку сразу во всём
+    тексте (правила parse_number). Если не все строки - числа, строки, где
+    кроме цифр не больше одной точки, приводятся к числам одним массивом,
+    остальные ('н/д', '-5', '1,234,567.89') - поштучно теми же правилами,
+    что и раньше.
+    """
+    text = '\n'.join(strings)
+    if text_amounts:
+        for space in ('\xa0', '\u202f', ' '):
+            text = text.replace(space, '')
+        text = text.replace(',', '.')
+    parts = text.split('\n')
+    if len(parts) != len(strings):
+        # Перевод строки в значении - только поштучно
+        return np.fromiter((_to_float(value, text_amounts) for value in strings), np.float64, len(strings))
+    try:
+        # Обычный случай: все строки - числа
+        return np.array(parts, dtype=np.float64)
+    except ValueError:
+        pass
+
+    # Что остаётся от строки без цифр (по байтам UTF-8 - так translate быстрее)
+    rest = text.encode('utf-8').translate(None, b'0123456789').split(b'\n')
+    size = len(parts)
+    lengths = np.fromiter(map(len, parts), np.int64, size)
+    rest_lengths = np.fromiter(map(len, rest), np.int64, size)
+    dots = np.fromiter(map(b'.'.__eq__, rest), bool, size)
+    # Есть цифры, а кроме них - ничего или одна точка
+    simple = (lengths > rest_lengths) & ((rest_lengths == 0) | dots)
+
+    numbers = np.empty(size)
+    index = np.flatnonzero(simple)
+    if len(index):
+        numbers[index] = np.array([parts[i] for i in index.tolist()], dtype=np.float64)
+    for i in np.flatnonzero(~simple):
+        numbers[i] = _to_float(strings[i], text_amounts)
+    return numbers
+
+
+def _to_float(value, text_amounts: bool) -> float:
+    if text_amounts and isinstance(value, str):
+        value = parse_number(value)
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return float('nan')
+
+
+def excel_certificate_texts(client: dict, report_date: str) -> tuple:
+    """Переменные тексты справки Excel: основной абзац и строки детализации"""
+    # Основной текст
+    contract_date = format_date_russian(client['contract_date'])
+    total_text = format_number_with_text(int(client['total']))
+
+    iin_text = f", ИИН {client['iin']}" if client.get('iin') else ""
+    main_text = (
+        f"По договору займа №{client['contract_number']} от {contract_date}, "
+        f"Заемщик: {client['client_name']}{iin_text}, по состоянию на {report_date} "
+        f"ссудная задолженность составляет {total_text} тенге, из них:"
+    )
+
+    # Детализация
+    details = [
+        ('Основной долг', client['principal'], True),
+        ('Вознаграждение', client['reward'], True),
+    ]
+
+    if client['deferred_interest'] > 0:
+        details.append(('Сумма отсроченных процентов', client['deferred_interest'], False))
+    if client['penalties'] > 0:
+        details.append(('Пени, штрафы, неустойки', client['penalties'], True))
+    if client['admin_fees'] > 0:
+        details.append(('Прочие поступления (административные сборы, гос.пошлина)', client['admin_fees'], False))
+
+    detail_texts = []
+    for label, amount, show_text in details:
+        if show_text and amount > 0:
+            text = f"{label} - {format_number_with_text(int(amount))} тенге;"
+        else:
+            text = f"{label} – {int(amount):,} тенге;".replace(',', ' ')
+        detail_texts.append(text)
+
+    return main_text, detail_texts
+
+
+def build_excel_certificate(main_text: str, detail_texts: List[str], manager: str) -> "Workbook":
+    """Книга Excel со справкой: разметка, шрифты, объединения ячеек"""
+    from openpyxl import Workbook
+    from openpyxl.styles import Font, Alignment
+    from openpyxl.cell.text import InlineFont
+    from openpyxl.cell.rich_text import TextBlock, CellRichText
+
     wb = Workbook()
     ws = wb.active
     ws.title = "Справка"
@@ -453,17 +755,6 @@ def create_excel_certificate(client: dict, report_date: str, manager: str, outpu
     ws[f'A{row}'].alignment = Alignment(horizontal='center')
     row += 5  # Разрыв 5 строк после заголовка
 
-    # Основной текст
-    contract_date = format_date_russian(client['contract_date'])
-    total_text = format_number_with_text(int(client['total']))
-
-    iin_text = f", ИИН {client['iin']}" if client.get('iin') else ""
-    main_text = (
-        f"По договору займа №{client['contract_number']} от {contract_date}, "
-        f"Заемщик: {client['client_name']}{iin_text}, по состоянию на {report_date} "
-        f"ссудная задолженность составляет {total_text} тенге, из них:"
-    )
-
     ws.merge_cells(f'A{row}:C{row}')
     ws[f'A{row}'] = main_text
     ws[f'A{row}'].alignment = Alignment(wrap_text=True, vertical='top', indent=2)
@@ -471,28 +762,10 @@ def create_excel_certificate(client: dict, report_date: str, manager: str, outpu
     row += 2
 
     # Детализация
-    details = [
-        ('Основной долг', client['principal'], True),
-        ('Вознаграждение', client['reward'], True),
-    ]
-
-    if client['deferred_interest'] > 0:
-        details.append(('Сумма отсроченных процентов', client['deferred_interest'], False))
-    if client['penalties'] > 0:
-        details.append(('Пени, штрафы, неустойки', client['penalties'], True))
-    if client['admin_fees'] > 0:
-        details.append(('Прочие поступления (административные сборы, гос.пошлина)', client['admin_fees'], False))
-
-    for label, amount, show_text in details:
+    for text in detail_texts:
         ws[f'A{row}'] = "➤"
         ws[f'A{row}'].alignment = Alignment(horizontal='center', indent=2)
         ws.merge_cells(f'B{row}:C{row}')
-
-        if show_text and amount > 0:
-            text = f"{label} - {format_number_with_text(int(amount))} тенге;"
-        else:
-            text = f"{label} – {int(amount):,} тенге;".replace(',', ' ')
-
         ws[f'B{row}'] = text
         ws[f'B{row}'].alignment = Alignment(indent=2)
         row += 1
@@ -507,133 +780,293 @@ def create_excel_certificate(client: dict, report_date: str, manager: str, outpu
     ws[f'C{row}'].font = Font(bold=True)
     ws[f'C{row}'].alignment = Alignment(horizontal='right')
 
-    wb.save(output_path)
-    wb.close()
-
-
-def create_pdf_certificate(client: dict, report_date: str, manager: str, output_path: Path):
-    """Создание справки в формате PDF"""
-    doc = SimpleDocTemplate(
-        str(output_path),
-        pagesize=A4,
-        rightMargin=20*mm,
-        leftMargin=20*mm,
-        topMargin=20*mm,
-        bottomMargin=20*mm
-    )
+    return wb
 
-    # Стили с кириллическим шрифтом
-    title_style = ParagraphStyle(
-        'Title',
-        fontName=PDF_FONT_BOLD,
-        fontSize=16,  # Уменьшено с 18
-        alignment=1,
-        spaceAfter=4  # Уменьшено с 6
-    )
 
-    subtitle_style = ParagraphStyle(
-        'Subtitle',
-        fontName=PDF_FONT,
-        fontSize=8,  # Уменьшено с 9
-        textColor=colors.grey,
-        alignment=1,
-        spaceAfter=2  # Уменьшено с 3
-    )
+@metrics.timed('excel_certificate')
+def create_excel_certificate(client: dict, report_date: str, manager: str, output_path: Union[Path, BinaryIO]):
+    """
+    Создание справки в формате Excel (output_path - путь или файловый объект)
 
-    heading_style = ParagraphStyle(
-        'Heading',
-        fontName=PDF_FONT_BOLD,
-        fontSize=11,  # Уменьшено с 12
-        alignment=1,
-        spaceBefore=10,  # Уменьшено с 20
-        spaceAfter=10  # Уменьшено с 20
-    )
+    Для пакетов используйте ExcelCertificateTemplate - он собирает книгу
+    через openpyxl один раз и дальше только подставляет тексты.
+    """
+    main_text, detail_texts = excel_certificate_texts(client, report_date)
+    wb = build_excel_certificate(main_text, detail_texts, manager)
+    wb.save(output_path)
+    wb.close()
 
-    body_style = ParagraphStyle(
-        'Body',
-        fontName=PDF_FONT,
-        fontSize=10,
-        leading=14,
-        spaceAfter=10,
-        leftIndent=10*mm  # Отступ 1 см
-    )
 
-    bullet_style = ParagraphStyle(
-        'Bullet',
-        fontName=PDF_FONT,
-        fontSize=10,
-        leftIndent=10*mm,  # Отступ 1 см
-        spaceAfter=5
-    )
+class ExcelCertificateTemplate:
+    """
+    Шаблон справки Excel с клонированием готового xlsx
+
+    Для каждого числа строк детализации (2-5) один раз собирается книга
+    через openpyxl с метками вместо переменных текстов. Затем справка
+    клиента - это копия пакета xlsx, где в листе sheet1.xml метки заменены
+    на тексты. Остальные части пакета (стили, тема, свойства) хранятся
+    уже сжатыми и копируются как есть.
+    """
+
+    MAIN_MARK = '@@MAIN@@'
+    DETAIL_MARK = '@@DETAIL{}@@'
+
+    def __init__(self, report_date: str, manager: str):
+        self.report_date = report_date
+        self.manager = manager
+        self._skeletons = {}
+
+    def _skeleton(self, details_count: int) -> dict:
+        """Заготовка пакета xlsx для заданного числа строк детализации"""
+        skeleton = self._skeletons.get(details_count)
+        if skeleton is not None:
+            return skeleton
+
+        marks = [self.DETAIL_MARK.format(i) for i in range(details_count)]
+        wb = build_excel_certificate(self.MAIN_MARK, marks, self.manager)
+        buffer = io.BytesIO()
+        wb.save(buffer)
+        wb.close()
+
+        members = []
+        sheet_parts = None
+        with zipfile.ZipFile(buffer) as zf:
+            for info in zf.infolist():
+                data = zf.read(info.filename)
+                if info.filename == 'xl/worksheets/sheet1.xml':
+                    # Лист делится метками на статические куски и места для текстов
+                    sheet_parts = self._split_sheet(data.decode('utf-8'), [self.MAIN_MARK] + marks)
+                    members.append((info.filename, None))
+                else:
+                    members.append((info.filename, _RawZipMember.compress(info.filename, data)))
+
+        skeleton = {'members': members, 'sheet_parts': sheet_parts}
+        self._skeletons[details_count] = skeleton
+        return skeleton
+
+    @staticmethod
+    def _split_sheet(sheet_xml: str, marks: List[str]) -> List[str]:
+        parts = []
+        rest = sheet_xml
+        for mark in marks:
+            head, rest = rest.split(f'<t>{mark}</t>', 1)
+            parts.append(head)
+        parts.append(rest)
+        return parts
+
+    @staticmethod
+    def _text_xml(value: str) -> str:
+        """Элемент <t> для inline-строки (как пишет openpyxl)"""
+        from openpyxl.cell.cell import ILLEGAL_CHARACTERS_RE
+        from openpyxl.utils.exceptions import IllegalCharacterError
+
+        if ILLEGAL_CHARACTERS_RE.search(value):
+            raise IllegalCharacterError(f"{value} cannot be used in worksheets.")
+        escaped = value.replace('&', '&amp;').replace('<', '&lt;').replace('>', '&gt;')
+        if value != value.strip():
+            return f'<t xml:space="preserve">{escaped}</t>'
+        return f'<t>{escaped}</t>'
+
+    @metrics.timed('excel_certificate')
+    def render(self, client: dict, output_path: Union[Path, BinaryIO]):
+        """Справка клиента в файл или файловый объект"""
+        main_text, detail_texts = excel_certificate_texts(client, self.report_date)
+        skeleton = self._skeleton(len(detail_texts))
+
+        parts = skeleton['sheet_parts']
+        pieces = [parts[0]]
+        for part, text in zip(parts[1:], [main_text] + detail_texts):
+            pieces.append(self._text_xml(text))
+            pieces.append(part)
+        sheet = _RawZipMember.compress('xl/worksheets/sheet1.xml', ''.join(pieces).encode('utf-8'))
+
+        members = [member or sheet for name, member in skeleton['members']]
+        data = _RawZipMember.build_archive(members)
+
+        if isinstance(output_path, Path):
+            output_path.write_bytes(data)
+        else:
+            output_path.write(data)
+
+
+class _RawZipMember:
+    """
+    Заранее сжатый элемент ZIP архива
+
+    zipfile не умеет записывать уже сжатые данные, поэтому архивы из
+    готовых элементов (xlsx из заготовки, архив справок с неизменившимися
+    файлами) собираются вручную: локальные заголовки, данные и
+    центральный каталог.
+    """
+
+    # 01.01.2025 00:00 в формате DOS
+    DOS_TIME = 0
+    DOS_DATE = ((2025 - 1980) << 9) | (1 << 5) | 1
+
+    # Флаг "имя в UTF-8" (нужен для имён файлов справок с ФИО)
+    UTF8_FLAG = 0x800
+
+    # Создан в Unix, версия 2.0 - как у zipfile; для MS-DOS unzip перекодирует имена из OEM
+    VERSION_MADE_BY = (3 << 8) | 20
+
+    __slots__ = ('name', 'data', 'crc', 'size')
+
+    def __init__(self, name: bytes, data: bytes, crc: int, size: int):
+        self.name = name
+        self.data = data
+        self.crc = crc
+        self.size = size
+
+    @classmethod
+    def compress(cls, name: str, data: bytes) -> "_RawZipMember":
+        compressor = zlib.compressobj(6, zlib.DEFLATED, -15)
+        deflated = compressor.compress(data) + compressor.flush()
+        return cls(name.encode('utf-8'), deflated, zlib.crc32(data), len(data))
+
+    @classmethod
+    def read_archive(cls, zip_path: Path) -> dict:
+        """Элементы существующего архива без распаковки: имя -> _RawZipMember"""
+        members = {}
+        with zipfile.ZipFile(zip_path) as zf, open(zip_path, 'rb') as f:
+            for info in zf.infolist():
+                if info.compress_type != zipfile.ZIP_DEFLATED:
+                    members[info.filename] = cls.compress(info.filename, zf.read(info))
+                    continue
+                # Данные идут после локального заголовка (30 байт + имя + extra)
+                f.seek(info.header_offset + 26)
+                name_len, extra_len = struct.unpack('<HH', f.read(4))
+                f.seek(info.header_offset + 30 + name_len + extra_len)
+                members[info.filename] = cls(
+                    info.filename.encode('utf-8'), f.read(info.compress_size), info.CRC, info.file_size
+                )
+        return members
+
+    @staticmethod
+    def write_archive(members: List["_RawZipMember"], fileobj: BinaryIO):
+        central = []
+        offset = 0
+        for m in members:
+            flags = 0 if m.name.isascii() else _RawZipMember.UTF8_FLAG
+            header = struct.pack(
+                '<IHHHHHIIIHH', 0x04034b50, 20, flags, 8, _RawZipMember.DOS_TIME, _RawZipMember.DOS_DATE,
+                m.crc, len(m.data), m.size, len(m.name), 0
+            )
+            central.append(struct.pack(
+                '<IHHHHHHIIIHHHHHII', 0x02014b50, _RawZipMember.VERSION_MADE_BY, 20, flags, 8, _RawZipMember.DOS_TIME,
+                _RawZipMember.DOS_DATE, m.crc, len(m.data), m.size, len(m.name), 0, 0, 0, 0, 0, offset
+            ) + m.name)
+            fileobj.write(header)
+            fileobj.write(m.name)
+            fileobj.write(m.data)
+            offset += len(header) + len(m.name) + len(m.data)
+
+        directory = b''.join(central)
+        if offset + len(directory) > 0xFFFFFFFF or len(members) > 0xFFFF:
+            raise ValueError("Архив слишком большой для формата ZIP без ZIP64")
+        fileobj.write(directory)
+        fileobj.write(struct.pack('<IHHHHIIH', 0x06054b50, 0, 0, len(members), len(members),
+                                  len(directory), offset, 0))
+
+    @staticmethod
+    def build_archive(members: List["_RawZipMember"]) -> bytes:
+        buffer = io.BytesIO()
+        _RawZipMember.write_archive(members, buffer)
+        return buffer.getvalue()
+
+
+def certificate_filename(client: dict) -> str:
+    """Имя файла справки без расширения: {id:04d}_{ФИО}"""
+    safe_name = "".join(c for c in client['client_name'] if c.isalnum() or c in ' _-').strip()[:50]
+    return f"{client['id']:04d}_{safe_name}"
+
+
+def render_certificates(clients: List[dict], report_date: str, manager: str,
+                        output_dir: Path, formats: List[str],
+                        progress: Optional[Callable[[int, List[dict]], None]] = None,
+                        cache_dir: Optional[Path] = None) -> dict:
+    """
+    Последовательная генерация справок для списка клиентов
+
+    Ошибка по одному клиенту не прерывает пакет: клиент попадает в
+    список 'failed'. progress(обработано, ошибки) вызывается после
+    каждого клиента. Если задан cache_dir, справки с неизменившимися
+    данными берутся из кэша (RenderCache), а не рендерятся заново;
+    их число возвращается в 'cached'.
+    """
+    excel_dir = output_dir / "excel"
+    pdf_dir = output_dir / "pdf"
 
-    story = []
+    generated = {'excel': [], 'pdf': [], 'failed': [], 'cached': 0}
+    cache = RenderCache(cache_dir) if cache_dir else None
 
-    # Шапка с цветным названием компании
-    company_name_html = '<font color="red">Swiss</font>Capital'
-    story.append(Paragraph(company_name_html, title_style))
-    story.append(Paragraph(COMPANY['address'], subtitle_style))
-    story.append(Paragraph(f"телефон: {COMPANY['phone']}", subtitle_style))
-    story.append(Spacer(1, 50))  # Разрыв 5 строк после шапки
+    # Стили, шапка и подпись PDF, заготовки xlsx - один раз на пакет (и только если нужны)
+    templates = {}
 
-    # Заголовок
-    story.append(Paragraph("Расчет ссудной задолженности", heading_style))
-    story.append(Spacer(1, 50))  # Разрыв 5 строк после заголовка
+    def render(client: dict, format_type: str, ext: str, path: Path):
+        key = certificate_cache_key(client, report_date, manager, format_type) if cache else None
+        if cache and cache.fetch(key, ext, path):
+            generated['cached'] += 1
+            return
 
-    # Основной текст
-    contract_date = format_date_russian(client['contract_date'])
-    total_text = format_number_with_text(int(client['total']))
+        if format_type not in templates:
+            template_class = ExcelCertificateTemplate if format_type == 'excel' else PdfCertificateTemplate
+            templates[format_type] = template_class(report_date, manager)
+        templates[format_type].render(client, path)
 
-    iin_text = f", ИИН {client['iin']}" if client.get('iin') else ""
-    main_text = (
-        f"По договору займа №{client['contract_number']} от {contract_date}, "
-        f"Заемщик: {client['client_name']}{iin_text}, по состоянию на {report_date} "
-        f"ссудная задолженность составляет {total_text} тенге, из них:"
-    )
+        if cache:
+            cache.store(key, ext, path)
 
-    story.append(Paragraph(main_text, body_style))
-    story.append(Spacer(1, 10))
+    for client in clients:
+        filename = certificate_filename(client)
+        failed = []
 
-    # Детализация
-    details = [
-        ('Основной долг', client['principal'], True),
-        ('Вознаграждение', client['reward'], True),
-    ]
+        try:
+            if 'excel' in formats:
+                excel_path = excel_dir / f"{filename}.xlsx"
+                render(client, 'excel', 'xlsx', excel_path)
+                generated['excel'].append(excel_path)
+
+            if 'pdf' in formats:
+                pdf_path = pdf_dir / f"{filename}.pdf"
+                render(client, 'pdf', 'pdf', pdf_path)
+                generated['pdf'].append(pdf_path)
+        except Exception as e:
+            failed.append({'id': client['id'], 'client_name': client['client_name'], 'error': str(e)})
+            generated['failed'].extend(failed)
 
-    if client['deferred_interest'] > 0:
-        details.append(('Сумма отсроченных процентов', client['deferred_interest'], False))
-    if client['penalties'] > 0:
-        details.append(('Пени, штрафы, неустойки', client['penalties'], True))
-    if client['admin_fees'] > 0:
-        details.append(('Прочие поступления (административные сборы, гос.пошлина)', client['admin_fees'], False))
+        if progress:
+            progress(1, failed)
 
-    for label, amount, show_text in details:
-        if show_text and amount > 0:
-            text = f"• {label} - {format_number_with_text(int(amount))} тенге;"
-        else:
-            text = f"• {label} – {int(amount):,} тенге;".replace(',', ' ')
-        story.append(Paragraph(text, bullet_style))
+    return generated
 
-    story.append(Spacer(1, 100))  # Разрыв 10 строк перед подписью
 
-    # Подпись (жирным шрифтом)
-    signature_data = [
-        ['Операционный менеджер', manager]
-    ]
-    signature_table = Table(signature_data, colWidths=[120*mm, 50*mm])
-    signature_table.setStyle(TableStyle([
-        ('ALIGN', (0, 0), (0, 0), 'LEFT'),
-        ('ALIGN', (1, 0), (1, 0), 'RIGHT'),
-        ('FONTNAME', (0, 0), (-1, -1), PDF_FONT_BOLD),
-        ('FONTSIZE', (0, 0), (-1, -1), 10),
-    ]))
-    story.append(signature_table)
+def render_certificates_chunk(*args, **kwargs) -> dict:
+    """
+    render_certificates в процессе пула
 
-    doc.build(story)
+    Время этапов, измеренное в дочернем процессе, возвращается в 'timings'
+    и учитывается в метриках основного процесса.
+    """
+    with metrics.collect_stages() as timings:
+        generated = render_certificates(*args, **kwargs)
+    generated['timings'] = timings.durations
+    return generated
 
 
+@metrics.timed('generate_certificates')
 def generate_all_certificates(clients: List[dict], report_date: str, manager: str,
-                               output_dir: Path, formats: List[str]) -> dict:
-    """Генерация всех справок"""
+                               output_dir: Path, formats: List[str],
+                               workers: Optional[int] = None,
+                               progress: Optional[Callable[[int, List[dict]], None]] = None,
+                               cache_dir: Optional[Path] = None) -> dict:
+    """
+    Генерация всех справок
+
+    При workers > 1 клиенты делятся на порции и обрабатываются в пуле
+    процессов (openpyxl и reportlab нагружают CPU и не масштабируются
+    потоками). Порядок файлов в результате совпадает с порядком клиентов.
+    В этом режиме progress вызывается по завершении каждой порции.
+    """
     excel_dir = output_dir / "excel"
     pdf_dir = output_dir / "pdf"
 
@@ -642,25 +1075,44 @@ def generate_all_certificates(clients: List[dict], report_date: str, manager: st
     if 'pdf' in formats:
         pdf_dir.mkdir(exist_ok=True)
 
-    generated = {'excel': [], 'pdf': []}
+    if workers is None:
+        workers = GENERATION_WORKERS
+    workers = min(workers, len(clients))
 
-    for client in clients:
-        safe_name = "".join(c for c in client['client_name'] if c.isalnum() or c in ' _-').strip()[:50]
-        filename = f"{client['id']:04d}_{safe_name}"
+    if workers <= 1:
+        return render_certificates(clients, report_date, manager, output_dir, formats, progress, cache_dir)
+
+    # Порции: по 4 на процесс, чтобы выровнять нагрузку
+    chunk_size = GENERATION_CHUNK_SIZE or max(1, -(-len(clients) // (workers * 4)))
+    chunks = [clients[i:i + chunk_size] for i in range(0, len(clients), chunk_size)]
+
+    generated = {'excel': [], 'pdf': [], 'failed': [], 'cached': 0}
 
-        if 'excel' in formats:
-            excel_path = excel_dir / f"{filename}.xlsx"
-            create_excel_certificate(client, report_date, manager, excel_path)
-            generated['excel'].append(excel_path)
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        futures = [
+            pool.submit(render_certificates_chunk, chunk, report_date, manager, output_dir, formats,
+                        cache_dir=cache_dir)
+            for chunk in chunks
+        ]
 
-        if 'pdf' in formats:
-            pdf_path = pdf_dir / f"{filename}.pdf"
-            create_pdf_certificate(client, report_date, manager, pdf_path)
-            generated['pdf'].append(pdf_path)
+        if progress:
+            chunk_sizes = {future: len(chunk) for future, chunk in zip(futures, chunks)}
+            for future in as_completed(futures):
+                progress(chunk_sizes[future], future.result()['failed'])
+
+        # Собираем результаты в порядке порций
+        for future in futures:
+            part = future.result()
+            generated['excel'].extend(part['excel'])
+            generated['pdf'].extend(part['pdf'])
+            generated['failed'].extend(part['failed'])
+            generated['cached'] += part['cached']
+            metrics.record_stages(part['timings'])
 
     return generated
 
 
+@metrics.timed('zip_archive')
 def create_zip_archive(files: List[Path], output_path: Path):
     """Создание ZIP архива"""
     with zipfile.ZipFile(output_path, 'w', zipfile.ZIP_DEFLATED) as zf:
@@ -668,65 +1120,878 @@ def create_zip_archive(files: List[Path], output_path: Path):
             zf.write(file, file.name)
 
 
+def render_certificate_bytes(client: dict, report_date: str, manager: str, format_type: str,
+                             pdf_template: Optional[PdfCertificateTemplate] = None,
+                             excel_template: Optional[ExcelCertificateTemplate] = None) -> bytes:
+    """Справка одного клиента в памяти (без записи на диск)"""
+    buffer = io.BytesIO()
+    if format_type == 'excel' and excel_template:
+        excel_template.render(client, buffer)
+    elif format_type == 'excel':
+        create_excel_certificate(client, report_date, manager, buffer)
+    elif pdf_template:
+        pdf_template.render(client, buffer)
+    else:
+        create_pdf_certificate(client, report_date, manager, buffer)
+    return buffer.getvalue()
+
+
+def certificate_preview(client: dict, report_date: str, manager: str, kind: str = 'pdf') -> tuple:
+    """
+    Предпросмотр справки: (байты, ключ справки)
+
+    kind - 'pdf' или 'png-<ширина>' (первая страница PDF). PDF рендерится
+    тем же кодом, что и при генерации, и ищется сначала в памяти, затем в
+    кэше справок на диске - туда же он и сохраняется, так что генерация
+    после предпросмотра берёт справку готовой.
+    """
+    key = certificate_cache_key(client, report_date, manager, 'pdf')
+    data = preview_cache.get(key, kind)
+    if data is not None:
+        return data, key
+
+    pdf = preview_cache.get(key, 'pdf')
+    if pdf is None:
+        cache = RenderCache(RENDER_CACHE_DIR) if RENDER_CACHE_ENABLED else None
+        pdf = cache.read(key, 'pdf') if cache else None
+        if pdf is None:
+            pdf = render_certificate_bytes(client, report_date, manager, 'pdf')
+            if cache:
+                cache.write(key, 'pdf', pdf)
+        preview_cache.put(key, 'pdf', pdf)
+
+    if kind == 'pdf':
+        return pdf, key
+    data = render_png(pdf, int(kind.split('-', 1)[1]))
+    preview_cache.put(key, kind, data)
+    return data, key
+
+
+class _ZipStreamSink:
+    """Приёмник для zipfile без seek: накапливает байты до выдачи клиенту"""
+
+    def __init__(self):
+        self._chunks = []
+
+    def write(self, data) -> int:
+        self._chunks.append(bytes(data))
+        return len(data)
+
+    def flush(self):
+        pass
+
+    def drain(self) -> bytes:
+        data = b''.join(self._chunks)
+        self._chunks.clear()
+        return data
+
+
+def stream_zip_archive(clients: List[dict], report_date: str, manager: str, format_type: str,
+                       save_path: Optional[Path] = None, cache_dir: Optional[Path] = None) -> Iterator[bytes]:
+    """
+    Потоковый ZIP архив справок
+
+    Каждая справка рендерится в память и сразу дописывается в поток архива,
+    поэтому первые байты уходят клиенту, пока остальные справки ещё
+    генерируются. Если указан save_path, те же байты сохраняются в файл -
+    повторные скачивания отдаются с диска. При обрыве загрузки недописанный
+    файл удаляется. С cache_dir справки с неизменившимися данными берутся
+    из кэша.
+    """
+    ext = 'xlsx' if format_type == 'excel' else 'pdf'
+    cache = RenderCache(cache_dir) if cache_dir else None
+    pdf_template = PdfCertificateTemplate(report_date, manager) if format_type == 'pdf' else None
+    excel_template = ExcelCertificateTemplate(report_date, manager) if format_type == 'excel' else None
+    sink = _ZipStreamSink()
+
+    part_path = save_path.with_name(f"{save_path.name}.{uuid.uuid4().hex}.part") if save_path else None
+    part = open(part_path, 'wb') if part_path else None
+    completed = False
+
+    try:
+        with zipfile.ZipFile(sink, 'w', zipfile.ZIP_DEFLATED) as zf:
+            for client in clients:
+                try:
+                    key = certificate_cache_key(client, report_date, manager, format_type) if cache else None
+                    data = cache.read(key, ext) if cache else None
+                    if data is None:
+                        data = render_certificate_bytes(client, report_date, manager, format_type,
+                                                        pdf_template, excel_template)
+                        if cache:
+                            cache.write(key, ext, data)
+                except Exception as e:
+                    # Статус ответа уже отправлен - пропускаем клиента и пишем в лог
+                    print(f"Ошибка генерации справки {client['id']}: {e}")
+                    continue
+
+                zf.writestr(f"{certificate_filename(client)}.{ext}", data)
+                CERTIFICATES_TOTAL.inc(format=format_type)
+                chunk = sink.drain()
+                if part:
+                    part.write(chunk)
+                yield chunk
+
+        # Центральный каталог архива
+        chunk = sink.drain()
+        if part:
+            part.write(chunk)
+        yield chunk
+        completed = True
+    finally:
+        if part:
+            part.close()
+            if completed:
+                part_path.replace(save_path)
+            else:
+                part_path.unlink(missing_ok=True)
+
+
+def find_session_file(session_id: str) -> Path:
+    """Путь к загруженному файлу реестра сессии"""
+    session_dir = UPLOAD_DIR / session_id
+    if not session_dir.exists():
+        raise HTTPException(404, "Сессия не найдена")
+
+    files = sorted(path for path in session_dir.iterdir() if path.suffix.lower() in TABLE_SIGNATURES)
+    if not files:
+        raise HTTPException(404, "Файл не найден")
+
+    return files[0]
+
+
+def session_sources_path(session_id: str) -> Path:
+    return UPLOAD_DIR / session_id / "sources.json"
+
+
+def write_session_sources(session_id: str, files: List[str], all_sheets: bool):
+    """Состав пакетной загрузки: файлы в порядке загрузки и режим «все листы»"""
+    session_sources_path(session_id).write_text(
+        json.dumps({"files": files, "all_sheets": all_sheets}, ensure_ascii=False), encoding='utf-8'
+    )
+
+
+def session_source_files(session_id: str) -> tuple:
+    """(файлы сессии, все листы?) - для одиночной загрузки один файл и False"""
+    try:
+        sources = json.loads(session_sources_path(session_id).read_text(encoding='utf-8'))
+    except FileNotFoundError:
+        return [find_session_file(session_id)], False
+    session_dir = UPLOAD_DIR / session_id
+    return [session_dir / name for name in sources['files']], sources['all_sheets']
+
+
+def sources_digest(digests: List[str], all_sheets: bool) -> str:
+    """Хэш содержимого загрузки: для одного файла - его хэш, для пакета - хэш состава"""
+    if len(digests) == 1 and not all_sheets:
+        return digests[0]
+    return hashlib.sha256(json.dumps([all_sheets, digests]).encode('utf-8')).hexdigest()
+
+
+def read_sources(paths: List[Path], all_sheets: bool) -> tuple:
+    """Клиенты и маппинг столбцов загрузки (одного файла или пакета)"""
+    if len(paths) == 1 and not all_sheets:
+        return read_excel_data(paths[0]), get_column_mapping_info(paths[0])
+    return read_batch_data(paths, all_sheets)
+
+
+def unique_filenames(filenames: List[str]) -> List[str]:
+    """Имена файлов пакета без совпадений: одинаковые получают суффикс (2), (3)..."""
+    seen = set()
+    result = []
+    for filename in filenames:
+        name, n = filename, 1
+        while name.lower() in seen:
+            n += 1
+            name = f"{Path(filename).stem} ({n}){Path(filename).suffix}"
+        seen.add(name.lower())
+        result.append(name)
+    return result
+
+
+def file_digest(file_path: Path) -> str:
+    """SHA-256 содержимого файла"""
+    digest = hashlib.sha256()
+    with open(file_path, 'rb') as f:
+        for chunk in iter(lambda: f.read(1024 * 1024), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def store_upload(upload: ReceivedUpload, session_dir: Path) -> tuple:
+    """
+    Перенести принятый файл в хранилище по хэшу и связать с сессией
+
+    Одинаковые файлы хранятся один раз: в папке сессии - жёсткая ссылка
+    на общий файл. Возвращает (путь в папке сессии, хэш).
+    """
+    blob_path = UPLOAD_BLOBS_DIR / f"{upload.digest}{Path(upload.filename).suffix.lower()}"
+
+    try:
+        # Свежее время изменения: очистка не удалит файл, пока он связывается с сессией
+        os.utime(blob_path)
+        upload.path.unlink()
+    except FileNotFoundError:
+        os.replace(upload.path, blob_path)
+
+    file_path = session_dir / upload.filename
+    link_or_copy(blob_path, file_path)
+    return file_path, upload.digest
+
+
+# Поля клиента, которые можно изменить через /update-client
+EDITABLE_TEXT_FIELDS = ('contract_number', 'contract_date', 'client_name', 'iin')
+EDITABLE_AMOUNT_FIELDS = ('principal', 'reward', 'deferred_interest', 'penalties', 'admin_fees', 'total')
+TOTAL_COMPONENTS = ('principal', 'reward', 'deferred_interest', 'penalties', 'admin_fees')
+
+# Файл правок сессии меняется через чтение-изменение-запись
+session_edits_lock = threading.Lock()
+
+
+def normalize_client_changes(changes: dict) -> dict:
+    """Правки клиента в том же виде, что и при разборе Excel (ValueError при неверной сумме)"""
+    normalized = {}
+    for field_name, value in changes.items():
+        if field_name in EDITABLE_TEXT_FIELDS:
+            normalized[field_name] = '' if value is None else str(value).strip()
+        elif field_name in EDITABLE_AMOUNT_FIELDS:
+            try:
+                # Округляем до целого (тенге без тиынов)
+                normalized[field_name] = round(float(value)) if value not in (None, '') else 0
+            except (TypeError, ValueError, OverflowError):
+                raise ValueError(f"Неверная сумма в поле {field_name}: {value}")
+    return normalized
+
+
+def apply_client_changes(client: dict, changes: dict) -> ClientRecord:
+    """
+    Новая запись клиента с правками
+
+    Если суммы изменены, а total не задан явно, total пересчитывается.
+    ИИН проверяется заново, ошибки разбора изменённых сумм снимаются.
+    """
+    updated = dict(client)
+    updated.update(changes)
+
+    # Исправленные суммы больше не ошибки разбора (пени - вместе со старыми столбцами)
+    fixed = set(changes)
+    if 'penalties' in changes:
+        fixed.update(('penalty_principal_old', 'penalty_reward_old'))
+    amount_errors = {
+        field_name: error for field_name, error in (client.get('amount_errors') or {}).items()
+        if field_name not in fixed
+    }
+    updated.pop('amount_errors', None)
+    if amount_errors:
+        updated['amount_errors'] = amount_errors
+
+    if 'total' not in changes and any(field_name in changes for field_name in TOTAL_COMPONENTS):
+        updated['total'] = sum(updated[field_name] for field_name in TOTAL_COMPONENTS)
+
+    iin_validation = validate_iin(updated['iin'])
+    updated['iin_valid'] = iin_validation['valid']
+    updated['iin_error'] = iin_validation['error']
+    return ClientRecord.from_dict(updated)
+
+
+def session_edits_path(session_id: str) -> Path:
+    return UPLOAD_DIR / session_id / "edits.json"
+
+
+def session_edits_version(session_id: str) -> int:
+    """mtime_ns файла правок сессии (0 - правок нет)"""
+    try:
+        return session_edits_path(session_id).stat().st_mtime_ns
+    except FileNotFoundError:
+        return 0
+
+
+def read_session_edits(session_id: str) -> dict:
+    """Правки сессии: str(id клиента) -> {поле: значение}"""
+    try:
+        return json.loads(session_edits_path(session_id).read_text(encoding='utf-8'))
+    except FileNotFoundError:
+        return {}
+
+
+def write_session_edits(session_id: str, edits: dict) -> int:
+    """Записать правки сессии (атомарно) и вернуть их версию"""
+    path = session_edits_path(session_id)
+    tmp_path = path.with_name(f".{uuid.uuid4().hex}.tmp")
+    tmp_path.write_text(json.dumps(edits, ensure_ascii=False), encoding='utf-8')
+    os.replace(tmp_path, path)
+    return path.stat().st_mtime_ns
+
+
+def apply_session_edits(clients: List[dict], edits: dict) -> List[dict]:
+    """Список клиентов с применёнными правками (исходный список не меняется)"""
+    if not edits:
+        return clients
+    return [
+        apply_client_changes(client, edits[str(client['id'])]) if str(client['id']) in edits else client
+        for client in clients
+    ]
+
+
+def load_session(session_id: str) -> SessionData:
+    """
+    Разобранные данные сессии
+
+    Берутся из кэша; файл читается заново только если сессия была
+    вытеснена (TTL, лимит памяти) или сервер перезапускался. Правки
+    клиентов хранятся рядом с файлом (edits.json) и применяются поверх
+    разобранных данных - так их видят все процессы uvicorn.
+    """
+    edits_version = session_edits_version(session_id)
+    data = session_store.get(session_id)
+    if data is not None:
+        if data.edits_version == edits_version:
+            return data
+        # Клиентов изменили в другом процессе
+        clients = apply_session_edits(data.clients, read_session_edits(session_id))
+        return session_store.put(session_id, data.file_path, clients, data.column_mapping,
+                                 edits_version=edits_version)
+
+    paths, all_sheets = session_source_files(session_id)
+    file_path = paths[0]
+    digest = sources_digest([file_digest(path) for path in paths], all_sheets)
+
+    # Тот же файл (пакет) мог быть загружен в другой сессии
+    same = session_store.find_by_digest(digest)
+    if same is not None:
+        clients, column_info = same.clients, same.column_mapping
+    else:
+        clients, column_info = read_sources(paths, all_sheets)
+
+    if edits_version:
+        clients = apply_session_edits(clients, read_session_edits(session_id))
+        return session_store.put(session_id, file_path, clients, column_info, edits_version=edits_version)
+    return session_store.put(session_id, file_path, clients, column_info, digest)
+
+
+def edit_session_client(session_id: str, client_id: int, changes: dict) -> tuple:
+    """
+    Применить правки к клиенту сессии и сохранить их
+
+    Возвращает (обновлённый клиент, сводка clients_summary по сессии) -
+    сводка по всем клиентам считается здесь же, вне цикла событий.
+    """
+    with session_edits_lock:
+        client = load_session(session_id).get_client(client_id)
+        if client is None:
+            raise HTTPException(404, "Клиент не найден")
+
+        edits = read_session_edits(session_id)
+        merged = {**edits.get(str(client_id), {}), **changes}
+        # Суммы изменены без итога - итог, заданный раньше, пересчитывается
+        if 'total' not in changes and any(field_name in changes for field_name in TOTAL_COMPONENTS):
+            merged.pop('total', None)
+        edits[str(client_id)] = merged
+        edits_version = write_session_edits(session_id, edits)
+
+        updated = apply_client_changes(client, changes)
+        data = session_store.update_client(session_id, updated, edits_version)
+
+    return updated, clients_summary((data or load_session(session_id)).clients)
+
+
+def clients_summary(clients: List[dict]) -> dict:
+    """
+    Сводка по реестру для ответа /upload: количество, клиенты с
+    некорректным ИИН и причиной, суммы, строки с нераспознанными суммами и номера договоров, которые
+    встречаются больше одного раза (в пакете из нескольких файлов или
+    листов - часто один договор в двух выгрузках)
+    """
+    totals = dict.fromkeys(TOTAL_COMPONENTS + ('total',), 0)
+    invalid_iins = []
+    amount_errors = []
+    contracts = {}
+    for client in clients:
+        for field_name in totals:
+            totals[field_name] += client[field_name]
+        if client.get('iin_valid') is False:
+            invalid_iins.append(client)
+        if client.get('amount_errors'):
+            amount_errors.append(client)
+        if client['contract_number']:
+            contracts.setdefault(client['contract_number'].upper(), []).append(client)
+
+    duplicates = [
+        {
+            "contract_number": same[0]['contract_number'],
+            "clients": [
+                {"id": c['id'], "client_name": c['client_name'], "source": c.get('source')} for c in same
+            ]
+        }
+        for same in contracts.values() if len(same) > 1
+    ]
+    return {
+        "clients_count": len(clients),
+        "invalid_iin_count": len(invalid_iins),
+        "invalid_iins": [
+            {
+                "id": c['id'], "client_name": c['client_name'], "source": c.get('source'),
+                "iin": c['iin'], "iin_error": c['iin_error']
+            }
+            for c in invalid_iins[:INVALID_IINS_LIMIT]
+        ],
+        "totals": totals,
+        "amount_errors_count": len(amount_errors),
+        "amount_errors": [
+            {
+                "id": c['id'], "client_name": c['client_name'], "source": c.get('source'),
+                "errors": list(c['amount_errors'].values())
+            }
+            for c in amount_errors[:AMOUNT_ERRORS_LIMIT]
+        ],
+        "duplicate_contracts_count": len(duplicates),
+        "duplicate_contracts": duplicates[:DUPLICATES_LIMIT]
+    }
+
+
+def client_search_keys(data: SessionData) -> List[str]:
+    """Строки поиска клиентов сессии (ФИО, договор, ИИН в нижнем регистре)"""
+    keys = data.search_keys
+    if keys is None:
+        keys = data.search_keys = [
+            f"{client['client_name']}\n{client['contract_number']}\n{client.get('iin', '')}".lower()
+            for client in data.clients
+        ]
+    return keys
+
+
+def filter_clients(data: SessionData, query: str = '', iin_valid: Optional[bool] = None) -> List[dict]:
+    """Клиенты сессии, подходящие под поиск (подстрока) и фильтр по корректности ИИН"""
+    clients = data.clients
+    query = query.strip().lower()
+    if query:
+        clients = [client for client, key in zip(clients, client_search_keys(data)) if query in key]
+    if iin_valid is not None:
+        clients = [client for client in clients if (client.get('iin_valid') is not False) == iin_valid]
+    return clients
+
+
+def generation_manifest(clients: List[dict], report_date: str, manager: str, formats: List[str],
+                        failed: List[dict]) -> dict:
+    """
+    Манифест генерации: имя файла и ключ кэша справки каждого клиента
+
+    По нему инкрементальная генерация определяет, какие справки базового
+    архива можно взять без перегенерации.
+    """
+    failed_ids = {f['id'] for f in failed}
+    entries = {}
+    for client in clients:
+        if client['id'] in failed_ids:
+            continue
+        entry = {'file': certificate_filename(client)}
+        for format_type in formats:
+            entry[format_type] = certificate_cache_key(client, report_date, manager, format_type)
+        entries[str(client['id'])] = entry
+    return {'report_date': report_date, 'manager': manager, 'clients': entries}
+
+
+def write_generation_manifest(output_dir: Path, manifest: dict):
+    (output_dir / "manifest.json").write_text(json.dumps(manifest, ensure_ascii=False), encoding='utf-8')
+
+
+def read_generation_manifest(output_dir: Path) -> Optional[dict]:
+    try:
+        return json.loads((output_dir / "manifest.json").read_text(encoding='utf-8'))
+    except FileNotFoundError:
+        return None
+
+
+def run_generation(job: Job, session_id: str, clients: List[dict], report_date: str, manager: str,
+                   formats: List[str]) -> dict:
+    """Генерация справок и архивов для фоновой задачи"""
+    # Создаём директорию для результатов
+    output_id = str(uuid.uuid4())
+    output_dir = GENERATED_DIR / output_id
+    output_dir.mkdir(exist_ok=True)
+
+    # Генерируем справки (отдельные файлы)
+    file_formats = [fmt for fmt in formats if fmt in ('excel', 'pdf')]
+    if file_formats:
+        generated = generate_all_certificates(
+            clients, report_date, manager, output_dir, file_formats, progress=job.advance,
+            cache_dir=RENDER_CACHE_DIR if RENDER_CACHE_ENABLED else None
+        )
+    else:
+        generated = {'excel': [], 'pdf': [], 'failed': [], 'cached': 0}
+
+    archives = {}
+
+    # Один PDF на весь пакет
+    if 'combined' in formats:
+        combined_path = output_dir / "certificates_combined.pdf"
+        template = PdfCertificateTemplate(report_date, manager)
+        combined_failed = template.render_combined(clients, combined_path, progress=job.advance)
+        generated['failed'].extend(combined_failed)
+        CERTIFICATES_TOTAL.inc(len(clients) - len(combined_failed), format='combined')
+        archives['combined'] = f"/download/{output_id}/combined"
+
+    # Создаём архивы
+    if generated['excel']:
+        excel_zip = output_dir / "certificates_excel.zip"
+        create_zip_archive(generated['excel'], excel_zip)
+        archives['excel'] = f"/download/{output_id}/excel"
+
+    if generated['pdf']:
+        pdf_zip = output_dir / "certificates_pdf.zip"
+        create_zip_archive(generated['pdf'], pdf_zip)
+        archives['pdf'] = f"/download/{output_id}/pdf"
+
+    if file_formats:
+        write_generation_manifest(
+            output_dir, generation_manifest(clients, report_date, manager, file_formats, generated['failed'])
+        )
+
+    for format_type in file_formats:
+        CERTIFICATES_TOTAL.inc(len(generated[format_type]), format=format_type)
+    CERTIFICATES_CACHED_TOTAL.inc(generated['cached'])
+    CERTIFICATE_FAILURES_TOTAL.inc(len(generated['failed']))
+    GENERATIONS_TOTAL.inc(mode='full')
+
+    # Сохраняем в историю
+    history_store.add_generation(
+        output_id, session_id, report_date, manager, formats, archives, clients, failed=generated['failed']
+    )
+
+    return {
+        "output_id": output_id,
+        "clients_count": len(clients) - len(generated['failed']),
+        "cached_count": generated['cached'],
+        "archives": archives
+    }
+
+
+def run_incremental_generation(job: Job, session_id: str, clients: List[dict], report_date: str, manager: str,
+                               formats: List[str], base_output_id: str) -> dict:
+    """
+    Повторная генерация после правок отдельных клиентов
+
+    Рендерятся только справки, ключ которых (данные клиента, дата отчёта,
+    менеджер, формат) отличается от манифеста базовой генерации; остальные
+    копируются из её архивов в сжатом виде, без распаковки. Архивы
+    собираются в новой папке - ссылки на базовую генерацию остаются рабочими.
+    """
+    base_dir = GENERATED_DIR / base_output_id
+    base_clients = read_generation_manifest(base_dir)['clients']
+
+    output_id = str(uuid.uuid4())
+    output_dir = GENERATED_DIR / output_id
+    output_dir.mkdir(exist_ok=True)
+
+    cache = RenderCache(RENDER_CACHE_DIR) if RENDER_CACHE_ENABLED else None
+    failed = []
+    failed_ids = set()
+    archives = {}
+    rendered = reused = 0
+
+    for format_type in formats:
+        ext = 'xlsx' if format_type == 'excel' else 'pdf'
+        archive_name = f"certificates_{format_type}.zip"
+        base_archive = base_dir / archive_name
+        base_members = _RawZipMember.read_archive(base_archive) if base_archive.exists() else {}
+        template = None
+        members = []
+
+        for client in clients:
+            # Как и при полной генерации: ошибка в одном формате исключает клиента целиком
+            if client['id'] in failed_ids:
+                job.advance(1, [])
+                continue
+
+            name = f"{certificate_filename(client)}.{ext}"
+            key = certificate_cache_key(client, report_date, manager, format_type)
+            entry = base_clients.get(str(client['id']))
+            member = base_members.get(name) if entry and entry.get(format_type) == key else None
+
+            if member is not None:
+                reused += 1
+            else:
+                try:
+                    data = cache.read(key, ext) if cache else None
+                    if data is None:
+                        if template is None:
+                            template_class = ExcelCertificateTemplate if format_type == 'excel' else PdfCertificateTemplate
+                            template = template_class(report_date, manager)
+                        data = render_certificate_bytes(
+                            client, report_date, manager, format_type,
+                            pdf_template=template if format_type == 'pdf' else None,
+                            excel_template=template if format_type == 'excel' else None
+                        )
+                        if cache:
+                            cache.write(key, ext, data)
+                except Exception as e:
+                    error = {'id': client['id'], 'client_name': client['client_name'], 'error': str(e)}
+                    failed.append(error)
+                    failed_ids.add(client['id'])
+                    job.advance(1, [error])
+                    continue
+                member = _RawZipMember.compress(name, data)
+                rendered += 1
+
+            members.append(member)
+            job.advance(1, [])
+
+        if members:
+            tmp_path = output_dir / f".{archive_name}.tmp"
+            with metrics.stage('zip_archive'), open(tmp_path, 'wb') as f:
+                _RawZipMember.write_archive(members, f)
+            os.replace(tmp_path, output_dir / archive_name)
+            archives[format_type] = f"/download/{output_id}/{format_type}"
+            CERTIFICATES_TOTAL.inc(len(members), format=format_type)
+
+    write_generation_manifest(output_dir, generation_manifest(clients, report_date, manager, formats, failed))
+
+    CERTIFICATES_CACHED_TOTAL.inc(reused)
+    CERTIFICATE_FAILURES_TOTAL.inc(len(failed))
+    GENERATIONS_TOTAL.inc(mode='incremental')
+
+    history_store.add_generation(
+        output_id, session_id, report_date, manager, formats, archives, clients, failed=failed
+    )
+
+    return {
+        "output_id": output_id,
+        "clients_count": len(clients) - len(failed),
+        "cached_count": 0,
+        "rendered_count": rendered,
+        "reused_count": reused,
+        "archives": archives
+    }
+
+
+def run_timed(job: Job, func: Callable, *args) -> dict:
+    """Задача генерации с разбивкой времени по этапам в результате ('timings')"""
+    with metrics.collect_stages() as timings:
+        result = func(job, *args)
+    result['timings'] = timings.summary()
+    return result
+
+
+def stream_params_from_history(output_id: str) -> Optional[dict]:
+    """Параметры потоковой выгрузки по записи истории (клиенты - из сессии загрузки)"""
+    record = history_store.get_generation(output_id)
+    if not record or not record['streamed'] or not record['session_id']:
+        return None
+    try:
+        clients = load_session(record['session_id']).clients
+    except HTTPException:
+        return None
+    return {
+        'clients': clients,
+        'report_date': record['report_date'],
+        'manager': record['manager'],
+        'formats': record['formats']
+    }
+
+
 # ============================================================================
 # МАРШРУТЫ
 # ============================================================================
 
+@app.on_event("startup")
+async def start_janitor():
+    janitor.start()
+
+
+@app.on_event("shutdown")
+async def stop_janitor():
+    janitor.stop()
+
+
 @app.get("/", response_class=HTMLResponse)
 async def home(request: Request, username: str = Depends(verify_credentials)):
     """Главная страница"""
     return templates.TemplateResponse("index.html", {
         "request": request,
         "username": username,
-        "history": generation_history[-10:][::-1]
+        "history": history_store.recent(10),
+        "max_upload_mb": MAX_UPLOAD_MB,
+        "max_upload_files": MAX_UPLOAD_FILES,
+        "upload_formats": list(UPLOAD_SIGNATURES),
+        "preview_png": PNG_PREVIEW_AVAILABLE
     })
 
 
 @app.post("/upload")
 async def upload_file(
-    file: UploadFile = File(...),
+    request: Request,
     username: str = Depends(verify_credentials)
 ):
-    """Загрузка Excel файла"""
-    if not file.filename.endswith(('.xlsx', '.xls')):
-        raise HTTPException(400, "Только Excel файлы (.xlsx, .xls)")
-
-    # Сохраняем файл
+    """
+    Загрузка реестров (поля file формы multipart/form-data)
+
+    Реестр - книга Excel, выгрузка CSV или Parquet (UPLOAD_SIGNATURES).
+    Файлы принимаются потоком и пишутся на диск порциями; слишком большие
+    загрузки и файлы других форматов отклоняются до приёма всего тела.
+
+    Пакетная загрузка: несколько полей file (до MAX_UPLOAD_FILES) и/или
+    all_sheets=1 - разбор всех видимых листов. Файлы и листы разбираются
+    параллельно и сливаются в один список клиентов сессии, который
+    генерируется одной задачей.
+    """
+    UPLOAD_BLOBS_DIR.mkdir(exist_ok=True)
+    try:
+        with metrics.stage('upload_write'):
+            form = await receive_form(request, UPLOAD_BLOBS_DIR, int(MAX_UPLOAD_MB * 1024 * 1024),
+                                      max_files=MAX_UPLOAD_FILES, signatures=UPLOAD_SIGNATURES)
+    except UploadError as e:
+        raise HTTPException(e.status_code, str(e))
+    all_sheets = form.fields.get('all_sheets', '').lower() in ('1', 'true', 'on')
+
+    # Сохраняем файлы
     session_id = str(uuid.uuid4())
     session_dir = UPLOAD_DIR / session_id
     session_dir.mkdir(exist_ok=True)
 
-    file_path = session_dir / file.filename
-    with open(file_path, "wb") as f:
-        content = await file.read()
-        f.write(content)
+    UPLOADS_TOTAL.inc(len(form.files))
+    for upload, filename in zip(form.files, unique_filenames([upload.filename for upload in form.files])):
+        UPLOAD_BYTES_TOTAL.inc(upload.size)
+        upload.filename = filename
+    stored = [await run_in_threadpool(store_upload, upload, session_dir) for upload in form.files]
+    paths = [file_path for file_path, _ in stored]
+    digest = sources_digest([file_digest for _, file_digest in stored], all_sheets)
+    if len(paths) > 1 or all_sheets:
+        write_session_sources(session_id, [path.name for path in paths], all_sheets)
+
+    # Тот же файл (пакет) уже разобран в другой сессии - разбор не нужен
+    same = session_store.find_by_digest(digest)
+    if same is not None:
+        clients, column_info = same.clients, same.column_mapping
+    else:
+        # Читаем данные
+        try:
+            clients, column_info = await run_in_threadpool(read_sources, paths, all_sheets)
+        except Exception as e:
+            shutil.rmtree(session_dir)
+            raise HTTPException(400, f"Ошибка чтения файла: {str(e)}")
 
-    # Читаем данные
-    try:
-        clients = read_excel_data(file_path)
-        column_info = get_column_mapping_info(file_path)
-    except Exception as e:
-        shutil.rmtree(session_dir)
-        raise HTTPException(400, f"Ошибка чтения файла: {str(e)}")
+    session_store.put(session_id, paths[0], clients, column_info, digest)
 
+    # Сами клиенты - постранично через /clients: ответ не растёт с размером реестра
     return {
         "session_id": session_id,
-        "filename": file.filename,
-        "clients_count": len(clients),
-        "clients": clients,
+        "filename": ", ".join(path.name for path in paths),
+        "files": [path.name for path in paths],
+        **clients_summary(clients),
         "column_mapping": column_info
     }
 
 
+@app.get("/clients/{session_id}")
+async def list_clients(
+    session_id: str,
+    offset: int = Query(0, ge=0),
+    limit: Optional[int] = Query(None, ge=1),
+    q: str = '',
+    iin_valid: Optional[bool] = None,
+    format: str = Query('json', pattern='^(json|ndjson)$'),
+    username: str = Depends(verify_credentials)
+):
+    """
+    Клиенты сессии с поиском и фильтром
+
+    q - подстрока ФИО, номера договора или ИИН (без учёта регистра),
+    iin_valid - только корректные (true) или некорректные (false) ИИН.
+
+    format=json - страница {total, offset, limit, clients}: limit по
+    умолчанию CLIENTS_PAGE_SIZE, не больше CLIENTS_PAGE_MAX.
+    format=ndjson - клиенты потоком, по одному JSON на строку (без limit -
+    до конца списка); число найденных - в заголовке X-Total-Count.
+    """
+    data = await run_in_threadpool(load_session, session_id)
+    clients = filter_clients(data, q, iin_valid)
+
+    if format == 'ndjson':
+        end = len(clients) if limit is None else offset + limit
+        selected = clients[offset:end]
+
+        def lines() -> Iterator[bytes]:
+            # Пачками: один вызов записи на сотни строк, а не на каждую
+            for start in range(0, len(selected), 500):
+                yield ''.join(
+                    json.dumps(client.to_dict(), ensure_ascii=False) + '\n' for client in selected[start:start + 500]
+                ).encode('utf-8')
+
+        return StreamingResponse(lines(), media_type="application/x-ndjson",
+                                 headers={"X-Total-Count": str(len(clients))})
+
+    limit = min(limit or CLIENTS_PAGE_SIZE, CLIENTS_PAGE_MAX)
+    return {
+        "total": len(clients),
+        "offset": offset,
+        "limit": limit,
+        "clients": [client.to_dict() for client in clients[offset:offset + limit]]
+    }
+
+
 @app.post("/update-client/{session_id}")
 async def update_client(
     session_id: str,
     client_data: dict,
     username: str = Depends(verify_credentials)
 ):
-    """Обновление данных клиента"""
-    # В реальном приложении здесь нужно обновить данные в сессии/БД
-    return {"status": "ok", "message": "Данные обновлены"}
+    """
+    Обновление данных клиента
+
+    client_data: {"id": ..., поле: значение, ...} - только изменённые поля.
+    Правки сохраняются в сессии и учитываются предпросмотром и генерацией.
+    """
+    try:
+        client_id = int(client_data.get('id'))
+    except (TypeError, ValueError):
+        raise HTTPException(400, "Не указан id клиента")
+    try:
+        changes = normalize_client_changes(client_data)
+    except ValueError as e:
+        raise HTTPException(400, str(e))
+
+    client, summary = await run_in_threadpool(edit_session_client, session_id, client_id, changes)
+    return {"status": "ok", "message": "Данные обновлены", "client": client.to_dict(), **summary}
+
+
+@app.get("/preview/{session_id}/{client_id}/{kind}")
+async def preview_certificate_file(
+    request: Request,
+    session_id: str,
+    client_id: int,
+    kind: str,
+    report_date: str,
+    manager: str,
+    width: int = Query(900, ge=100, le=2000),
+    username: str = Depends(verify_credentials)
+):
+    """
+    Предпросмотр справки - настоящий PDF (kind=pdf) или PNG первой страницы
+    шириной width (kind=png), как при генерации
+
+    Ответ кэшируется на сервере (PreviewCache) и в браузере: ETag - ключ
+    данных справки, поэтому правка клиента сразу даёт новый предпросмотр.
+    """
+    if kind not in ('pdf', 'png'):
+        raise HTTPException(404, "Неизвестный формат предпросмотра")
+    if kind == 'png' and not PNG_PREVIEW_AVAILABLE:
+        raise HTTPException(501, "Предпросмотр PNG недоступен: не установлен pypdfium2")
+
+    client = (await run_in_threadpool(load_session, session_id)).get_client(client_id)
+    if not client:
+        raise HTTPException(404, "Клиент не найден")
+
+    cache_kind = 'pdf' if kind == 'pdf' else f"png-{width}"
+    etag = f'"{certificate_cache_key(client, report_date, manager, "pdf")}-{cache_kind}"'
+    headers = {"ETag": etag, "Cache-Control": "private, max-age=600"}
+    if request.headers.get('if-none-match') == etag:
+        return Response(status_code=304, headers=headers)
+
+    with metrics.stage('preview'):
+        data, _ = await run_in_threadpool(certificate_preview, client, report_date, manager, cache_kind)
+
+    if kind == 'pdf':
+        headers["Content-Disposition"] = f'inline; filename="preview_{client_id:04d}.pdf"'
+    return Response(data, media_type='application/pdf' if kind == 'pdf' else 'image/png', headers=headers)
 
 
 @app.get("/preview/{session_id}/{client_id}")
@@ -738,17 +2003,7 @@ async def preview_certificate(
     username: str = Depends(verify_credentials)
 ):
     """Предпросмотр справки (HTML)"""
-    session_dir = UPLOAD_DIR / session_id
-    if not session_dir.exists():
-        raise HTTPException(404, "Сессия не найдена")
-
-    # Читаем данные
-    files = list(session_dir.glob("*.xlsx")) + list(session_dir.glob("*.xls"))
-    if not files:
-        raise HTTPException(404, "Файл не найден")
-
-    clients = read_excel_data(files[0])
-    client = next((c for c in clients if c['id'] == client_id), None)
+    client = (await run_in_threadpool(load_session, session_id)).get_client(client_id)
 
     if not client:
         raise HTTPException(404, "Клиент не найден")
@@ -788,23 +2043,21 @@ async def generate_certificates(
     report_date: str = Form(...),
     manager: str = Form(...),
     format_type: str = Form(...),
+    stream: bool = Form(False),
+    base_output_id: Optional[str] = Form(None),
     username: str = Depends(verify_credentials)
 ):
-    """Генерация справок"""
-    session_dir = UPLOAD_DIR / session_id
-    if not session_dir.exists():
-        raise HTTPException(404, "Сессия не найдена")
-
-    files = list(session_dir.glob("*.xlsx")) + list(session_dir.glob("*.xls"))
-    if not files:
-        raise HTTPException(404, "Файл не найден")
-
-    clients = read_excel_data(files[0])
-
-    # Создаём директорию для результатов
-    output_id = str(uuid.uuid4())
-    output_dir = GENERATED_DIR / output_id
-    output_dir.mkdir(exist_ok=True)
+    """
+    Постановка генерации справок в очередь
+
+    Возвращает job_id сразу; прогресс доступен через GET /jobs/{job_id}.
+    При stream=true справки не генерируются заранее: ссылки на архивы
+    возвращаются сразу, а архив формируется во время скачивания.
+    С base_output_id перегенерируются только клиенты, изменившиеся после
+    указанной генерации, остальные справки берутся из её архивов.
+    """
+    # При вытеснении из кэша файл будет разобран заново - не в event loop
+    clients = (await run_in_threadpool(load_session, session_id)).clients
 
     # Определяем форматы
     formats = []
@@ -812,47 +2065,66 @@ async def generate_certificates(
         formats.append('excel')
     if format_type in ['pdf', 'both']:
         formats.append('pdf')
+    if format_type == 'combined':
+        formats.append('combined')
+
+    # Единый PDF не архив - потоковая выгрузка для него не применяется
+    if stream and 'combined' not in formats:
+        output_id = str(uuid.uuid4())
+        (GENERATED_DIR / output_id).mkdir(exist_ok=True)
+
+        stream_outputs[output_id] = {
+            'clients': clients,
+            'report_date': report_date,
+            'manager': manager,
+            'formats': formats
+        }
+        while len(stream_outputs) > STREAM_OUTPUTS_KEEP:
+            stream_outputs.popitem(last=False)
 
-    # Генерируем справки
-    try:
-        generated = generate_all_certificates(clients, report_date, manager, output_dir, formats)
-    except Exception as e:
-        import traceback
-        print(f"Ошибка генерации справок: {e}")
-        traceback.print_exc()
-        raise HTTPException(500, f"Ошибка генерации справок: {str(e)}")
+        archives = {fmt: f"/download/{output_id}/{fmt}" for fmt in formats}
 
-    # Создаём архивы
-    archives = {}
-    if generated['excel']:
-        excel_zip = output_dir / "certificates_excel.zip"
-        create_zip_archive(generated['excel'], excel_zip)
-        archives['excel'] = f"/download/{output_id}/excel"
+        # Справки рендерятся при скачивании - результат по клиентам заранее неизвестен
+        history_store.add_generation(
+            output_id, session_id, report_date, manager, formats, archives, clients, streamed=True
+        )
+        GENERATIONS_TOTAL.inc(mode='stream')
 
-    if generated['pdf']:
-        pdf_zip = output_dir / "certificates_pdf.zip"
-        create_zip_archive(generated['pdf'], pdf_zip)
-        archives['pdf'] = f"/download/{output_id}/pdf"
+        return {
+            "status": "ready",
+            "output_id": output_id,
+            "clients_count": len(clients),
+            "archives": archives
+        }
 
-    # Сохраняем в историю
-    generation_history.append({
-        'id': output_id,
-        'date': datetime.now().strftime('%d.%m.%Y %H:%M'),
-        'report_date': report_date,
-        'manager': manager,
-        'clients_count': len(clients),
-        'formats': formats,
-        'archives': archives
-    })
+    if base_output_id:
+        if stream or 'combined' in formats:
+            raise HTTPException(400, "Инкрементальная генерация доступна только для архивов Excel и PDF")
+        if read_generation_manifest(GENERATED_DIR / Path(base_output_id).name) is None:
+            raise HTTPException(404, "Базовая генерация не найдена")
+        job = job_manager.submit(len(clients) * len(formats), run_timed, run_incremental_generation, session_id,
+                                 clients, report_date, manager, formats, Path(base_output_id).name)
+    else:
+        job = job_manager.submit(len(clients), run_timed, run_generation, session_id, clients, report_date,
+                                 manager, formats)
 
     return {
-        "status": "ok",
-        "output_id": output_id,
-        "clients_count": len(clients),
-        "archives": archives
+        "status": "queued",
+        "job_id": job.id,
+        "clients_count": len(clients)
     }
 
 
+@app.get("/jobs/{job_id}")
+async def get_job(job_id: str, username: str = Depends(verify_credentials)):
+    """Состояние задачи генерации: прогресс, оценка времени, ошибки"""
+    job = job_manager.get(job_id)
+    if not job:
+        raise HTTPException(404, "Задача не найдена")
+
+    return job.to_dict()
+
+
 @app.get("/download/{output_id}/{format_type}")
 async def download_archive(
     output_id: str,
@@ -862,6 +2134,16 @@ async def download_archive(
     """Скачивание архива"""
     output_dir = GENERATED_DIR / output_id
 
+    if format_type == 'combined':
+        file_path = output_dir / "certificates_combined.pdf"
+        if not file_path.exists():
+            raise HTTPException(404, "Файл не найден")
+        return FileResponse(
+            file_path,
+            filename="certificates_combined.pdf",
+            media_type='application/pdf'
+        )
+
     if format_type == 'excel':
         file_path = output_dir / "certificates_excel.zip"
         filename = "certificates_excel.zip"
@@ -869,20 +2151,84 @@ async def download_archive(
         file_path = output_dir / "certificates_pdf.zip"
         filename = "certificates_pdf.zip"
 
-    if not file_path.exists():
+    if file_path.exists():
+        return FileResponse(
+            file_path,
+            filename=filename,
+            media_type='application/zip'
+        )
+
+    # Потоковая выгрузка: архив ещё не сформирован - генерируем во время скачивания
+    params = stream_outputs.get(output_id)
+    if params is None:
+        # Выгрузка создана другим процессом uvicorn - параметры берём из истории
+        params = await run_in_threadpool(stream_params_from_history, output_id)
+    stream_format = 'excel' if format_type == 'excel' else 'pdf'
+    if not params or stream_format not in params['formats']:
         raise HTTPException(404, "Файл не найден")
+    # Папку выгрузки могла удалить очистка - архив сформируется заново
+    output_dir.mkdir(exist_ok=True)
 
-    return FileResponse(
-        file_path,
-        filename=filename,
-        media_type='application/zip'
+    return StreamingResponse(
+        stream_zip_archive(
+            params['clients'], params['report_date'], params['manager'], stream_format,
+            save_path=file_path, cache_dir=RENDER_CACHE_DIR if RENDER_CACHE_ENABLED else None
+        ),
+        media_type='application/zip',
+        headers={"Content-Disposition": f'attachment; filename="{filename}"'}
     )
 
 
 @app.get("/history")
-async def get_history(username: str = Depends(verify_credentials)):
-    """Получение истории генераций"""
-    return generation_history[-20:][::-1]
+async def get_history(
+    limit: int = Query(20, ge=1, le=200),
+    offset: int = Query(0, ge=0),
+    manager: Optional[str] = None,
+    report_date: Optional[str] = None,
+    date_from: Optional[str] = None,
+    date_to: Optional[str] = None,
+    contract_number: Optional[str] = None,
+    username: str = Depends(verify_credentials)
+):
+    """
+    История генераций (постранично, новые сверху)
+
+    Фильтры: менеджер, дата отчёта (ДД.ММ.ГГГГ), период генерации
+    date_from/date_to (ГГГГ-ММ-ДД) и номер договора.
+    """
+    return await run_in_threadpool(
+        history_store.list_generations, limit=limit, offset=offset, manager=manager,
+        report_date=report_date, date_from=date_from, date_to=date_to, contract_number=contract_number
+    )
+
+
+@app.get("/history/{output_id}/clients")
+async def get_history_clients(output_id: str, username: str = Depends(verify_credentials)):
+    """Результат генерации по каждому клиенту"""
+    clients = await run_in_threadpool(history_store.generation_clients, output_id)
+    if not clients:
+        raise HTTPException(404, "Генерация не найдена")
+    return clients
+
+
+@app.get("/metrics", response_class=PlainTextResponse)
+async def get_metrics(username: str = Depends(verify_credentials)):
+    """Метрики процесса в текстовом формате Prometheus"""
+    # charset=utf-8 Starlette добавляет сам
+    return PlainTextResponse(metrics.REGISTRY.render(), media_type="text/plain; version=0.0.4")
+
+
+@app.get("/janitor")
+async def get_janitor_stats(username: str = Depends(verify_credentials)):
+    """Метрики очистки: занятый объём, освобождённые байты и удалённые записи по причинам"""
+    return janitor.stats()
+
+
+@app.post("/janitor/run")
+async def run_janitor(username: str = Depends(verify_credentials)):
+    """Внеочередной проход очистки"""
+    completed = await run_in_threadpool(janitor.run_once)
+    return {"completed": completed, **janitor.stats()}
 
 
 @app.get("/download-template")
@@ -901,161 +2247,47 @@ async def download_template(username: str = Depends(verify_credentials)):
 
 @app.get("/debug-mapping/{session_id}")
 async def debug_mapping(session_id: str, username: str = Depends(verify_credentials)):
-    """Отладка: показать маппинг столбцов Excel"""
-    session_dir = UPLOAD_DIR / session_id
-    if not session_dir.exists():
-        raise HTTPException(404, "Сессия не найдена")
-
-    # Находим первый Excel файл в директории
-    excel_files = list(session_dir.glob("*.xlsx")) + list(session_dir.glob("*.xls"))
-    if not excel_files:
-        raise HTTPException(404, "Файл не найден в сессии")
-
-    file_path = excel_files[0]
-
-    # Читаем Excel
-    wb = load_workbook(file_path, data_only=True)
-    ws = wb.active
+    """
+    Отладка: показать маппинг столбцов реестра
+
+    Заголовки берутся из разобранной сессии (session_store), файл заново
+    не читается. Пример значения - поле первого клиента сессии; у
+    столбцов без поля примера нет. В пакетной загрузке - заголовки
+    первого файла (листа).
+    """
+    data = await run_in_threadpool(load_session, session_id)
+    header_row = tuple(data.column_mapping.get("header_row", ()))
+    sample_client = data.clients[0] if data.clients else {}
 
-    # Собираем заголовки
     headers = {}
-    for col in range(1, ws.max_column + 1):
-        val = ws.cell(row=1, column=col).value
+    for col, val in enumerate(header_row, start=1):
         if val:
             headers[str(val).strip()] = col
+    originals = {k.lower(): k for k in headers}
 
-    # Маппинг (копируем логику из read_excel_data)
-    column_map = {
-        # Номер договора
-        'номер договора': 'contract_number',
-        'номера договора': 'contract_number',
-        '№ договора': 'contract_number',
-        '№ номера договора': 'contract_number',
-        'договор №': 'contract_number',
-        'договор': 'contract_number',
-        # Игнорируем столбец с порядковым номером
-        '№': 'ignore',
-        'п/п': 'ignore',
-        '№ п/п': 'ignore',
-        # Дата договора
-        'дата договора': 'contract_date',
-        'даты договора': 'contract_date',
-        'дата': 'contract_date',
-        # ФИО
-        'фио': 'client_name',
-        'фио клиента': 'client_name',
-        'клиент': 'client_name',
-        'заемщик': 'client_name',
-        # ИИН
-        'иин': 'iin',
-        'иин клиента': 'iin',
-        'iin': 'iin',
-        # Основной долг
-        'основной долг': 'principal',
-        'сумма од': 'principal',
-        'сумма основного долга': 'principal',
-        'од': 'principal',
-        # Вознаграждение (проценты)
-        'вознаграждение': 'reward',
-        'сумма вознаграждения': 'reward',
-        'сумма процентов': 'reward',
-        'проценты': 'reward',
-        # Отсроченные проценты / поступления
-        'отсроченные проценты': 'deferred_interest',
-        'сумма отсроченных процентов': 'deferred_interest',
-        'отсроч проценты': 'deferred_interest',
-        'отсроч. проценты': 'deferred_interest',
-        'отсроченн проценты': 'deferred_interest',
-        'отсроченн. проценты': 'deferred_interest',
-        'отсроченные поступления': 'deferred_interest',
-        'сумма отсроченных поступлений': 'deferred_interest',
-        'отсроч поступления': 'deferred_interest',
-        'отсроч. поступления': 'deferred_interest',
-        'отсроченн поступления': 'deferred_interest',
-        'отсроченн. поступления': 'deferred_interest',
-        'отсроченные поступлений': 'deferred_interest',
-        # Пени, штрафы, неустойки (объединенный столбец)
-        'пени, штрафы, неустойки': 'penalties',
-        'пени штрафы неустойки': 'penalties',
-        'пени': 'penalties',
-        # Старые варианты для обратной совместимости (пеня за ОД)
-        'пеня за од': 'penalty_principal_old',
-        'сумма пеня за од': 'penalty_principal_old',
-        'сумма пени за од': 'penalty_principal_old',
-        'неустойка': 'penalty_principal_old',
-        'штраф': 'penalty_principal_old',
-        # Старые варианты для обратной совместимости (пеня за вознаграждение)
-        'пеня за вознаграждение': 'penalty_reward_old',
-        'сумма пеня за вознаграждение': 'penalty_reward_old',
-        'сумма пени за вознаграждение': 'penalty_reward_old',
-        # Административные сборы (включая гос.пошлину)
-        'административные сборы': 'admin_fees',
-        'адм. сборы': 'admin_fees',
-        'адм сборы': 'admin_fees',
-        # Старые варианты гос.пошлины (теперь часть административных сборов)
-        'гос.пошлина': 'admin_fees',
-        'гос. пошлина': 'admin_fees',
-        'госпошлина': 'admin_fees',
-        'сумма госпошлины': 'admin_fees',
-        # Общая сумма (если есть готовое значение в Excel)
-        'сумма займа': 'total',
-        'общая сумма': 'total',
-        'итого': 'total'
-    }
+    mapping = COLUMN_RESOLVER.resolve(header_row)
+    col_indices = mapping.fields
 
-    # Создаем маппинг (копируем логику из read_excel_data)
-    col_indices = {}
     mapping_details = []
-
-    headers_lower = {k.lower().strip(): (k, v) for k, v in headers.items()}
-
-    for header_lower, (header_original, col_idx) in headers_lower.items():
-        matched = False
-        match_type = None
-        matched_key = None
-
-        # Точное совпадение
-        if header_lower in column_map:
-            field_name = column_map[header_lower]
-            if field_name != 'ignore' and field_name not in col_indices:
-                col_indices[field_name] = col_idx
-                matched = True
-                match_type = "exact"
-                matched_key = header_lower
-        else:
-            # Частичное совпадение
-            for key, field_name in column_map.items():
-                if key in header_lower or header_lower in key:
-                    if field_name != 'ignore' and field_name not in col_indices:
-                        col_indices[field_name] = col_idx
-                        matched = True
-                        match_type = "partial"
-                        matched_key = key
-                    break
-
-        # Получаем значение из второй строки (первая строка данных)
-        sample_value = ws.cell(row=2, column=col_idx).value if ws.max_row >= 2 else None
-
+    for detail in mapping.details:
+        sample_value = sample_client.get(detail["field_name"]) if detail["field_name"] else None
         mapping_details.append({
-            "column_index": col_idx,
-            "header_original": header_original,
-            "header_lower": header_lower,
-            "matched": matched,
-            "match_type": match_type,
-            "matched_key": matched_key,
-            "field_name": next((k for k, v in col_indices.items() if v == col_idx), None),
+            "column_index": detail["column_index"],
+            "header_original": originals.get(detail["header_lower"], detail["header_lower"]),
+            "header_lower": detail["header_lower"],
+            "matched": detail["matched"],
+            "match_type": detail["match_type"],
+            "matched_key": detail["matched_key"],
+            "field_name": detail["field_name"],
             "sample_value": str(sample_value) if sample_value is not None else None
         })
 
-    wb.close()
-
     return {
         "session_id": session_id,
         "total_columns": len(headers),
         "mapped_fields": len(col_indices),
         "headers": list(headers.keys()),
-        "field_mapping": {field: headers.get(next((k for k, v in headers.items() if v == idx), None))
-                         for field, idx in col_indices.items()},
+        "field_mapping": dict(col_indices),
         "details": mapping_details
     }
 
@@ -0,0 +1,248 @@
+# -*- coding: utf-8 -*-
+"""
+PDF справка о ссудной задолженности
+
+Шаблон PDF справки и помощники форматирования, общие для веб-приложения
+(webapp/app.py) и CLI (scripts/generate_certificates.py, режим combined).
+Импорт модуля ничего не создаёт и не запускает: reportlab импортируется
+при создании шаблона, шрифты регистрируются при первой справке процесса.
+"""
+
+from datetime import datetime
+from pathlib import Path
+from typing import BinaryIO, Callable, List, Optional, Union
+
+from num2text import format_number_with_text
+from pdf_fonts import register_fonts
+import metrics
+
+# Данные компании (шапка справки)
+COMPANY = {
+    'name': 'SwissCapital',
+    'address': 'Республика Казахстан, г. Алматы, пр. Достык, 188',
+    'phone': '+7 700 836 78 13'
+}
+
+
+def format_date_russian(date_str):
+    """Форматирование даты в формате ДД.ММ.ГГГГ"""
+    try:
+        if isinstance(date_str, datetime):
+            dt = date_str
+        else:
+            # Сначала убираем время, если есть (например "2025-03-18 00:00:00" -> "2025-03-18")
+            date_part = str(date_str).split(' ')[0]
+            for fmt in ['%d.%m.%Y', '%Y-%m-%d', '%d/%m/%Y', '%d-%m-%Y']:
+                try:
+                    dt = datetime.strptime(date_part, fmt)
+                    break
+                except ValueError:
+                    continue
+            else:
+                return str(date_str)
+        # Формат ДД.ММ.ГГГГ
+        return f"{dt.day:02d}.{dt.month:02d}.{dt.year}"
+    except:
+        return str(date_str)
+
+
+class PdfCertificateTemplate:
+    """
+    Скомпилированный шаблон PDF справки
+
+    Создаётся один раз на пакет: стили, шапка, подпись и шаблон документа
+    (поля, рамка страницы) не зависят от клиента. Для каждого клиента
+    собираются только абзац с основным текстом и строки детализации.
+    """
+
+    def __init__(self, report_date: str, manager: str):
+        from reportlab.lib import colors
+        from reportlab.lib.pagesizes import A4
+        from reportlab.lib.styles import ParagraphStyle
+        from reportlab.lib.units import mm
+        from reportlab.platypus import (
+            BaseDocTemplate, PageTemplate, Frame, Paragraph, Spacer, Table, TableStyle
+        )
+
+        self.report_date = report_date
+        self.manager = manager
+
+        # Стили с кириллическим шрифтом (регистрируется при первой PDF справке процесса)
+        font, font_bold = register_fonts()
+        title_style = ParagraphStyle(
+            'Title',
+            fontName=font_bold,
+            fontSize=16,  # Уменьшено с 18
+            alignment=1,
+            spaceAfter=4  # Уменьшено с 6
+        )
+
+        subtitle_style = ParagraphStyle(
+            'Subtitle',
+            fontName=font,
+            fontSize=8,  # Уменьшено с 9
+            textColor=colors.grey,
+            alignment=1,
+            spaceAfter=2  # Уменьшено с 3
+        )
+
+        heading_style = ParagraphStyle(
+            'Heading',
+            fontName=font_bold,
+            fontSize=11,  # Уменьшено с 12
+            alignment=1,
+            spaceBefore=10,  # Уменьшено с 20
+            spaceAfter=10  # Уменьшено с 20
+        )
+
+        self.body_style = ParagraphStyle(
+            'Body',
+            fontName=font,
+            fontSize=10,
+            leading=14,
+            spaceAfter=10,
+            leftIndent=10*mm  # Отступ 1 см
+        )
+
+        self.bullet_style = ParagraphStyle(
+            'Bullet',
+            fontName=font,
+            fontSize=10,
+            leftIndent=10*mm,  # Отступ 1 см
+            spaceAfter=5
+        )
+
+        # Шапка с цветным названием компании и заголовок - одинаковы для всех клиентов
+        company_name_html = '<font color="red">Swiss</font>Capital'
+        self.header = [
+            Paragraph(company_name_html, title_style),
+            Paragraph(COMPANY['address'], subtitle_style),
+            Paragraph(f"телефон: {COMPANY['phone']}", subtitle_style),
+            Spacer(1, 50),  # Разрыв 5 строк после шапки
+            Paragraph("Расчет ссудной задолженности", heading_style),
+            Spacer(1, 50),  # Разрыв 5 строк после заголовка
+        ]
+
+        # Подпись (жирным шрифтом) - менеджер один на пакет
+        self.signature_table = signature_table = Table([['Операционный менеджер', manager]], colWidths=[120*mm, 50*mm])
+        signature_table.setStyle(TableStyle([
+            ('ALIGN', (0, 0), (0, 0), 'LEFT'),
+            ('ALIGN', (1, 0), (1, 0), 'RIGHT'),
+            ('FONTNAME', (0, 0), (-1, -1), font_bold),
+            ('FONTSIZE', (0, 0), (-1, -1), 10),
+        ]))
+        self.footer = [
+            Spacer(1, 100),  # Разрыв 10 строк перед подписью
+            signature_table,
+        ]
+        self.details_spacer = Spacer(1, 10)
+
+        # Шаблон документа с теми же полями и рамкой, что у SimpleDocTemplate
+        self.doc = BaseDocTemplate(
+            None,
+            pagesize=A4,
+            rightMargin=20*mm,
+            leftMargin=20*mm,
+            topMargin=20*mm,
+            bottomMargin=20*mm
+        )
+        frame = Frame(self.doc.leftMargin, self.doc.bottomMargin, self.doc.width, self.doc.height, id='normal')
+        self.doc.addPageTemplates([
+            PageTemplate(id='First', frames=frame, pagesize=A4),
+            PageTemplate(id='Later', frames=frame, pagesize=A4),
+        ])
+
+    def client_story(self, client: dict) -> list:
+        """Переменная часть справки: основной текст и детализация"""
+        from reportlab.platypus import Paragraph
+
+        # Основной текст
+        contract_date = format_date_russian(client['contract_date'])
+        total_text = format_number_with_text(int(client['total']))
+
+        iin_text = f", ИИН {client['iin']}" if client.get('iin') else ""
+        main_text = (
+            f"По договору займа №{client['contract_number']} от {contract_date}, "
+            f"Заемщик: {client['client_name']}{iin_text}, по состоянию на {self.report_date} "
+            f"ссудная задолженность составляет {total_text} тенге, из них:"
+        )
+
+        story = [Paragraph(main_text, self.body_style), self.details_spacer]
+
+        # Детализация
+        details = [
+            ('Основной долг', client['principal'], True),
+            ('Вознаграждение', client['reward'], True),
+        ]
+
+        if client['deferred_interest'] > 0:
+            details.append(('Сумма отсроченных процентов', client['deferred_interest'], False))
+        if client['penalties'] > 0:
+            details.append(('Пени, штрафы, неустойки', client['penalties'], True))
+        if client['admin_fees'] > 0:
+            details.append(('Прочие поступления (административные сборы, гос.пошлина)', client['admin_fees'], False))
+
+        for label, amount, show_text in details:
+            if show_text and amount > 0:
+                text = f"• {label} - {format_number_with_text(int(amount))} тенге;"
+            else:
+                text = f"• {label} – {int(amount):,} тенге;".replace(',', ' ')
+            story.append(Paragraph(text, self.bullet_style))
+
+        return story
+
+    @metrics.timed('pdf_certificate')
+    def render(self, client: dict, output_path: Union[Path, BinaryIO]):
+        """Справка клиента в файл или файловый объект"""
+        story = self.header + self.client_story(client) + self.footer
+        self.doc.build(story, filename=str(output_path) if isinstance(output_path, Path) else output_path)
+
+    @metrics.timed('combined_pdf')
+    def render_combined(self, clients: List[dict], output_path: Union[Path, BinaryIO],
+                        progress: Optional[Callable[[int, List[dict]], None]] = None) -> List[dict]:
+        """
+        Все справки пакета в один PDF - по странице на клиента
+
+        Шрифты встраиваются в документ один раз, стили и шапка общие для
+        всех страниц. Возвращает список клиентов, справку для которых
+        собрать не удалось.
+        """
+        from reportlab.platypus import PageBreak
+
+        story = []
+        failed = []
+
+        for client in clients:
+            try:
+                client_story = self.client_story(client)
+            except Exception as e:
+                failed.append({'id': client['id'], 'client_name': client['client_name'], 'error': str(e)})
+                if progress:
+                    progress(1, failed[-1:])
+                continue
+
+            if story:
+                story.append(PageBreak())
+            story.extend(self.header + client_story + self.footer)
+
+        # Подпись - последний элемент справки: по ней считаем готовых клиентов
+        if progress:
+            self.doc.afterFlowable = lambda flowable: (
+                progress(1, []) if flowable is self.signature_table else None
+            )
+
+        try:
+            self.doc.build(story, filename=str(output_path) if isinstance(output_path, Path) else output_path)
+        finally:
+            self.doc.__dict__.pop('afterFlowable', None)
+
+        return failed
+
+
+def create_pdf_certificate(client: dict, report_date: str, manager: str, output_path: Union[Path, BinaryIO]):
+    """
+    Создание справки в формате PDF (output_path - путь или файловый объект)
+
+    Для пакетов используйте PdfCertificateTemplate - он создаётся один раз.
+    """
+    PdfCertificateTemplate(report_date, manager).render(client, output_path)
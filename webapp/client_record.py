@@ -0,0 +1,106 @@
+# -*- coding: utf-8 -*-
+"""
+Компактная запись клиента реестра
+
+Разобранные клиенты живут в памяти сессии (SessionStore) всё время
+работы с реестром, поэтому вместо словаря на каждую строку - объект со
+__slots__: без хэш-таблицы ключей на каждом клиенте запись втрое меньше
+словаря, а клиент вместе со значениями - на треть
+(benchmarks/bench_client_memory.py).
+
+Запись ведёт себя как словарь: чтение (client['total'],
+client.get('source'), dict(client)) и присваивание существующих полей,
+поэтому код разбора, генерации и истории работает с ней так же, как
+прежде со словарём. Необязательные поля (source - файл и лист в пакетной
+загрузке, amount_errors - нераспознанные суммы) со значением None в
+отображение не входят, как отсутствующие ключи прежних словарей: ответы
+API и ключи кэша справок не меняются.
+
+В JSON запись переводится через to_dict (один проход по слотам).
+"""
+
+from collections.abc import Mapping
+from dataclasses import dataclass
+from operator import attrgetter
+from typing import Optional
+
+# Поля в порядке аргументов конструктора
+CLIENT_FIELDS = (
+    'id', 'contract_number', 'contract_date', 'client_name', 'iin',
+    'principal', 'reward', 'deferred_interest', 'penalties', 'admin_fees',
+    'total', 'iin_valid', 'iin_error'
+)
+OPTIONAL_FIELDS = ('source', 'amount_errors')
+
+_ALL_FIELDS = frozenset(CLIENT_FIELDS + OPTIONAL_FIELDS)
+_required_values = attrgetter(*CLIENT_FIELDS)
+
+
+@dataclass(slots=True, eq=False)
+class ClientRecord(Mapping):
+    """Клиент реестра: нормализованные поля строки и результат проверки ИИН"""
+    id: int
+    contract_number: str
+    contract_date: str
+    client_name: str
+    iin: str
+    principal: int
+    reward: int
+    deferred_interest: int
+    penalties: int  # Пени, штрафы, неустойки (объединенные)
+    admin_fees: int  # Административные сборы (включая гос.пошлину)
+    total: int
+    iin_valid: bool
+    iin_error: Optional[str]
+    source: Optional[str] = None
+    amount_errors: Optional[dict] = None
+
+    @classmethod
+    def from_dict(cls, client: Mapping) -> 'ClientRecord':
+        """Запись из словаря клиента (правка, данные бенчмарков)"""
+        return cls(**{key: client[key] for key in client if key in _ALL_FIELDS})
+
+    def to_dict(self) -> dict:
+        """Словарь для JSON: обязательные поля и заданные необязательные"""
+        result = dict(zip(CLIENT_FIELDS, _required_values(self)))
+        if self.source is not None:
+            result['source'] = self.source
+        if self.amount_errors is not None:
+            result['amount_errors'] = self.amount_errors
+        return result
+
+    # Представления - по готовому словарю: один проход по слотам вместо __getitem__ на каждое поле
+    def keys(self):
+        return self.to_dict().keys()
+
+    def values(self):
+        return self.to_dict().values()
+
+    def items(self):
+        return self.to_dict().items()
+
+    def __getitem__(self, key: str):
+        if key in _ALL_FIELDS:
+            value = getattr(self, key)
+            if value is not None or key in CLIENT_FIELDS:
+                return value
+        raise KeyError(key)
+
+    def __setitem__(self, key: str, value):
+        if key not in _ALL_FIELDS:
+            raise KeyError(key)
+        setattr(self, key, value)
+
+    def __iter__(self):
+        yield from CLIENT_FIELDS
+        for key in OPTIONAL_FIELDS:
+            if getattr(self, key) is not None:
+                yield key
+
+    def __len__(self) -> int:
+        return len(CLIENT_FIELDS) + sum(getattr(self, key) is not None for key in OPTIONAL_FIELDS)
+
+    def __eq__(self, other):
+        if isinstance(other, Mapping):
+            return self.to_dict() == dict(other.items())
+        return NotImplemented
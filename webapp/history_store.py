@@ -0,0 +1,265 @@
+# -*- coding: utf-8 -*-
+"""
+Постоянное хранилище истории генераций и состояния задач (SQLite)
+
+История и задачи переживают перезапуск и общие для всех процессов
+uvicorn (--workers N): база в режиме WAL, у каждого потока своё
+соединение, запись ждёт освобождения блокировки до busy_timeout.
+
+Таблицы:
+    generations         - генерации (дата, дата отчёта, менеджер, архивы)
+    generation_clients  - результат по каждому клиенту генерации
+    jobs                - состояние фоновых задач для GET /jobs/{id}
+
+База и схема создаются при первом обращении, а не при создании
+хранилища: импорт приложения (и CLI) файлов не создаёт.
+"""
+
+import json
+import sqlite3
+import threading
+from datetime import datetime
+from pathlib import Path
+from typing import Iterable, List, Optional
+
+# Результат по клиенту
+CLIENT_OK = "ok"
+CLIENT_FAILED = "failed"
+CLIENT_DEFERRED = "deferred"  # потоковая выгрузка: справка рендерится при скачивании
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS generations (
+    id TEXT PRIMARY KEY,
+    session_id TEXT,
+    created_at TEXT NOT NULL,
+    report_date TEXT NOT NULL,
+    manager TEXT NOT NULL,
+    clients_count INTEGER NOT NULL,
+    failed_count INTEGER NOT NULL DEFAULT 0,
+    formats TEXT NOT NULL,
+    archives TEXT NOT NULL,
+    streamed INTEGER NOT NULL DEFAULT 0
+);
+CREATE INDEX IF NOT EXISTS idx_generations_created_at ON generations (created_at);
+CREATE INDEX IF NOT EXISTS idx_generations_report_date ON generations (report_date);
+CREATE INDEX IF NOT EXISTS idx_generations_manager ON generations (manager, created_at);
+
+CREATE TABLE IF NOT EXISTS generation_clients (
+    generation_id TEXT NOT NULL REFERENCES generations (id) ON DELETE CASCADE,
+    client_id INTEGER NOT NULL,
+    contract_number TEXT NOT NULL,
+    client_name TEXT NOT NULL,
+    iin TEXT NOT NULL,
+    total INTEGER NOT NULL,
+    status TEXT NOT NULL,
+    error TEXT,
+    PRIMARY KEY (generation_id, client_id)
+);
+CREATE INDEX IF NOT EXISTS idx_generation_clients_contract ON generation_clients (contract_number);
+
+CREATE TABLE IF NOT EXISTS jobs (
+    id TEXT PRIMARY KEY,
+    status TEXT NOT NULL,
+    total INTEGER NOT NULL,
+    done INTEGER NOT NULL,
+    failures TEXT NOT NULL,
+    result TEXT,
+    error TEXT,
+    created_at REAL NOT NULL,
+    started_at REAL,
+    finished_at REAL
+);
+CREATE INDEX IF NOT EXISTS idx_jobs_created_at ON jobs (created_at);
+"""
+
+
+class HistoryStore:
+    """История генераций и задачи в SQLite"""
+
+    def __init__(self, db_path: Path, busy_timeout: float = 30.0):
+        self.db_path = Path(db_path)
+        self.busy_timeout = busy_timeout
+        self._local = threading.local()
+        self._init_lock = threading.Lock()
+        self._initialized = False
+
+    def _init_db(self):
+        """Создать папку, базу в режиме WAL и таблицы (один раз на процесс)"""
+        with self._init_lock:
+            if self._initialized:
+                return
+            self.db_path.parent.mkdir(parents=True, exist_ok=True)
+            conn = sqlite3.connect(self.db_path, timeout=self.busy_timeout, isolation_level=None)
+            try:
+                conn.execute("PRAGMA journal_mode=WAL")
+                conn.executescript(SCHEMA)
+            finally:
+                conn.close()
+            self._initialized = True
+
+    def _connect(self) -> sqlite3.Connection:
+        """Соединение текущего потока"""
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            if not self._initialized:
+                self._init_db()
+            conn = sqlite3.connect(self.db_path, timeout=self.busy_timeout, isolation_level=None)
+            conn.row_factory = sqlite3.Row
+            conn.execute("PRAGMA foreign_keys=ON")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    # ------------------------------------------------------------------
+    # Генерации
+    # ------------------------------------------------------------------
+
+    def add_generation(self, generation_id: str, session_id: Optional[str], report_date: str, manager: str,
+                       formats: List[str], archives: dict, clients: Iterable[dict],
+                       failed: Iterable[dict] = (), streamed: bool = False):
+        """
+        Записать генерацию и результат по каждому клиенту
+
+        failed - ошибки вида {'id', 'client_name', 'error'}. При потоковой
+        выгрузке (streamed) справки рендерятся при скачивании, и клиенты
+        записываются со статусом deferred.
+        """
+        client_status = CLIENT_DEFERRED if streamed else CLIENT_OK
+        errors = {f['id']: f['error'] for f in failed}
+        rows = [
+            (
+                generation_id,
+                client['id'],
+                str(client.get('contract_number') or ''),
+                str(client.get('client_name') or ''),
+                str(client.get('iin') or ''),
+                int(client.get('total') or 0),
+                CLIENT_FAILED if client['id'] in errors else client_status,
+                errors.get(client['id'])
+            )
+            for client in clients
+        ]
+
+        conn = self._connect()
+        with conn:
+            conn.execute("BEGIN IMMEDIATE")
+            conn.execute(
+                "INSERT INTO generations (id, session_id, created_at, report_date, manager, clients_count, "
+                "failed_count, formats, archives, streamed) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                (generation_id, session_id, datetime.now().strftime('%Y-%m-%d %H:%M:%S'), report_date,
+                 manager, len(rows), len(errors), json.dumps(formats), json.dumps(archives), int(streamed))
+            )
+            conn.executemany(
+                "INSERT INTO generation_clients (generation_id, client_id, contract_number, client_name, "
+                "iin, total, status, error) VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                rows
+            )
+
+    def list_generations(self, limit: int = 20, offset: int = 0, manager: Optional[str] = None,
+                         report_date: Optional[str] = None, date_from: Optional[str] = None,
+                         date_to: Optional[str] = None, contract_number: Optional[str] = None) -> dict:
+        """
+        Страница истории, новые сверху
+
+        date_from/date_to - дата генерации в формате ГГГГ-ММ-ДД (включительно),
+        contract_number - генерации, в которые входил договор.
+        """
+        where = []
+        params = []
+        if manager:
+            where.append("manager = ?")
+            params.append(manager)
+        if report_date:
+            where.append("report_date = ?")
+            params.append(report_date)
+        if date_from:
+            where.append("created_at >= ?")
+            params.append(date_from)
+        if date_to:
+            where.append("created_at < date(?, '+1 day')")
+            params.append(date_to)
+        if contract_number:
+            where.append("id IN (SELECT generation_id FROM generation_clients WHERE contract_number = ?)")
+            params.append(contract_number)
+        condition = f"WHERE {' AND '.join(where)}" if where else ""
+
+        conn = self._connect()
+        total = conn.execute(f"SELECT COUNT(*) FROM generations {condition}", params).fetchone()[0]
+        rows = conn.execute(
+            f"SELECT * FROM generations {condition} ORDER BY created_at DESC, rowid DESC LIMIT ? OFFSET ?",
+            [*params, limit, offset]
+        ).fetchall()
+
+        return {
+            "items": [self._generation_dict(row) for row in rows],
+            "total": total,
+            "limit": limit,
+            "offset": offset
+        }
+
+    def recent(self, limit: int = 10) -> List[dict]:
+        """Последние генерации (для главной страницы)"""
+        return self.list_generations(limit=limit)["items"]
+
+    def get_generation(self, generation_id: str) -> Optional[dict]:
+        """Генерация по id (вместе с session_id и признаком потоковой выгрузки)"""
+        row = self._connect().execute("SELECT * FROM generations WHERE id = ?", (generation_id,)).fetchone()
+        if row is None:
+            return None
+        data = self._generation_dict(row)
+        data['session_id'] = row['session_id']
+        data['streamed'] = bool(row['streamed'])
+        return data
+
+    def generation_clients(self, generation_id: str) -> List[dict]:
+        """Результат по клиентам генерации"""
+        rows = self._connect().execute(
+            "SELECT client_id, contract_number, client_name, iin, total, status, error "
+            "FROM generation_clients WHERE generation_id = ? ORDER BY client_id",
+            (generation_id,)
+        ).fetchall()
+        return [dict(row) for row in rows]
+
+    @staticmethod
+    def _generation_dict(row: sqlite3.Row) -> dict:
+        created_at = datetime.strptime(row['created_at'], '%Y-%m-%d %H:%M:%S')
+        return {
+            'id': row['id'],
+            'date': created_at.strftime('%d.%m.%Y %H:%M'),
+            'report_date': row['report_date'],
+            'manager': row['manager'],
+            'clients_count': row['clients_count'],
+            'failed_count': row['failed_count'],
+            'formats': json.loads(row['formats']),
+            'archives': json.loads(row['archives'])
+        }
+
+    # ------------------------------------------------------------------
+    # Задачи
+    # ------------------------------------------------------------------
+
+    def save_job(self, job):
+        """Сохранить состояние задачи (jobs.Job)"""
+        self._connect().execute(
+            "INSERT OR REPLACE INTO jobs (id, status, total, done, failures, result, error, "
+            "created_at, started_at, finished_at) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+            (job.id, job.status, job.total, job.done, json.dumps(job.failures),
+             json.dumps(job.result) if job.result is not None else None, job.error,
+             job.created_at, job.started_at, job.finished_at)
+        )
+
+    def load_job(self, job_id: str) -> Optional[dict]:
+        """Поля задачи для jobs.Job(**...) или None"""
+        row = self._connect().execute("SELECT * FROM jobs WHERE id = ?", (job_id,)).fetchone()
+        if row is None:
+            return None
+        data = dict(row)
+        data['failures'] = json.loads(data['failures'])
+        data['result'] = json.loads(data['result']) if data['result'] is not None else None
+        return data
+
+    def prune_jobs(self, before: float) -> int:
+        """Удалить задачи, созданные раньше before (unix time); возвращает их число"""
+        cursor = self._connect().execute("DELETE FROM jobs WHERE created_at < ?", (before,))
+        return cursor.rowcount
+
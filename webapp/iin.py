@@ -0,0 +1,141 @@
+# -*- coding: utf-8 -*-
+"""
+Проверка ИИН (индивидуального идентификационного номера) Казахстана
+
+Структура ИИН - 12 цифр:
+
+    1-6    дата рождения ГГММДД
+    7      век рождения и пол: 1/2 - XIX век, 3/4 - XX, 5/6 - XXI
+           (нечётная - мужской, чётная - женский); 0 - у номеров,
+           выданных без привязки к дате рождения (иностранцам и др.):
+           первые 6 цифр у них не раскодируются, проверяется только
+           контрольная цифра
+    8-11   порядковый номер регистрации
+    12     контрольная цифра
+
+Контрольная цифра - сумма первых 11 цифр с весами 1..11 по модулю 11.
+Если получилось 10, сумма считается второй раз с весами 3..11, 1, 2; если
+и она даёт 10, номер не выдаётся.
+
+validate_iin проверяет один ИИН (правка клиента). validate_iins -
+столбец реестра целиком: корректные номера отбираются операциями над
+массивом NumPy (numpy импортируется при первом вызове), сообщения об
+ошибках строятся через validate_iin только для отбракованных.
+"""
+
+from datetime import date
+from typing import List, Optional, Sequence, Tuple
+
+IIN_LENGTH = 12
+
+WEIGHTS = (1, 2, 3, 4, 5, 6, 7, 8, 9, 10, 11)
+WEIGHTS_SECOND = (3, 4, 5, 6, 7, 8, 9, 10, 11, 1, 2)
+
+# 7-я цифра -> век рождения
+CENTURIES = {1: 1800, 2: 1800, 3: 1900, 4: 1900, 5: 2000, 6: 2000}
+
+_DAYS_IN_MONTH = (0, 31, 28, 31, 30, 31, 30, 31, 31, 30, 31, 30, 31)
+
+
+def iin_check_digit(digits: str) -> Optional[int]:
+    """Контрольная цифра по первым 11 цифрам ИИН; None - если не вычисляется (обе суммы дают 10)"""
+    values = [int(digit) for digit in digits[:11]]
+    for weights in (WEIGHTS, WEIGHTS_SECOND):
+        check = sum(value * weight for value, weight in zip(values, weights)) % 11
+        if check != 10:
+            return check
+    return None
+
+
+def _is_leap(year: int) -> bool:
+    return year % 4 == 0 and (year % 100 != 0 or year % 400 == 0)
+
+
+def validate_iin(iin: str, today: Optional[date] = None) -> dict:
+    """Валидация ИИН клиента: цифры, длина, век, дата рождения (кроме 7-й цифры 0) и контрольная цифра"""
+    # Удаляем пробелы
+    iin_clean = (iin or '').strip()
+    if not iin_clean:
+        return {'valid': False, 'error': 'ИИН отсутствует'}
+
+    # Проверка, что содержит только цифры
+    if not (iin_clean.isascii() and iin_clean.isdigit()):
+        return {'valid': False, 'error': f'ИИН содержит недопустимые символы: {iin_clean}'}
+
+    # Проверка длины
+    if len(iin_clean) != IIN_LENGTH:
+        return {'valid': False, 'error': f'ИИН должен содержать 12 цифр, найдено: {len(iin_clean)}'}
+
+    # 7-я цифра 0 - номер без даты рождения: век и дату не раскодируем
+    if iin_clean[6] != '0':
+        century = CENTURIES.get(int(iin_clean[6]))
+        if century is None:
+            return {'valid': False, 'error': f'ИИН: 7-я цифра (век рождения и пол) должна быть от 0 до 6, найдено: {iin_clean[6]}'}
+
+        year = century + int(iin_clean[0:2])
+        month = int(iin_clean[2:4])
+        day = int(iin_clean[4:6])
+        birth_date = f"{iin_clean[4:6]}.{iin_clean[2:4]}.{year}"
+        if not 1 <= month <= 12 or not 1 <= day <= _DAYS_IN_MONTH[month] + (month == 2 and _is_leap(year)):
+            return {'valid': False, 'error': f'ИИН: несуществующая дата рождения {birth_date}'}
+        if date(year, month, day) > (today or date.today()):
+            return {'valid': False, 'error': f'ИИН: дата рождения в будущем {birth_date}'}
+
+    check = iin_check_digit(iin_clean)
+    if check is None:
+        return {'valid': False, 'error': 'ИИН: контрольная цифра не вычисляется, такой номер не выдаётся'}
+    if check != int(iin_clean[11]):
+        return {'valid': False, 'error': f'ИИН: неверная контрольная цифра {iin_clean[11]} (ожидается {check})'}
+
+    return {'valid': True, 'error': None}
+
+
+def validate_iins(iins: Sequence[str], today: Optional[date] = None) -> Tuple[List[bool], List[Optional[str]]]:
+    """
+    Валидация столбца ИИН за один проход: (признаки корректности, ошибки)
+
+    Результат для каждого номера тот же, что у validate_iin.
+    """
+    import numpy as np
+
+    today = today or date.today()
+    size = len(iins)
+    cleaned = [iin.strip() if iin else '' for iin in iins]
+    valid = np.zeros(size, dtype=bool)
+
+    # Кандидаты - строки из 12 символов; их цифры - матрица size x 12
+    candidates = np.flatnonzero(np.fromiter(map(len, cleaned), dtype=np.int64, count=size) == IIN_LENGTH)
+    joined = ''.join([cleaned[i] for i in candidates.tolist()])
+    if not joined.isascii():
+        # Редкие не-ASCII строки (кириллица, арабские цифры) проверит validate_iin
+        candidates = np.array([i for i in candidates.tolist() if cleaned[i].isascii()], dtype=np.int64)
+        joined = ''.join([cleaned[i] for i in candidates])
+    if candidates.size:
+        digits = np.frombuffer(joined.encode('ascii'), dtype=np.uint8).reshape(-1, IIN_LENGTH) - ord('0')
+        # Не цифры после вычитания '0' дают > 9 (uint8 переполняется вниз)
+        all_digits = (digits <= 9).all(axis=1)
+        candidates, digits = candidates[all_digits], digits[all_digits].astype(np.int64)
+
+        century_digit = digits[:, 6]
+        year = 1800 + 100 * ((century_digit - 1) // 2) + digits[:, 0] * 10 + digits[:, 1]
+        month = digits[:, 2] * 10 + digits[:, 3]
+        day = digits[:, 4] * 10 + digits[:, 5]
+        leap = (year % 4 == 0) & ((year % 100 != 0) | (year % 400 == 0))
+        month_days = np.array(_DAYS_IN_MONTH)[np.clip(month, 0, 12)] + ((month == 2) & leap)
+
+        check = digits[:, :11] @ np.array(WEIGHTS) % 11
+        check = np.where(check == 10, digits[:, :11] @ np.array(WEIGHTS_SECOND) % 11, check)
+
+        birth_ok = (
+            (century_digit >= 1) & (century_digit <= 6)
+            & (month >= 1) & (month <= 12) & (day >= 1) & (day <= month_days)
+            & (year * 10000 + month * 100 + day <= today.year * 10000 + today.month * 100 + today.day)
+        )
+        # 7-я цифра 0 - без даты рождения, проверяется только контрольная цифра
+        ok = ((century_digit == 0) | birth_ok) & (check != 10) & (check == digits[:, 11])
+        valid[candidates[ok]] = True
+
+    errors: List[Optional[str]] = [None] * size
+    for i in np.flatnonzero(~valid).tolist():
+        errors[i] = validate_iin(cleaned[i], today)['error']
+    return valid.tolist(), errors
@@ -0,0 +1,278 @@
+# -*- coding: utf-8 -*-
+"""
+Очистка uploads/ и generated/ по сроку хранения и квоте диска
+
+Фоновый поток раз в interval секунд выполняет проход:
+
+    1. loose    - у готовых генераций (есть manifest.json, он пишется
+                  после архивов) удаляются отдельные файлы справок в
+                  excel/ и pdf/, остаются только архивы
+    2. expired  - папки генераций и сессий загрузки старше срока хранения,
+                  файлы кэша справок старше срока хранения генераций
+    3. quota    - если занято больше quota_bytes, удаляются самые старые
+                  генерации, сессии и файлы кэша, пока объём не уложится
+    4. orphaned - файлы хранилища загрузок (_blobs), на которые не
+                  ссылается ни одна сессия
+
+Свежие записи (моложе min_age) не удаляются ни по сроку, ни по квоте:
+их может использовать идущая генерация. При нескольких процессах
+uvicorn проход выполняет только тот, кто взял блокировку lock_path.
+"""
+
+import os
+import time
+import shutil
+import threading
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+try:
+    import fcntl
+except ImportError:  # Windows - блокировка между процессами не нужна
+    fcntl = None
+
+REASONS = ('loose', 'expired', 'quota', 'orphaned')
+
+
+def _latest_mtime(path: Path) -> float:
+    """Время последнего изменения папки или её прямых потомков"""
+    latest = path.stat().st_mtime
+    for child in path.iterdir():
+        try:
+            latest = max(latest, child.stat().st_mtime)
+        except FileNotFoundError:
+            pass
+    return latest
+
+
+def _freed_size(path: Path) -> int:
+    """
+    Сколько байт освободит удаление path
+
+    Файлы с другими жёсткими ссылками (кэш справок, хранилище загрузок)
+    места не освобождают.
+    """
+    if path.is_file():
+        st = path.stat()
+        return st.st_size if st.st_nlink == 1 else 0
+    total = 0
+    for root, _, files in os.walk(path):
+        for name in files:
+            try:
+                st = os.stat(os.path.join(root, name))
+            except FileNotFoundError:
+                continue
+            if st.st_nlink == 1:
+                total += st.st_size
+    return total
+
+
+def disk_usage(*roots: Path) -> int:
+    """Объём файлов в папках (жёсткие ссылки считаются один раз)"""
+    seen = set()
+    total = 0
+    for root in roots:
+        for dirpath, _, files in os.walk(root):
+            for name in files:
+                try:
+                    st = os.stat(os.path.join(dirpath, name))
+                except FileNotFoundError:
+                    continue
+                if (st.st_dev, st.st_ino) not in seen:
+                    seen.add((st.st_dev, st.st_ino))
+                    total += st.st_size
+    return total
+
+
+class Janitor:
+    """Периодическая очистка загрузок, генераций и кэша справок"""
+
+    def __init__(self, upload_dir: Path, generated_dir: Path, blobs_dir: Path, cache_dir: Path,
+                 upload_ttl: float = 0, generated_ttl: float = 0, quota_bytes: int = 0,
+                 min_age: float = 900, interval: float = 600, lock_path: Optional[Path] = None,
+                 store=None):
+        self.upload_dir = Path(upload_dir)
+        self.generated_dir = Path(generated_dir)
+        self.blobs_dir = Path(blobs_dir)
+        self.cache_dir = Path(cache_dir)
+        self.upload_ttl = upload_ttl
+        self.generated_ttl = generated_ttl
+        self.quota_bytes = quota_bytes
+        self.min_age = min_age
+        self.interval = interval
+        self.lock_path = lock_path
+        self.store = store
+
+        self._stop = threading.Event()
+        self._thread = None
+        self._lock = threading.Lock()
+        self.runs = 0
+        self.skipped_runs = 0
+        self.errors = 0
+        self.last_run_at = None
+        self.last_duration = 0.0
+        self.usage_bytes = 0
+        self.reclaimed_bytes = dict.fromkeys(REASONS, 0)
+        self.removed = dict.fromkeys(REASONS, 0)
+
+    # ------------------------------------------------------------------
+    # Фоновый поток
+    # ------------------------------------------------------------------
+
+    def start(self):
+        """Запустить фоновый поток (interval <= 0 - очистка отключена)"""
+        if self.interval <= 0 or self._thread is not None:
+            return
+        self._thread = threading.Thread(target=self._loop, name="janitor", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+
+    def _loop(self):
+        while not self._stop.wait(self.interval):
+            try:
+                self.run_once()
+            except Exception as e:
+                self.errors += 1
+                print(f"Ошибка очистки: {e}")
+
+    def run_once(self) -> bool:
+        """Один проход очистки; False, если его уже выполняет другой процесс"""
+        lock_file = open(self.lock_path, 'w') if self.lock_path and fcntl else None
+        try:
+            if lock_file:
+                try:
+                    fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+                except BlockingIOError:
+                    self.skipped_runs += 1
+                    return False
+
+            with self._lock:
+                started = time.monotonic()
+                now = time.time()
+                self._compact_outputs()
+                self._expire(now)
+                if self.quota_bytes:
+                    self._enforce_quota(now)
+                self._remove_orphaned_blobs(now)
+                if self.store and self.generated_ttl:
+                    self.store.prune_jobs(now - self.generated_ttl)
+
+                self.usage_bytes = disk_usage(self.upload_dir, self.generated_dir)
+                self.runs += 1
+                self.last_run_at = now
+                self.last_duration = time.monotonic() - started
+            return True
+        finally:
+            if lock_file:
+                lock_file.close()
+
+    def stats(self) -> dict:
+        """Метрики очистки"""
+        return {
+            "runs": self.runs,
+            "skipped_runs": self.skipped_runs,
+            "errors": self.errors,
+            "last_run_at": self.last_run_at,
+            "last_duration": round(self.last_duration, 3),
+            "usage_bytes": self.usage_bytes,
+            "quota_bytes": self.quota_bytes,
+            "reclaimed_bytes": dict(self.reclaimed_bytes),
+            "reclaimed_bytes_total": sum(self.reclaimed_bytes.values()),
+            "removed": dict(self.removed)
+        }
+
+    # ------------------------------------------------------------------
+    # Проходы
+    # ------------------------------------------------------------------
+
+    @staticmethod
+    def _entries(root: Path) -> List[Path]:
+        """Папки сессий/генераций (служебные _blobs, _cache и скрытые пропускаются)"""
+        if not root.exists():
+            return []
+        return [p for p in root.iterdir() if p.is_dir() and not p.name.startswith(('_', '.'))]
+
+    def _remove(self, path: Path, reason: str) -> int:
+        """Удалить файл или папку и учесть освобождённое место"""
+        try:
+            freed = _freed_size(path)
+            if path.is_dir():
+                shutil.rmtree(path)
+            else:
+                path.unlink()
+        except FileNotFoundError:
+            return 0
+        self.reclaimed_bytes[reason] += freed
+        self.removed[reason] += 1
+        return freed
+
+    def _compact_outputs(self):
+        for output_dir in self._entries(self.generated_dir):
+            if not (output_dir / "manifest.json").exists():
+                continue
+            for fmt in ('excel', 'pdf'):
+                loose_dir = output_dir / fmt
+                if loose_dir.is_dir() and (output_dir / f"certificates_{fmt}.zip").exists():
+                    self._remove(loose_dir, 'loose')
+
+    def _expire(self, now: float):
+        for root, ttl in ((self.upload_dir, self.upload_ttl), (self.generated_dir, self.generated_ttl)):
+            if not ttl:
+                continue
+            for entry in self._entries(root):
+                if now - _latest_mtime(entry) > max(ttl, self.min_age):
+                    self._remove(entry, 'expired')
+
+        if self.generated_ttl:
+            for path, mtime in self._cache_files():
+                if now - mtime > max(self.generated_ttl, self.min_age):
+                    self._remove(path, 'expired')
+
+    def _cache_files(self) -> List[Tuple[Path, float]]:
+        files = []
+        if not self.cache_dir.exists():
+            return files
+        for dirpath, _, names in os.walk(self.cache_dir):
+            for name in names:
+                path = Path(dirpath) / name
+                try:
+                    files.append((path, path.stat().st_mtime))
+                except FileNotFoundError:
+                    pass
+        return files
+
+    def _enforce_quota(self, now: float):
+        """Удаление самых старых записей, пока занятый объём больше квоты"""
+        usage = disk_usage(self.upload_dir, self.generated_dir)
+        if usage <= self.quota_bytes:
+            return
+
+        candidates: List[Tuple[float, Path]] = []
+        for root in (self.upload_dir, self.generated_dir):
+            for entry in self._entries(root):
+                candidates.append((_latest_mtime(entry), entry))
+        candidates.extend((mtime, path) for path, mtime in self._cache_files())
+        candidates.sort(key=lambda item: item[0])
+
+        for mtime, path in candidates:
+            if usage <= self.quota_bytes or now - mtime <= self.min_age:
+                break
+            usage -= self._remove(path, 'quota')
+            # Удалённая сессия могла быть последней ссылкой на файл в _blobs
+            if path.parent == self.upload_dir:
+                usage -= self._remove_orphaned_blobs(now)
+
+    def _remove_orphaned_blobs(self, now: float) -> int:
+        freed = 0
+        if not self.blobs_dir.exists():
+            return freed
+        for blob in self.blobs_dir.iterdir():
+            try:
+                st = blob.stat()
+            except FileNotFoundError:
+                continue
+            if blob.is_file() and st.st_nlink == 1 and now - st.st_mtime > self.min_age:
+                freed += self._remove(blob, 'orphaned')
+        return freed
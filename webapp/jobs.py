@@ -0,0 +1,149 @@
+# -*- coding: utf-8 -*-
+"""
+Фоновые задачи генерации справок
+
+POST /generate только ставит задачу в очередь и сразу возвращает её id.
+Рендеринг выполняется в отдельном потоке, вне event loop, а клиент
+опрашивает GET /jobs/{id}: прогресс по клиентам, оценка оставшегося
+времени и список ошибок.
+
+Если передано хранилище (history_store.HistoryStore), состояние задачи
+сохраняется в нём, и опрос работает из любого процесса uvicorn.
+"""
+
+import time
+import uuid
+import threading
+import traceback
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+from typing import Callable, List, Optional
+
+# Статусы задачи
+QUEUED = "queued"
+RUNNING = "running"
+DONE = "done"
+FAILED = "failed"
+
+
+@dataclass
+class Job:
+    """Задача генерации справок"""
+    id: str
+    total: int
+    status: str = QUEUED
+    done: int = 0
+    failures: List[dict] = field(default_factory=list)
+    result: Optional[dict] = None
+    error: Optional[str] = None
+    created_at: float = field(default_factory=time.time)
+    started_at: Optional[float] = None
+    finished_at: Optional[float] = None
+    on_progress: Optional[Callable[["Job"], None]] = field(default=None, repr=False, compare=False)
+
+    def advance(self, count: int, failures: List[dict]):
+        """Отметить обработанных клиентов (вызывается из потока генерации)"""
+        self.done += count
+        self.failures.extend(failures)
+        if self.on_progress:
+            self.on_progress(self)
+
+    def eta(self) -> Optional[float]:
+        """Оценка оставшегося времени, сек"""
+        if self.status != RUNNING or not self.done or not self.started_at:
+            return None
+        elapsed = time.time() - self.started_at
+        return round(elapsed / self.done * (self.total - self.done), 1)
+
+    def to_dict(self) -> dict:
+        end = self.finished_at or time.time()
+        return {
+            "job_id": self.id,
+            "status": self.status,
+            "total": self.total,
+            "done": self.done,
+            "progress": round(self.done / self.total * 100, 1) if self.total else 100.0,
+            "elapsed": round(end - self.started_at, 1) if self.started_at else 0.0,
+            "eta": self.eta(),
+            "failed_count": len(self.failures),
+            "failures": self.failures,
+            "result": self.result,
+            "error": self.error
+        }
+
+
+class JobManager:
+    """Очередь задач: выполняет до max_workers задач одновременно в потоках"""
+
+    def __init__(self, max_workers: int = 1, keep: int = 200, store=None, persist_interval: float = 1.0):
+        self.keep = keep
+        self.store = store
+        self.persist_interval = persist_interval
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="generate")
+        self._jobs: "OrderedDict[str, Job]" = OrderedDict()
+        self._saved_at = {}
+        self._lock = threading.Lock()
+
+    def submit(self, total: int, func: Callable, *args, **kwargs) -> Job:
+        """
+        Поставить задачу в очередь
+
+        func(job, *args, **kwargs) выполняется в потоке; её результат
+        сохраняется в job.result.
+        """
+        job = Job(id=str(uuid.uuid4()), total=total)
+        if self.store:
+            job.on_progress = self._persist_progress
+
+        with self._lock:
+            self._jobs[job.id] = job
+            # Храним только последние задачи
+            while len(self._jobs) > self.keep:
+                old_id, _ = self._jobs.popitem(last=False)
+                self._saved_at.pop(old_id, None)
+
+        self._persist(job)
+        self._executor.submit(self._run, job, func, args, kwargs)
+        return job
+
+    def get(self, job_id: str) -> Optional[Job]:
+        """Задача по id: из памяти или (задача другого процесса) из хранилища"""
+        with self._lock:
+            job = self._jobs.get(job_id)
+        if job is None and self.store:
+            data = self.store.load_job(job_id)
+            if data:
+                job = Job(**data)
+        return job
+
+    def _persist(self, job: Job):
+        if not self.store:
+            return
+        try:
+            self.store.save_job(job)
+            self._saved_at[job.id] = time.monotonic()
+        except Exception as e:
+            # Состояние в памяти остаётся верным, опрос из этого процесса работает
+            print(f"Не удалось сохранить задачу {job.id}: {e}")
+
+    def _persist_progress(self, job: Job):
+        """Прогресс пишется в хранилище не чаще persist_interval"""
+        if time.monotonic() - self._saved_at.get(job.id, 0) >= self.persist_interval:
+            self._persist(job)
+
+    def _run(self, job: Job, func: Callable, args: tuple, kwargs: dict):
+        job.status = RUNNING
+        job.started_at = time.time()
+        self._persist(job)
+        try:
+            job.result = func(job, *args, **kwargs)
+            job.status = DONE
+        except Exception as e:
+            print(f"Ошибка задачи генерации {job.id}: {e}")
+            traceback.print_exc()
+            job.error = str(e)
+            job.status = FAILED
+        finally:
+            job.finished_at = time.time()
+            self._persist(job)
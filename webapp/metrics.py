@@ -0,0 +1,222 @@
+# -*- coding: utf-8 -*-
+"""
+Метрики этапов генерации в текстовом формате Prometheus
+
+Без внешних зависимостей: счётчики, гистограммы и показатели, значения
+которых вычисляются при выдаче /metrics. Метрики хранятся в памяти
+процесса; при нескольких процессах uvicorn каждый отдаёт свои.
+
+Время этапов пишется в гистограмму certgen_stage_duration_seconds и,
+если в потоке открыт сбор (collect_stages), в разбивку текущей задачи.
+Процессы пула генерации возвращают свою разбивку вместе с результатом,
+и она добавляется в метрики основного процесса через record_stages.
+"""
+
+import time
+import bisect
+import threading
+from contextlib import contextmanager
+from functools import wraps
+from typing import Callable, Dict, Iterator, List, Optional, Tuple
+
+# Границы корзин гистограммы, сек: от одной справки до пакета
+DEFAULT_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300, 600)
+
+
+def _format_labels(labelnames: Tuple[str, ...], values: Tuple, extra: str = '') -> str:
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(labelnames, values)]
+    if extra:
+        pairs.append(extra)
+    return '{' + ','.join(pairs) + '}' if pairs else ''
+
+
+def _escape(value) -> str:
+    return str(value).replace('\\', '\\\\').replace('\n', '\\n').replace('"', '\\"')
+
+
+def _format_value(value: float) -> str:
+    if value == float('inf'):
+        return '+Inf'
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class Counter:
+    """Монотонный счётчик с метками"""
+
+    type_name = 'counter'
+
+    def __init__(self, name: str, documentation: str, labelnames: Tuple[str, ...] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._values: Dict[Tuple, float] = {}
+        self._lock = threading.Lock()
+
+    def inc(self, amount: float = 1, **labels):
+        key = tuple(labels[name] for name in self.labelnames)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def samples(self) -> Iterator[str]:
+        with self._lock:
+            items = sorted(self._values.items())
+        for key, value in items:
+            yield f"{self.name}{_format_labels(self.labelnames, key)} {_format_value(value)}"
+
+
+class Histogram:
+    """Гистограмма с накопительными корзинами (как в prometheus_client)"""
+
+    type_name = 'histogram'
+
+    def __init__(self, name: str, documentation: str, labelnames: Tuple[str, ...] = (),
+                 buckets: Tuple[float, ...] = DEFAULT_BUCKETS):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(sorted(buckets))
+        self._series: Dict[Tuple, list] = {}  # метки -> [счётчики корзин..., +Inf, сумма]
+        self._lock = threading.Lock()
+
+    def observe(self, value: float, **labels):
+        key = tuple(labels[name] for name in self.labelnames)
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                series = self._series[key] = [0] * (len(self.buckets) + 1) + [0.0]
+            series[index] += 1
+            series[-1] += value
+
+    def samples(self) -> Iterator[str]:
+        with self._lock:
+            items = sorted((key, list(series)) for key, series in self._series.items())
+        for key, series in items:
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float('inf'),), series):
+                cumulative += count
+                le = f'le="{_format_value(float(bound))}"'
+                yield f"{self.name}_bucket{_format_labels(self.labelnames, key, le)} {cumulative}"
+            yield f"{self.name}_count{_format_labels(self.labelnames, key)} {cumulative}"
+            yield f"{self.name}_sum{_format_labels(self.labelnames, key)} {_format_value(series[-1])}"
+
+
+class GaugeFunc:
+    """Показатель, значения которого вычисляются при выдаче: fn() -> {значения меток: число}"""
+
+    type_name = 'gauge'
+
+    def __init__(self, name: str, documentation: str, fn: Callable[[], Dict[Tuple, float]],
+                 labelnames: Tuple[str, ...] = (), type_name: str = 'gauge'):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self.fn = fn
+        self.type_name = type_name
+
+    def samples(self) -> Iterator[str]:
+        for key, value in sorted(self.fn().items()):
+            yield f"{self.name}{_format_labels(self.labelnames, key)} {_format_value(value)}"
+
+
+class Registry:
+    """Набор метрик для /metrics"""
+
+    def __init__(self):
+        self._metrics = []
+
+    def register(self, metric):
+        self._metrics.append(metric)
+        return metric
+
+    def render(self) -> str:
+        lines = []
+        for metric in self._metrics:
+            lines.append(f"# HELP {metric.name} {metric.documentation}")
+            lines.append(f"# TYPE {metric.name} {metric.type_name}")
+            try:
+                lines.extend(metric.samples())
+            except Exception as e:
+                # Ошибка одного показателя не должна ломать выдачу остальных
+                lines.append(f"# {metric.name}: {e}")
+        return '\n'.join(lines) + '\n'
+
+
+REGISTRY = Registry()
+
+STAGE_DURATION = REGISTRY.register(Histogram(
+    'certgen_stage_duration_seconds', 'Время этапов генерации справок', ('stage',)
+))
+
+
+# ============================================================================
+# РАЗБИВКА ПО ЗАДАЧЕ
+# ============================================================================
+
+_local = threading.local()
+
+
+class StageTimings:
+    """Длительности этапов одной задачи: этап -> список длительностей"""
+
+    def __init__(self):
+        self.durations: Dict[str, List[float]] = {}
+
+    def add(self, stage: str, seconds: float):
+        self.durations.setdefault(stage, []).append(seconds)
+
+    def summary(self) -> Dict[str, dict]:
+        """Для ответа API: этап -> {seconds, count}"""
+        return {
+            stage: {'seconds': round(sum(values), 3), 'count': len(values)}
+            for stage, values in self.durations.items()
+        }
+
+
+@contextmanager
+def collect_stages() -> Iterator[StageTimings]:
+    """Собирать длительности этапов, выполняемых в текущем потоке"""
+    previous = getattr(_local, 'timings', None)
+    timings = _local.timings = StageTimings()
+    try:
+        yield timings
+    finally:
+        _local.timings = previous
+
+
+def observe_stage(stage: str, seconds: float):
+    STAGE_DURATION.observe(seconds, stage=stage)
+    timings: Optional[StageTimings] = getattr(_local, 'timings', None)
+    if timings is not None:
+        timings.add(stage, seconds)
+
+
+def record_stages(durations: Dict[str, List[float]]):
+    """Добавить длительности, измеренные в другом процессе (StageTimings.durations)"""
+    for stage, values in durations.items():
+        for seconds in values:
+            observe_stage(stage, seconds)
+
+
+@contextmanager
+def stage(name: str):
+    """Замер этапа: with stage('zip_archive'): ..."""
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        observe_stage(name, time.perf_counter() - start)
+
+
+def timed(name: str):
+    """Декоратор: замер времени вызова функции как этапа name"""
+    def decorator(func):
+        @wraps(func)
+        def wrapper(*args, **kwargs):
+            start = time.perf_counter()
+            try:
+                return func(*args, **kwargs)
+            finally:
+                observe_stage(name, time.perf_counter() - start)
+        return wrapper
+    return decorator
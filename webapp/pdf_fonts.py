@@ -0,0 +1,65 @@
+# -*- coding: utf-8 -*-
+"""
+Шрифты PDF с поддержкой кириллицы
+
+Шрифты регистрируются при первой PDF справке, а не при импорте
+приложения: процессы uvicorn, которые PDF не генерируют, не тратят
+время на reportlab и разбор TTF. Файл шрифта разбирается штатным
+TTFont один раз на процесс (около 20 мс на начертание).
+"""
+
+import platform
+import threading
+from typing import Optional, Tuple
+
+# Запасной шрифт reportlab (без кириллицы)
+FALLBACK_FONTS = ('Helvetica', 'Helvetica-Bold')
+
+# (имя, обычный, жирный) - первый найденный набор для текущей ОС
+if platform.system() == 'Windows':
+    FONT_CANDIDATES = [
+        ('Arial', 'C:/Windows/Fonts/arial.ttf', 'C:/Windows/Fonts/arialbd.ttf'),
+    ]
+else:
+    # Linux/Docker
+    FONT_CANDIDATES = [
+        ('DejaVu', '/usr/share/fonts/truetype/dejavu/DejaVuSans.ttf',
+         '/usr/share/fonts/truetype/dejavu/DejaVuSans-Bold.ttf'),
+    ]
+
+_lock = threading.Lock()
+_registered: Optional[Tuple[str, str]] = None
+
+
+def register_fonts() -> Tuple[str, str]:
+    """
+    Зарегистрировать шрифты (один раз на процесс) и вернуть (обычный, жирный)
+
+    Если ни один набор не найден, возвращаются Helvetica (без кириллицы).
+    """
+    global _registered
+    if _registered:
+        return _registered
+
+    with _lock:
+        if _registered:
+            return _registered
+
+        from reportlab.pdfbase import pdfmetrics
+        from reportlab.pdfbase.ttfonts import TTFont
+
+        fonts = FALLBACK_FONTS
+        for name, regular_path, bold_path in FONT_CANDIDATES:
+            try:
+                pdfmetrics.registerFont(TTFont(name, regular_path))
+                pdfmetrics.registerFont(TTFont(f"{name}-Bold", bold_path))
+                fonts = (name, f"{name}-Bold")
+                print(f"✓ Registered {name} fonts")
+                break
+            except Exception as e:
+                print(f"⚠ {name} registration failed: {e}")
+        else:
+            print("⚠ Using Helvetica (no Cyrillic)")
+
+        _registered = fonts
+        return fonts
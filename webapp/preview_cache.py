@@ -0,0 +1,93 @@
+# -*- coding: utf-8 -*-
+"""
+Кэш предпросмотров справок в памяти процесса
+
+Предпросмотр - настоящий PDF справки (или PNG его первой страницы),
+отрендеренный тем же кодом, что и при генерации. Ключ - хэш данных
+клиента, даты отчёта и менеджера (certificate_cache_key), поэтому
+листание предпросмотров туда и обратно не рендерит справки заново, а
+правка клиента меняет ключ и старый предпросмотр больше не выдаётся.
+
+Вытеснение: LRU по количеству записей и суммарному объёму.
+"""
+
+import io
+import threading
+import importlib.util
+from collections import OrderedDict
+from typing import Optional, Tuple
+
+# Растеризатор PDF для PNG - необязательная зависимость, импортируется при
+# первом PNG (без него доступен только предпросмотр в PDF)
+PNG_PREVIEW_AVAILABLE = importlib.util.find_spec('pypdfium2') is not None
+
+# PDFium не потокобезопасен: растеризация по одной за раз
+_pdfium_lock = threading.Lock()
+
+
+def render_png(pdf: bytes, width: int) -> bytes:
+    """PNG первой страницы PDF шириной width пикселей"""
+    import pypdfium2
+
+    with _pdfium_lock:
+        document = pypdfium2.PdfDocument(pdf)
+        try:
+            page = document[0]
+            image = page.render(scale=width / page.get_width()).to_pil()
+        finally:
+            document.close()
+    output = io.BytesIO()
+    image.save(output, 'PNG', optimize=True)
+    return output.getvalue()
+
+
+class PreviewCache:
+    """Потокобезопасный LRU-кэш байтов предпросмотров с лимитом памяти"""
+
+    def __init__(self, max_entries: int = 256, max_bytes: int = 64 * 1024 * 1024):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self._entries: "OrderedDict[Tuple[str, str], bytes]" = OrderedDict()
+        self._total_bytes = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, key: str, kind: str) -> Optional[bytes]:
+        """Предпросмотр по ключу справки и виду ('pdf', 'png-900', ...)"""
+        with self._lock:
+            data = self._entries.get((key, kind))
+            if data is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end((key, kind))
+            self.hits += 1
+            return data
+
+    def put(self, key: str, kind: str, data: bytes):
+        # Запись, которая одна больше лимита, не кэшируется
+        if len(data) > self.max_bytes:
+            return
+        with self._lock:
+            previous = self._entries.pop((key, kind), None)
+            if previous is not None:
+                self._total_bytes -= len(previous)
+            self._entries[(key, kind)] = data
+            self._total_bytes += len(data)
+
+            while len(self._entries) > self.max_entries or self._total_bytes > self.max_bytes:
+                _, evicted = self._entries.popitem(last=False)
+                self._total_bytes -= len(evicted)
+                self.evictions += 1
+
+    def stats(self) -> dict:
+        """Статистика кэша"""
+        with self._lock:
+            return {
+                "entries": len(self._entries),
+                "bytes": self._total_bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions
+            }
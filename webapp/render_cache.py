@@ -0,0 +1,97 @@
+# -*- coding: utf-8 -*-
+"""
+Кэш отрендеренных справок по содержимому
+
+Ключ справки - хэш от данных строки клиента (без порядкового id),
+даты отчёта, менеджера и формата. При повторной генерации того же
+реестра рендерятся только изменившиеся строки, остальные файлы берутся
+из кэша (жёсткой ссылкой, без копирования, если это возможно).
+
+Раскладка на диске: <root>/<ext>/<ключ[:2]>/<ключ>.<ext>
+"""
+
+import os
+import json
+import uuid
+import shutil
+import hashlib
+from pathlib import Path
+from typing import Optional
+
+# Меняется при изменении вёрстки справок - старые файлы кэша перестают совпадать
+RENDER_CACHE_VERSION = "1"
+
+
+def certificate_cache_key(client: dict, report_date: str, manager: str, format_type: str) -> str:
+    """Ключ кэша справки клиента (без порядкового id и источника строки в пакете)"""
+    row = {k: v for k, v in client.items() if k not in ('id', 'source')}
+    payload = json.dumps(
+        [RENDER_CACHE_VERSION, format_type, report_date, manager, row],
+        sort_keys=True, ensure_ascii=False, default=str
+    )
+    return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+
+def link_or_copy(src: Path, dest: Path):
+    """Жёсткая ссылка src -> dest (копия, если ссылки не поддерживаются)"""
+    try:
+        os.link(src, dest)
+    except OSError:
+        shutil.copyfile(src, dest)
+
+
+class RenderCache:
+    """Файлы справок, адресуемые ключом certificate_cache_key"""
+
+    def __init__(self, root: Path):
+        self.root = Path(root)
+
+    def path(self, key: str, ext: str) -> Path:
+        return self.root / ext / key[:2] / f"{key}.{ext}"
+
+    @staticmethod
+    def _touch(path: Path):
+        """Отметить использование: очистка (janitor) удаляет давно не использованные файлы"""
+        try:
+            os.utime(path)
+        except OSError:
+            pass
+
+    def fetch(self, key: str, ext: str, dest: Path) -> bool:
+        """Положить справку из кэша в dest; False, если её нет в кэше"""
+        cached = self.path(key, ext)
+        try:
+            link_or_copy(cached, dest)
+        except FileNotFoundError:
+            return False
+        self._touch(cached)
+        return True
+
+    def store(self, key: str, ext: str, src: Path):
+        """Сохранить готовый файл справки в кэш"""
+        cached = self.path(key, ext)
+        if cached.exists():
+            return
+        cached.parent.mkdir(parents=True, exist_ok=True)
+        # Через временное имя: параллельные процессы не увидят недописанный файл
+        tmp = cached.with_name(f".{uuid.uuid4().hex}.tmp")
+        link_or_copy(src, tmp)
+        os.replace(tmp, cached)
+
+    def read(self, key: str, ext: str) -> Optional[bytes]:
+        cached = self.path(key, ext)
+        try:
+            data = cached.read_bytes()
+        except FileNotFoundError:
+            return None
+        self._touch(cached)
+        return data
+
+    def write(self, key: str, ext: str, data: bytes):
+        cached = self.path(key, ext)
+        if cached.exists():
+            return
+        cached.parent.mkdir(parents=True, exist_ok=True)
+        tmp = cached.with_name(f".{uuid.uuid4().hex}.tmp")
+        tmp.write_bytes(data)
+        os.replace(tmp, cached)
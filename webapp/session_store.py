@@ -0,0 +1,189 @@
+# -*- coding: utf-8 -*-
+"""
+Хранилище разобранных данных сессий загрузки
+
+Файл Excel разбирается один раз при загрузке, а нормализованный список
+клиентов, маппинг столбцов и индекс по id хранятся в памяти процесса.
+Предпросмотр и генерация берут данные отсюда, не открывая книгу заново.
+
+Вытеснение: LRU по количеству сессий, TTL с момента последнего обращения
+и ограничение по (оценочному) объёму памяти.
+
+Сессии индексируются по хэшу содержимого файла: повторная загрузка того
+же реестра получает новый session_id, но разобранные данные берутся у
+уже закэшированной сессии.
+
+Правка клиента (update_client) не меняет общие списки: сессия получает
+свою копию списка, а связь с хэшем файла снимается - её данные больше
+не совпадают с содержимым файла.
+"""
+
+import sys
+import time
+import threading
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Dict, List, Optional
+
+
+@dataclass
+class SessionData:
+    """Разобранные данные одной загрузки"""
+    session_id: str
+    file_path: Path
+    clients: List[dict]
+    column_mapping: dict
+    by_id: Dict[int, dict] = field(default_factory=dict)
+    size: int = 0
+    last_access: float = 0.0
+    digest: str = ''
+    edits_version: int = 0  # mtime_ns файла правок, применённого к clients
+    search_keys: Optional[List[str]] = None  # строки поиска по clients, строятся при первом поиске
+
+    def get_client(self, client_id: int) -> Optional[dict]:
+        """Клиент по id (O(1))"""
+        return self.by_id.get(client_id)
+
+
+def estimate_size(clients: List[dict]) -> int:
+    """Приблизительный объём списка клиентов в памяти (байт)"""
+    total = sys.getsizeof(clients)
+    for client in clients:
+        total += sys.getsizeof(client)
+        for key, value in client.items():
+            total += sys.getsizeof(value)
+    return total
+
+
+class SessionStore:
+    """Потокобезопасный LRU/TTL-кэш разобранных сессий с лимитом памяти"""
+
+    def __init__(self, max_entries: int = 32, ttl: float = 3600, max_bytes: int = 512 * 1024 * 1024):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.max_bytes = max_bytes
+        self._entries: "OrderedDict[str, SessionData]" = OrderedDict()
+        self._by_digest: Dict[str, str] = {}
+        self._total_bytes = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, session_id: str) -> Optional[SessionData]:
+        """Получить данные сессии (None, если их нет или истёк TTL)"""
+        now = time.monotonic()
+        with self._lock:
+            data = self._entries.get(session_id)
+            if data is None:
+                self.misses += 1
+                return None
+            if self.ttl and now - data.last_access > self.ttl:
+                self._remove(session_id)
+                self.evictions += 1
+                self.misses += 1
+                return None
+            data.last_access = now
+            self._entries.move_to_end(session_id)
+            self.hits += 1
+            return data
+
+    def find_by_digest(self, digest: str) -> Optional[SessionData]:
+        """Закэшированная сессия с файлом того же содержимого (или None)"""
+        with self._lock:
+            session_id = self._by_digest.get(digest)
+        return self.get(session_id) if session_id else None
+
+    def put(self, session_id: str, file_path: Path, clients: List[dict], column_mapping: dict,
+            digest: str = '', edits_version: int = 0) -> SessionData:
+        """
+        Сохранить разобранные данные сессии и вернуть их
+
+        digest не указывается для сессий с правками - их данные нельзя
+        отдавать другим загрузкам того же файла.
+        """
+        data = SessionData(
+            session_id=session_id,
+            file_path=file_path,
+            clients=clients,
+            column_mapping=column_mapping,
+            by_id={client['id']: client for client in clients},
+            size=estimate_size(clients),
+            last_access=time.monotonic(),
+            digest=digest,
+            edits_version=edits_version
+        )
+
+        # Сессия, которая одна превышает лимит памяти, не кэшируется
+        if data.size > self.max_bytes:
+            return data
+
+        with self._lock:
+            if session_id in self._entries:
+                self._remove(session_id)
+            self._entries[session_id] = data
+            if digest:
+                self._by_digest[digest] = session_id
+            self._total_bytes += data.size
+            self._evict(data.last_access)
+        return data
+
+    def update_client(self, session_id: str, client: dict, edits_version: int = 0) -> Optional[SessionData]:
+        """
+        Заменить клиента с тем же id (копирование при записи)
+
+        Возвращает обновлённые данные сессии или None, если сессии нет в кэше.
+        """
+        with self._lock:
+            data = self._entries.get(session_id)
+            if data is None or client['id'] not in data.by_id:
+                return None
+
+            clients = [client if c['id'] == client['id'] else c for c in data.clients]
+            by_id = dict(data.by_id)
+            by_id[client['id']] = client
+
+            if data.digest and self._by_digest.get(data.digest) == session_id:
+                del self._by_digest[data.digest]
+            data.digest = ''
+            data.clients = clients
+            data.by_id = by_id
+            data.edits_version = edits_version
+            data.search_keys = None
+            return data
+
+    def discard(self, session_id: str):
+        """Удалить данные сессии из кэша"""
+        with self._lock:
+            if session_id in self._entries:
+                self._remove(session_id)
+
+    def stats(self) -> dict:
+        """Статистика кэша"""
+        with self._lock:
+            return {
+                "entries": len(self._entries),
+                "bytes": self._total_bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions
+            }
+
+    def _remove(self, session_id: str):
+        data = self._entries.pop(session_id)
+        self._total_bytes -= data.size
+        if data.digest and self._by_digest.get(data.digest) == session_id:
+            del self._by_digest[data.digest]
+
+    def _evict(self, now: float):
+        """Вытеснение: сначала просроченные, затем самые старые по LRU"""
+        if self.ttl:
+            expired = [sid for sid, d in self._entries.items() if now - d.last_access > self.ttl]
+            for sid in expired:
+                self._remove(sid)
+                self.evictions += 1
+
+        while self._entries and (len(self._entries) > self.max_entries or self._total_bytes > self.max_bytes):
+            self._remove(next(iter(self._entries)))
+            self.evictions += 1
@@ -0,0 +1,114 @@
+# -*- coding: utf-8 -*-
+"""
+Чтение реестров из CSV и Parquet (выгрузки АБС без пересохранения в xlsx)
+
+Читатели возвращают строки как кортежи значений ячеек, первая строка -
+заголовки, - так же, как openpyxl в iter_rows(values_only=True). Дальше
+строки идут через тот же маппинг заголовков и разбор клиентов, что и
+строки листа Excel.
+
+CSV читается потоком модулем csv (в памяти одна строка). Кодировка
+определяется по BOM (UTF-8, UTF-16), затем проверкой всего файла как
+UTF-8 (порциями, без загрузки в память); если файл не UTF-8 - это
+выгрузка Windows в cp1251. Разделитель - тот из ';', ',', табуляции и
+'|', которого больше всего в строке заголовков.
+
+Parquet читается по столбцам пакетами по PARQUET_BATCH_ROWS строк через
+pyarrow (необязательная зависимость, импортируется при первом файле).
+"""
+
+import csv
+import codecs
+import importlib.util
+from pathlib import Path
+from typing import Iterator, Optional, Tuple, Union
+
+PARQUET_AVAILABLE = importlib.util.find_spec('pyarrow') is not None
+
+# Строк в одном пакете чтения Parquet
+PARQUET_BATCH_ROWS = 10_000
+
+CSV_DELIMITERS = (';', ',', '\t', '|')
+
+# Объём файла, по которому угадывается разделитель (строка заголовков)
+_SAMPLE_SIZE = 64 * 1024
+_CHUNK_SIZE = 1024 * 1024
+
+_BOMS = (
+    (codecs.BOM_UTF8, 'utf-8-sig'),
+    (codecs.BOM_UTF16_LE, 'utf-16'),
+    (codecs.BOM_UTF16_BE, 'utf-16'),
+)
+
+
+def detect_encoding(file_path: Path) -> str:
+    """Кодировка CSV: по BOM, иначе UTF-8, если весь файл - корректный UTF-8, иначе cp1251"""
+    with open(file_path, 'rb') as f:
+        head = f.read(4)
+        for bom, encoding in _BOMS:
+            if head.startswith(bom):
+                return encoding
+
+        f.seek(0)
+        decoder = codecs.getincrementaldecoder('utf-8')()
+        try:
+            for chunk in iter(lambda: f.read(_CHUNK_SIZE), b''):
+                decoder.decode(chunk)
+            decoder.decode(b'', final=True)
+        except UnicodeDecodeError:
+            return 'cp1251'
+    return 'utf-8'
+
+
+def detect_delimiter(header_line: str) -> str:
+    """Разделитель CSV по строке заголовков (по умолчанию запятая)"""
+    counts = [(header_line.count(delimiter), delimiter) for delimiter in CSV_DELIMITERS]
+    count, delimiter = max(counts, key=lambda item: item[0])
+    return delimiter if count else ','
+
+
+def iter_csv_rows(file_path: Path, encoding: Optional[str] = None) -> Iterator[Tuple]:
+    """Строки CSV; пустые ячейки - None, как пустые ячейки Excel"""
+    encoding = encoding or detect_encoding(file_path)
+    # cp1251 не определяет один байт (0x98) - такой символ заменяется, а не роняет разбор
+    errors = 'replace' if encoding == 'cp1251' else 'strict'
+    with open(file_path, newline='', encoding=encoding, errors=errors) as f:
+        delimiter = detect_delimiter(f.read(_SAMPLE_SIZE).split('\n', 1)[0])
+        f.seek(0)
+        for row in csv.reader(f, delimiter=delimiter):
+            yield tuple(value if value.strip() else None for value in row)
+
+
+def iter_parquet_rows(file_path: Path, batch_rows: int = PARQUET_BATCH_ROWS) -> Iterator[Tuple]:
+    """Строки Parquet: заголовки - имена столбцов, значения - пакетами по столбцам"""
+    import pyarrow.parquet as pq
+
+    parquet_file = pq.ParquetFile(file_path)
+    try:
+        yield tuple(parquet_file.schema_arrow.names)
+        for batch in parquet_file.iter_batches(batch_size=batch_rows):
+            yield from zip(*(column.to_pylist() for column in batch.columns))
+    finally:
+        parquet_file.close()
+
+
+def parse_number(value: str) -> Union[float, str]:
+    """
+    Сумма из текста CSV: '1 234 567,89', '1234567.89', '1,234,567.89'
+
+    Пробелы (в том числе неразрывные) - разделители разрядов. Если есть
+    и запятая, и точка, десятичный - последний из них. Нераспознанный
+    текст возвращается как есть.
+    """
+    text = value.replace('\xa0', '').replace('\u202f', '').replace(' ', '')
+    if ',' in text and '.' in text:
+        if text.rfind(',') > text.rfind('.'):
+            text = text.replace('.', '').replace(',', '.')
+        else:
+            text = text.replace(',', '')
+    else:
+        text = text.replace(',', '.')
+    try:
+        return float(text)
+    except ValueError:
+        return value
@@ -0,0 +1,313 @@
+# -*- coding: utf-8 -*-
+"""
+Потоковый приём загружаемого файла из multipart/form-data
+
+Тело запроса разбирается по мере поступления и пишется на диск порциями
+по CHUNK_SIZE: в памяти процесса одновременно не больше одной порции,
+сколько бы ни весил файл. SHA-256 считается по ходу записи. В одной
+форме может быть несколько файлов (пакетная загрузка) и обычные поля.
+
+Запрос отклоняется как можно раньше:
+
+    - по заголовку Content-Length, до чтения тела (413)
+    - по расширению имени файла из заголовков части (400)
+    - по сигнатуре первых байт файла: xlsx - zip-архив, xls - OLE2,
+      parquet - PAR1 (400); у CSV сигнатуры нет, но в нём должна быть
+      хотя бы одна непустая строка (400)
+    - пустой файл (400)
+    - при превышении лимита во время приёма (413)
+
+Принятые и недописанные временные файлы удаляются при любой ошибке, в
+том числе при обрыве соединения.
+"""
+
+import uuid
+import hashlib
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+from multipart.exceptions import MultipartParseError
+from multipart.multipart import MultipartParser, parse_options_header
+from starlette.concurrency import run_in_threadpool
+from starlette.requests import Request
+
+# Размер порции записи на диск
+CHUNK_SIZE = 1024 * 1024
+
+# Запас на заголовки частей и границы multipart сверх размера файла
+MULTIPART_OVERHEAD = 64 * 1024
+
+# Наибольший размер обычного (не файлового) поля формы
+MAX_FIELD_SIZE = 4096
+
+# Пробельные символы, нули UTF-16 и байты BOM - текст из одних них считается пустым
+TEXT_BLANK_BYTES = b' \t\r\n\x00\xef\xbb\xbf\xff\xfe'
+
+ZIP_SIGNATURE = b'PK\x03\x04'
+OLE2_SIGNATURE = b'\xd0\xcf\x11\xe0\xa1\xb1\x1a\xe1'
+PARQUET_SIGNATURE = b'PAR1'
+
+# Расширение -> допустимые сигнатуры начала файла
+EXCEL_SIGNATURES: Dict[str, Tuple[bytes, ...]] = {
+    '.xlsx': (ZIP_SIGNATURE,),
+    '.xls': (OLE2_SIGNATURE, ZIP_SIGNATURE),
+}
+
+# Реестры: книги Excel, выгрузки CSV (текст: сигнатур нет - проверяется, что он не пуст) и Parquet
+TABLE_SIGNATURES: Dict[str, Tuple[bytes, ...]] = {
+    **EXCEL_SIGNATURES,
+    '.csv': (),
+    '.parquet': (PARQUET_SIGNATURE,),
+}
+
+
+class UploadError(Exception):
+    """Загрузка отклонена; status_code - код ответа HTTP"""
+
+    def __init__(self, message: str, status_code: int = 400):
+        super().__init__(message)
+        self.status_code = status_code
+
+
+@dataclass
+class ReceivedUpload:
+    """Принятый файл: временный путь, исходное имя, размер и SHA-256"""
+    path: Path
+    filename: str
+    size: int
+    digest: str
+
+
+@dataclass
+class ReceivedForm:
+    """Принятые файлы (в порядке полей формы) и остальные поля"""
+    files: List[ReceivedUpload]
+    fields: Dict[str, str]
+
+
+def _format_mb(size: int) -> str:
+    return f"{size / (1024 * 1024):.0f} МБ"
+
+
+class _FilePart:
+    """Файл из одной части формы: буфер, временный файл на диске и хэш"""
+
+    def __init__(self, filename: str, suffix: str, dest_dir: Path):
+        self.filename = filename
+        self.suffix = suffix
+        self.dest_dir = dest_dir
+        self.buffer = bytearray()
+        self.path: Optional[Path] = None
+        self.file = None
+        self.size = 0
+        self.hasher = hashlib.sha256()
+        self.checked = False
+
+    def write(self, data: bytes):
+        """Запись порции (в потоке пула, чтобы не блокировать цикл событий)"""
+        if self.file is None:
+            self.path = self.dest_dir / f".{uuid.uuid4().hex}.tmp"
+            self.file = open(self.path, 'wb')
+        self.file.write(data)
+        self.hasher.update(data)
+
+    async def flush(self, final: bool = False):
+        if len(self.buffer) >= CHUNK_SIZE or (final and self.buffer):
+            data = bytes(self.buffer)
+            self.buffer.clear()
+            await run_in_threadpool(self.write, data)
+        if final and self.file is not None:
+            self.file.close()
+
+    def discard(self):
+        if self.file is not None:
+            self.file.close()
+        if self.path is not None:
+            self.path.unlink(missing_ok=True)
+
+    def result(self) -> ReceivedUpload:
+        return ReceivedUpload(self.path, self.filename, self.size, self.hasher.hexdigest())
+
+
+class _FormWriter:
+    """Колбэки MultipartParser: файлы поля field_name - во временные файлы, остальные поля - в память"""
+
+    def __init__(self, field_name: str, dest_dir: Path, max_bytes: int, max_files: int,
+                 signatures: Dict[str, Tuple[bytes, ...]], charset: str):
+        self.field_name = field_name
+        self.dest_dir = dest_dir
+        self.max_bytes = max_bytes
+        self.max_files = max_files
+        self.signatures = signatures
+        self.charset = charset
+
+        self._header_name = b''
+        self._header_value = b''
+        self._disposition = b''
+        self._file: Optional[_FilePart] = None
+        self._field: Optional[str] = None
+        self._field_data = bytearray()
+
+        self.files: List[_FilePart] = []
+        self.finished: List[_FilePart] = []  # дописанные части, ещё не сброшенные на диск
+        self.fields: Dict[str, str] = {}
+        self.total_size = 0
+
+    def callbacks(self) -> dict:
+        return {
+            'on_part_begin': self.on_part_begin,
+            'on_part_data': self.on_part_data,
+            'on_part_end': self.on_part_end,
+            'on_header_field': self.on_header_field,
+            'on_header_value': self.on_header_value,
+            'on_header_end': self.on_header_end,
+            'on_headers_finished': self.on_headers_finished,
+        }
+
+    def on_part_begin(self):
+        self._disposition = b''
+        self._file = None
+        self._field = None
+
+    def on_header_field(self, data: bytes, start: int, end: int):
+        self._header_name += data[start:end]
+
+    def on_header_value(self, data: bytes, start: int, end: int):
+        self._header_value += data[start:end]
+
+    def on_header_end(self):
+        if self._header_name.lower() == b'content-disposition':
+            self._disposition = self._header_value
+        self._header_name = b''
+        self._header_value = b''
+
+    def on_headers_finished(self):
+        _, options = parse_options_header(self._disposition)
+        name = options.get(b'name', b'').decode(self.charset, errors='replace')
+        if b'filename' not in options:
+            # Обычное поле формы (флаги, параметры загрузки)
+            self._field = name
+            self._field_data = bytearray()
+            return
+        if name != self.field_name:
+            return
+
+        if len(self.files) >= self.max_files:
+            raise UploadError(f"Не больше {self.max_files} файлов в одной загрузке")
+
+        # Браузеры присылают только имя, но путь от клиента в папку сессии не попадает
+        filename = Path(options[b'filename'].decode(self.charset, errors='replace')).name
+        suffix = Path(filename).suffix.lower()
+        if suffix not in self.signatures:
+            allowed = ', '.join(self.signatures)
+            raise UploadError(f"Неподдерживаемый формат файла (допустимы {allowed}): {filename}")
+
+        self._file = _FilePart(filename, suffix, self.dest_dir)
+        self.files.append(self._file)
+
+    def on_part_data(self, data: bytes, start: int, end: int):
+        if self._field is not None:
+            self._field_data += data[start:end]
+            if len(self._field_data) > MAX_FIELD_SIZE:
+                raise UploadError(f"Слишком длинное значение поля {self._field}")
+            return
+        part = self._file
+        if part is None:
+            return
+        part.size += end - start
+        self.total_size += end - start
+        if self.total_size > self.max_bytes:
+            raise UploadError(f"Размер загрузки больше {_format_mb(self.max_bytes)}", 413)
+        part.buffer += data[start:end]
+        self.check_signature(part)
+
+    def on_part_end(self):
+        if self._field is not None:
+            self.fields[self._field] = self._field_data.decode(self.charset, errors='replace')
+            self._field = None
+        elif self._file is not None:
+            if self._file.size == 0:
+                raise UploadError(f"Файл пуст: {self._file.filename}")
+            self.check_signature(self._file, final=True)
+            self.finished.append(self._file)
+            self._file = None
+
+    def check_signature(self, part: _FilePart, final: bool = False):
+        """Проверка первых байт файла, как только их пришло достаточно"""
+        if part.checked:
+            return
+        signatures = self.signatures[part.suffix]
+        if not signatures:
+            # Текстовый формат: ждём первый непустой символ (пустые порции уже сброшены на диск)
+            if part.buffer.strip(TEXT_BLANK_BYTES):
+                part.checked = True
+            elif final:
+                raise UploadError(f"Файл пуст (нет ни одной непустой строки): {part.filename}")
+            return
+        if len(part.buffer) < max(map(len, signatures)) and not final:
+            return
+        part.checked = True
+        if not any(part.buffer.startswith(signature) for signature in signatures):
+            raise UploadError(f"Файл повреждён или не соответствует расширению: {part.filename}")
+
+    async def flush(self):
+        """Сбросить на диск накопленное: дописанные части целиком, текущую - полными порциями"""
+        for part in self.finished:
+            await part.flush(final=True)
+        self.finished.clear()
+        if self._file is not None:
+            await self._file.flush()
+
+    def discard(self):
+        for part in self.files:
+            part.discard()
+
+
+async def receive_form(request: Request, dest_dir: Path, max_bytes: int, field_name: str = 'file',
+                       max_files: int = 1,
+                       signatures: Dict[str, Tuple[bytes, ...]] = EXCEL_SIGNATURES) -> ReceivedForm:
+    """
+    Принять до max_files файлов из поля field_name (в dest_dir под временными
+    именами) и остальные поля формы; max_bytes - лимит на все файлы вместе
+
+    Вызывающий код переносит файлы (os.replace) или удаляет их. При
+    отказе выбрасывается UploadError, уже принятые файлы удаляются.
+    """
+    content_type, params = parse_options_header(request.headers.get('content-type', ''))
+    if content_type != b'multipart/form-data' or b'boundary' not in params:
+        raise UploadError("Ожидается multipart/form-data с файлом")
+    charset = params.get(b'charset', b'utf-8').decode('latin-1')
+
+    body_limit = max_bytes + MULTIPART_OVERHEAD * max_files
+    try:
+        content_length = int(request.headers.get('content-length', 0))
+    except ValueError:
+        content_length = 0
+    if content_length > body_limit:
+        raise UploadError(f"Размер загрузки больше {_format_mb(max_bytes)}", 413)
+
+    writer = _FormWriter(field_name, dest_dir, max_bytes, max_files, signatures, charset)
+    parser = MultipartParser(params[b'boundary'], writer.callbacks())
+    received = 0
+    try:
+        async for chunk in request.stream():
+            received += len(chunk)
+            # Без Content-Length (chunked) лимит проверяется по факту
+            if received > body_limit:
+                raise UploadError(f"Размер загрузки больше {_format_mb(max_bytes)}", 413)
+            try:
+                parser.write(chunk)
+            except MultipartParseError as e:
+                raise UploadError(f"Неверный формат запроса: {e}")
+            await writer.flush()
+        parser.finalize()
+        await writer.flush()
+
+        if not writer.files or writer._file is not None:
+            raise UploadError("Файл не передан")
+    except BaseException:
+        writer.discard()
+        raise
+
+    return ReceivedForm([part.result() for part in writer.files], writer.fields)